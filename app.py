@@ -6,12 +6,17 @@ Institut Teknologi Sumatera (ITERA)
 
 import streamlit as st
 import cv2
-import numpy as np
-from PIL import Image
-import matplotlib.pyplot as plt
 import os
-from image_processing import process_parking_image
-import io
+from instrumentation import configure_from_env
+from segmentation_backends import get_segmentation_backend
+from image_processing import (
+    WORKING_SIZE,
+    decode_image,
+    list_image_files,
+    measure_image_quality,
+    stage_to_uint8,
+)
+from result_cache import ResultCache, content_hash
 
 
 # =========================================================
@@ -135,63 +140,164 @@ st.markdown("""
 # =========================================================
 # FUNGSI HELPER
 # =========================================================
+def dataset_signature(dataset_path):
+    """
+    Penanda murah perubahan dataset: mtime folder dataset dan subfolder
+    langsungnya (menambah/menghapus file mengubah mtime foldernya)
+    """
+    entries = [(dataset_path, os.stat(dataset_path).st_mtime_ns)]
+    with os.scandir(dataset_path) as it:
+        for entry in it:
+            if entry.is_dir():
+                entries.append((entry.name, entry.stat().st_mtime_ns))
+    return tuple(sorted(entries))
+
+
+@st.cache_data(ttl=300, max_entries=8, show_spinner=False)
+def _index_dataset(dataset_path, signature):
+    return list_image_files(dataset_path)
+
+
 def load_dataset_images(dataset_path="dataset"):
-    """Memuat semua gambar dari folder dataset"""
+    """Memuat daftar gambar dataset; os.walk hanya diulang jika dataset berubah"""
     if not os.path.exists(dataset_path):
         return []
-    
-    images = []
-    for root, dirs, files in os.walk(dataset_path):
-        for file in files:
-            if file.lower().endswith(('.png', '.jpg', '.jpeg', '.heic')):
-                images.append(os.path.join(root, file))
-    return images
+    return _index_dataset(dataset_path, dataset_signature(dataset_path))
+
+
+@st.cache_data(max_entries=4096, show_spinner=False)
+def _file_hash(path, mtime_ns, size):
+    with open(path, "rb") as f:
+        return content_hash(f.read())
+
 
+def dataset_image_hash(path):
+    """content_hash file dataset, dihitung ulang hanya jika file berubah"""
+    stat = os.stat(path)
+    return _file_hash(path, stat.st_mtime_ns, stat.st_size)
 
-def validate_image(image_array, max_motors=4):
+
+@st.cache_resource(show_spinner="Memuat model rembg...")
+def load_session_pool():
+    """Memuat backend segmentasi (default rembg) sekali untuk seluruh rerun dan pengguna"""
+    return get_segmentation_backend().warm_up()
+
+
+@st.cache_resource
+def load_result_cache():
+    """Cache hasil pemrosesan yang dipakai bersama seluruh rerun dan pengguna"""
+    return ResultCache(max_entries=32, max_bytes=384 * 1024 * 1024)
+
+
+@st.cache_resource
+def load_metrics():
+    """Mengaktifkan metrik Prometheus sekali per proses (jika PARKING_METRICS_FILE di-set)"""
+    return configure_from_env()
+
+
+load_metrics()
+
+
+def validate_image(image_array,
+                   min_blur=100.0,
+                   brightness_range=(40.0, 215.0),
+                   max_clipped_fraction=0.6,
+                   aspect_range=(1.0, 2.4)):
     """
-    Validasi gambar sesuai ketentuan
+    Validasi gambar sesuai ketentuan, pada hasil decode tereduksi
+    (lihat measure_image_quality)
     Returns: (is_valid, message)
     """
-    # Cek blur menggunakan Laplacian variance
-    gray = cv2.cvtColor(image_array, cv2.COLOR_BGR2GRAY)
-    laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
+    quality = measure_image_quality(image_array)
+    
+    # Cek orientasi/rasio (pipeline bekerja pada 16:9 landscape)
+    if not aspect_range[0] <= quality['aspect'] <= aspect_range[1]:
+        return False, "❌ Rasio gambar tidak sesuai! Gunakan foto landscape (mendatar)."
     
-    if laplacian_var < 100:
+    # Cek blur menggunakan Laplacian variance
+    if quality['blur'] < min_blur:
         return False, "❌ Gambar terlalu blur! Pastikan foto jelas dan fokus."
     
+    # Cek exposure
+    if (quality['brightness'] < brightness_range[0]
+            or quality['dark_fraction'] > max_clipped_fraction):
+        return False, "❌ Gambar terlalu gelap! Ambil foto dengan pencahayaan cukup."
+    if (quality['brightness'] > brightness_range[1]
+            or quality['bright_fraction'] > max_clipped_fraction):
+        return False, "❌ Gambar terlalu terang! Hindari cahaya berlebih."
+    
     return True, "✅ Gambar memenuhi ketentuan dasar."
 
 
-def display_process_steps(results):
-    """Menampilkan langkah-langkah pemrosesan dalam grid"""
+# Parameter pipeline untuk foto upload (ketentuan maksimal 4 motor)
+UPLOAD_PARAMS = {'max_motors': 4}
+
+
+def check_upload(uploaded_file, upload_id):
+    """
+    Decode (tereduksi) dan validasi file upload sekali per file. Hasil
+    decode disimpan di session state dan dipakai ulang saat pemrosesan.
+    Returns: (image_bytes, decoded atau None, is_valid, message)
+    """
+    checked = st.session_state.get('upload_check')
+    if checked is None or checked[0] != upload_id:
+        image_bytes = uploaded_file.getvalue()
+        try:
+            decoded = decode_image(image_bytes, min_size=WORKING_SIZE)
+        except ValueError:
+            checked = (upload_id, image_bytes, None, False, "❌ File gambar tidak dapat dibaca.")
+        else:
+            checked = (upload_id, image_bytes, decoded) + validate_image(decoded)
+        st.session_state['upload_check'] = checked
+    return checked[1:]
+
+
+STAGE_TITLES = [
+    ("original", "Original"),
+    ("no_background", "No Background"),
+    ("grayscale", "Grayscale"),
+    ("gaussian_blur", "Gaussian Blur"),
+    ("threshold", "Threshold (Otsu)"),
+    ("morphology", "Morphology"),
+    ("distance_transform", "Distance Transform"),
+    ("sure_foreground", "Sure Foreground"),
+    ("final_output", "Final Detection"),
+]
+
+
+def display_process_steps(results, image_hash, **params):
+    """
+    Menampilkan langkah-langkah pemrosesan dalam grid. Grid memakai
+    thumbnail WebP yang di-cache bersama hasil; citra resolusi penuh
+    hanya dikirim untuk tahapan yang dipilih pengguna.
+    """
     st.subheader("📊 Tahapan Pemrosesan Citra")
     
-    # Buat 3 kolom untuk 9 gambar
-    steps = [
-        ("Original", results['original'], False),
-        ("No Background", results['no_background'], False),
-        ("Grayscale", results['grayscale'], True),
-        ("Gaussian Blur", results['gaussian_blur'], True),
-        ("Threshold (Otsu)", results['threshold'], True),
-        ("Morphology", results['morphology'], True),
-        ("Distance Transform", results['distance_transform'], True),
-        ("Sure Foreground", results['sure_foreground'], True),
-        ("Final Detection", results['final_output'], False)
-    ]
+    thumbnails = load_result_cache().thumbnails(
+        image_hash, load_session_pool().model_name, result=results, **params
+    )
     
     # Tampilkan dalam grid 3x3
-    for i in range(0, 9, 3):
+    for i in range(0, len(STAGE_TITLES), 3):
         cols = st.columns(3)
-        for j in range(3):
-            if i + j < len(steps):
-                title, img, is_gray = steps[i + j]
-                with cols[j]:
-                    st.markdown(f"**{i+j+1}. {title}**")
-                    if is_gray:
-                        st.image(img, use_container_width=True, clamp=True)
-                    else:
-                        st.image(cv2.cvtColor(img, cv2.COLOR_BGR2RGB), use_container_width=True)
+        for j, (stage, title) in enumerate(STAGE_TITLES[i:i + 3]):
+            with cols[j]:
+                st.markdown(f"**{i+j+1}. {title}**")
+                st.image(thumbnails[stage], use_container_width=True)
+    
+    # Resolusi penuh hanya atas permintaan
+    titles = dict(STAGE_TITLES)
+    stage = st.selectbox(
+        "🔍 Lihat resolusi penuh:",
+        [None] + list(titles),
+        format_func=lambda s: "-" if s is None else titles[s],
+        key=f"full_resolution_{image_hash}",
+    )
+    if stage is not None:
+        image = stage_to_uint8(results[stage])
+        if image.ndim == 3:
+            image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+        st.image(image, caption=titles[stage], use_container_width=True)
 
 
 # =========================================================
@@ -445,6 +551,12 @@ elif menu == "🔬 Proses Citra":
                 format_func=lambda x: os.path.basename(x)
             )
             
+            # Hasil gambar ini jika sudah pernah diproses (oleh pengguna mana pun)
+            results = None
+            if selected_image is not None:
+                image_hash = dataset_image_hash(selected_image)
+                results = load_result_cache().lookup(image_hash, load_session_pool().model_name)
+            
             if st.button("🚀 Proses Gambar", type="primary"):
                 if selected_image is None:
                     st.error("Silakan pilih gambar terlebih dahulu")
@@ -455,15 +567,11 @@ elif menu == "🔬 Proses Citra":
                             image_bytes = f.read()
                         
                         # Proses
-                        results = process_parking_image(image_bytes)
-                        
-                        # Simpan hasil ke session state
-                        st.session_state['results'] = results
+                        results = load_result_cache().process(image_bytes, load_session_pool())
                         st.success("✅ Pemrosesan selesai!")
             
             # Tampilkan hasil jika ada
-            if 'results' in st.session_state:
-                results = st.session_state['results']
+            if results is not None:
                 
                 st.markdown("---")
                 
@@ -516,7 +624,7 @@ elif menu == "🔬 Proses Citra":
                 st.markdown("---")
                 
                 # Tampilkan semua tahapan
-                display_process_steps(results)
+                display_process_steps(results, image_hash)
 
 
 # =========================================================
@@ -549,21 +657,14 @@ elif menu == "📤 Upload Foto Sendiri":
     )
     
     if uploaded_file is not None:
-        # Tampilkan preview
-        st.subheader("👁️ Preview Gambar")
-        image = Image.open(uploaded_file)
-        st.image(image, caption="Gambar yang diupload", use_container_width=True)
+        upload_id = getattr(uploaded_file, 'file_id', uploaded_file.name)
         
-        # Validasi gambar
-        image_array = np.array(image)
-        if len(image_array.shape) == 2:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_GRAY2BGR)
-        elif image_array.shape[2] == 4:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGBA2BGR)
-        else:
-            image_array = cv2.cvtColor(image_array, cv2.COLOR_RGB2BGR)
+        # Validasi gambar (decode tereduksi, sekali per file)
+        image_bytes, decoded, is_valid, message = check_upload(uploaded_file, upload_id)
         
-        is_valid, message = validate_image(image_array)
+        # Tampilkan preview (file asli di-decode oleh browser)
+        st.subheader("👁️ Preview Gambar")
+        st.image(image_bytes, caption="Gambar yang diupload", use_container_width=True)
         
         if is_valid:
             st.success(message)
@@ -573,29 +674,30 @@ elif menu == "📤 Upload Foto Sendiri":
         # Tombol proses
         if st.button("🚀 Proses Gambar Upload", type="primary", disabled=not is_valid):
             with st.spinner("Memproses gambar Anda... Mohon tunggu..."):
-                # Convert ke bytes
-                uploaded_file.seek(0)
-                image_bytes = uploaded_file.read()
-                
                 try:
-                    # Proses
-                    results = process_parking_image(image_bytes)
+                    # Proses (memakai hasil decode dari validasi). Jika motor
+                    # lebih dari batas, pipeline berhenti sebelum slot digambar
+                    results = load_result_cache().process(
+                        image_bytes, load_session_pool(), decoded=decoded, **UPLOAD_PARAMS
+                    )
                     
                     # Cek jumlah motor
-                    if results['motor_count'] > 4:
+                    if results.get('rejected'):
                         st.error(f"❌ Terdeteksi {results['motor_count']} motor! Maksimal 4 motor sesuai ketentuan.")
                         st.warning("Silakan upload gambar lain yang memenuhi ketentuan.")
                     else:
                         st.success(f"✅ Pemrosesan selesai! Terdeteksi {results['motor_count']} motor.")
                         
-                        # Simpan hasil
+                        # Simpan hasil (hanya untuk file upload ini)
                         st.session_state['upload_results'] = results
+                        st.session_state['upload_results_id'] = upload_id
+                        st.session_state['upload_hash'] = content_hash(image_bytes)
                         
                 except Exception as e:
                     st.error(f"❌ Terjadi error saat memproses: {str(e)}")
         
         # Tampilkan hasil jika ada
-        if 'upload_results' in st.session_state:
+        if st.session_state.get('upload_results_id') == upload_id:
             results = st.session_state['upload_results']
             
             st.markdown("---")
@@ -649,7 +751,7 @@ elif menu == "📤 Upload Foto Sendiri":
             st.markdown("---")
             
             # Tampilkan semua tahapan
-            display_process_steps(results)
+            display_process_steps(results, st.session_state['upload_hash'], **UPLOAD_PARAMS)
 
 
 # =========================================================
@@ -0,0 +1,292 @@
+"""
+Mesin batch untuk memproses seluruh folder dataset secara paralel
+Kelompok: AFEnter
+
+Contoh:
+    python batch_process.py "dataset/All Dataset" --output hasil.jsonl
+    python batch_process.py "dataset/All Dataset" --output hasil.csv --workers 4
+    python batch_process.py "dataset/All Dataset" --store store/ --output hasil.jsonl
+"""
+
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Callable, Dict, Iterator, List, Optional
+
+import cv2
+
+from frame_store import FrameStore
+from image_processing import (
+    analyze_segmentation,
+    list_image_files,
+    process_parking_frame,
+    process_parking_image,
+)
+from rembg_session import configure_session_pool
+
+
+CSV_FIELDS = [
+    'path', 'motor_count', 'total_slots', 'occupied_slots', 'empty_slots',
+    'slot_results', 'elapsed_ms', 'error',
+]
+
+
+def _init_worker(model_name: Optional[str], intra_op_threads: int):
+    """Inisialisasi worker: satu session rembg hangat per proses"""
+    # Paralelisme sudah di level proses, hindari oversubscription thread OpenCV
+    cv2.setNumThreads(1)
+    configure_session_pool(
+        model_name=model_name,
+        size=1,
+        intra_op_threads=intra_op_threads,
+        inter_op_threads=1,
+    ).warm_up()
+
+
+def _run(path: str, compute: Callable[[], Dict]) -> Dict:
+    """Menjalankan compute() dan mengubah hasilnya menjadi record"""
+    start = time.perf_counter()
+    record = {'path': path}
+    try:
+        results = compute()
+        record.update({
+            'motor_count': results['motor_count'],
+            'total_slots': results['total_slots'],
+            'occupied_slots': results['occupied_slots'],
+            'empty_slots': results['empty_slots'],
+            'slot_results': results['slot_results'],
+            'motor_boxes': [list(box) for box in results['motor_boxes']],
+            'error': None,
+        })
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+    record['elapsed_ms'] = (time.perf_counter() - start) * 1000.0
+    return record
+
+
+def process_file(path: str) -> Dict:
+    """
+    Memproses satu file gambar dan mengembalikan record hasil
+
+    Args:
+        path: Path file gambar
+
+    Returns:
+        dict: Record berisi status slot, statistik, durasi, dan error (jika ada)
+    """
+    def compute():
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        return process_parking_image(image_bytes, stages=())
+
+    return _run(path, compute)
+
+
+_store: Optional[FrameStore] = None
+
+
+def _init_store_worker(frame_store: str, paths: List[str],
+                       model_name: Optional[str], intra_op_threads: int):
+    global _store
+    _store = FrameStore(frame_store, paths)
+    if _store.masks is None:
+        _init_worker(model_name, intra_op_threads)
+    else:
+        cv2.setNumThreads(1)
+
+
+def process_store_row(index: int) -> Dict:
+    """
+    Seperti process_file untuk baris store frame_store.py: frame dibaca
+    tanpa decode; jika store berisi mask, segmentasi juga dilewati
+    """
+    frame = _store.frames[index]
+    if _store.masks is not None:
+        return _run(_store.paths[index],
+                    lambda: analyze_segmentation(frame, _store.masks[index], stages=()))
+    return _run(_store.paths[index], lambda: process_parking_frame(frame, stages=()))
+
+
+def process_files(paths: List[str],
+                  workers: Optional[int] = None,
+                  model_name: Optional[str] = None,
+                  intra_op_threads: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Memproses banyak file dengan process pool, hasil di-yield sesuai urutan selesai
+
+    Args:
+        paths: Daftar path file gambar
+        workers: Jumlah proses worker (default: jumlah core)
+        model_name: Nama model rembg (default: REMBG_MODEL / u2net)
+        intra_op_threads: Thread ONNX Runtime per worker
+            (default: jumlah core dibagi jumlah worker)
+
+    Yields:
+        dict: Record hasil per gambar (lihat process_file)
+    """
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    if intra_op_threads is None:
+        intra_op_threads = max(1, cpu_count // workers)
+
+    # spawn: worker tidak mewarisi state thread rembg/ONNX Runtime dari parent
+    # (fork setelah import rembg dapat membuat pool menggantung saat ditutup)
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(
+        processes=workers,
+        initializer=_init_worker,
+        initargs=(model_name, intra_op_threads),
+    ) as pool:
+        yield from pool.imap_unordered(process_file, paths, chunksize=1)
+
+
+def process_store(frame_store: str,
+                  paths: List[str],
+                  workers: Optional[int] = None,
+                  model_name: Optional[str] = None,
+                  intra_op_threads: Optional[int] = None) -> Iterator[Dict]:
+    """
+    Seperti process_files, tetapi frame (dan mask, jika ada) dibaca dari
+    store frame_store.py. Mask store sudah dibinerkan, sehingga hasilnya
+    bisa sedikit berbeda dari jalur rembg langsung. Path yang tidak bisa
+    dibaca dari store (lihat FrameStore.split_paths) di-decode seperti
+    biasa lewat process_files.
+
+    Args:
+        frame_store: Folder store
+        paths: Path gambar yang diproses
+        model_name: Seperti process_files; jika store berisi mask, harus
+            sama dengan model mask store
+
+    Yields:
+        dict: Record hasil per gambar (lihat process_file)
+
+    Raises:
+        ValueError: Jika mask store berasal dari model selain model_name
+    """
+    # Store divalidasi di parent: error di initializer membuat pool spawn
+    # terus-menerus membuat ulang worker
+    store = FrameStore(frame_store)
+    store.check_mask_model(model_name)
+    in_store, others = store.split_paths(paths)
+    if others:
+        print(f"{len(others)} images are missing or changed in {frame_store!r}; "
+              f"decoding them instead", file=sys.stderr)
+
+    cpu_count = os.cpu_count() or 1
+    workers = workers or cpu_count
+    if intra_op_threads is None:
+        intra_op_threads = max(1, cpu_count // workers)
+    if in_store:
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(
+            processes=workers,
+            initializer=_init_store_worker,
+            initargs=(frame_store, in_store, model_name, intra_op_threads),
+        ) as pool:
+            yield from pool.imap_unordered(process_store_row, range(len(in_store)), chunksize=4)
+    if others:
+        yield from process_files(others, workers, model_name, intra_op_threads)
+
+
+def process_directory(dataset_path: str, **kwargs) -> Iterator[Dict]:
+    """
+    Memproses seluruh gambar dalam folder dataset (lihat process_files)
+
+    Args:
+        dataset_path: Folder dataset, mis. 'dataset/All Dataset'
+        **kwargs: Diteruskan ke process_files
+
+    Yields:
+        dict: Record hasil per gambar
+    """
+    yield from process_files(list_image_files(dataset_path), **kwargs)
+
+
+class ResultWriter:
+    """Menulis record hasil secara streaming ke file JSONL atau CSV"""
+
+    def __init__(self, path: str, fmt: Optional[str] = None):
+        """
+        Args:
+            path: File output ('-' = stdout)
+            fmt: 'jsonl' atau 'csv' (default: dari ekstensi file)
+        """
+        if fmt is None:
+            fmt = 'csv' if path.lower().endswith('.csv') else 'jsonl'
+        if fmt not in ('jsonl', 'csv'):
+            raise ValueError(f"Unknown output format: {fmt!r}")
+        self.fmt = fmt
+        self._file = sys.stdout if path == '-' else open(path, "w", newline="")
+        self._csv = None
+        if fmt == 'csv':
+            self._csv = csv.DictWriter(self._file, fieldnames=CSV_FIELDS,
+                                       extrasaction='ignore')
+            self._csv.writeheader()
+
+    def write(self, record: Dict):
+        if self._csv is not None:
+            row = dict(record)
+            row['slot_results'] = ";".join(record.get('slot_results') or [])
+            row['elapsed_ms'] = f"{record['elapsed_ms']:.1f}"
+            self._csv.writerow(row)
+        else:
+            self._file.write(json.dumps(record) + "\n")
+        self._file.flush()
+
+    def close(self):
+        if self._file is not sys.stdout:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch deteksi parkir untuk satu folder dataset")
+    parser.add_argument("dataset", help="folder dataset, mis. 'dataset/All Dataset'")
+    parser.add_argument("--output", "-o", default="-",
+                        help="file hasil .jsonl atau .csv ('-' = stdout)")
+    parser.add_argument("--format", choices=("jsonl", "csv"), default=None)
+    parser.add_argument("--workers", "-j", type=int, default=None,
+                        help="jumlah proses worker (default: jumlah core)")
+    parser.add_argument("--model", default=None, help="nama model rembg")
+    parser.add_argument("--intra-op-threads", type=int, default=None)
+    parser.add_argument("--store", default=None,
+                        help="store frame_store.py: baca frame/mask tanpa decode")
+    args = parser.parse_args(argv)
+
+    paths = list_image_files(args.dataset)
+    if not paths:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+
+    start = time.perf_counter()
+    done = failed = 0
+    with ResultWriter(args.output, args.format) as writer:
+        if args.store:
+            records = process_store(args.store, paths, args.workers, args.model,
+                                    args.intra_op_threads)
+        else:
+            records = process_files(paths, args.workers, args.model, args.intra_op_threads)
+        for record in records:
+            writer.write(record)
+            done += 1
+            failed += record['error'] is not None
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{done} images ({failed} failed) in {elapsed:.1f} s "
+        f"-> {done / elapsed:.2f} images/s",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,826 @@
+"""
+Skrip benchmark pipeline pemrosesan citra parkir
+Kelompok: AFEnter
+
+Contoh:
+    python benchmark.py resolution --dataset "dataset/All Dataset" --limit 20
+    python benchmark.py remove-background --limit 5 --repeat 3
+    python benchmark.py stages --resolutions full,1920x1080,960x540 --batch-sizes 1,8 \
+        --output bench.json
+    python benchmark.py compare bench_lama.json bench.json
+    python benchmark.py micro-batch --concurrency 8 --configs 1:0,4:10,8:20
+    python benchmark.py backends --limit 30 --labels labels.csv
+    python benchmark.py models --models u2net,u2netp,silueta,~/.rembg/models/u2net/u2net-int8-static.onnx
+    python benchmark.py occupancy --slots 4,100,500 --boxes 10,1000,5000
+    python benchmark.py scoring --limit 30 --labels labels.csv --noise 0,0.02
+    python benchmark.py scoring --store store/ --labels labels.csv
+
+--store membaca frame (dan mask, untuk 'scoring') dari store frame_store.py
+tanpa decode JPEG; berlaku untuk micro-batch, backends, dan scoring.
+"""
+
+import argparse
+import io
+import json
+import multiprocessing
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+from rembg import remove
+
+from image_processing import (
+    WORKING_SIZE,
+    apply_distance_transform,
+    apply_foreground_mask,
+    apply_morphology,
+    apply_threshold,
+    create_parking_slots,
+    decode_image,
+    detect_motor_contours,
+    extract_roi,
+    list_image_files,
+    preprocess_image,
+    process_parking_image,
+    remove_background,
+    remove_background_array,
+    analyze_segmentation,
+    resize_image,
+    segment_foreground,
+)
+from frame_store import FrameStore
+from micro_batching import MicroBatcher
+from occupancy import SlotLayout, slot_occupancy
+from param_sweep import load_labels
+from rembg_session import configure_session_pool, get_session_pool, resolve_model_path
+from segmentation_backends import MOG2Backend, StaticBackgroundBackend, learn_background
+
+
+def list_images(dataset_path: str, limit: int = 0) -> List[str]:
+    """Mengambil daftar file gambar dalam folder dataset (urut nama)"""
+    images = list_image_files(dataset_path)
+    return images[:limit] if limit > 0 else images
+
+
+def read_bytes(path: str) -> bytes:
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def load_frames(args) -> Tuple[List[str], List[np.ndarray], Optional[FrameStore]]:
+    """
+    Path dan frame ukuran kerja untuk benchmark: dibaca zero-copy dari
+    --store jika ada, selain itu di-decode dari --dataset
+
+    Returns:
+        Tuple: (paths, frames, store atau None)
+    """
+    if args.store:
+        store = FrameStore(args.store)
+        paths = store.paths[:args.limit] if args.limit > 0 else store.paths
+        return paths, [store.frames[i] for i in range(len(paths))], store
+    paths = list_images(args.dataset, args.limit)
+    if not paths:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+    frames = [resize_image(decode_image(read_bytes(path), min_size=WORKING_SIZE)) for path in paths]
+    return paths, frames, None
+
+
+def summarize_timings(runs: List[Dict[str, float]]) -> Dict[str, float]:
+    """Menghitung rata-rata durasi (ms) per tahap dari beberapa run"""
+    stages = {}
+    for timings in runs:
+        for stage, seconds in timings.items():
+            stages.setdefault(stage, []).append(seconds * 1000.0)
+    summary = {stage: statistics.mean(values) for stage, values in stages.items()}
+    summary['total'] = sum(summary.values())
+    return summary
+
+
+def print_table(columns: Dict[str, Dict[str, float]]):
+    """Mencetak tabel tahap x mode dalam milidetik"""
+    names = list(columns)
+    stages = []
+    for summary in columns.values():
+        for stage in summary:
+            if stage not in stages:
+                stages.append(stage)
+    print(f"{'stage (ms)':<22}" + "".join(f"{name:>16}" for name in names))
+    for stage in stages:
+        row = "".join(f"{columns[name].get(stage, float('nan')):>16.1f}" for name in names)
+        print(f"{stage:<22}{row}")
+
+
+def bench_resolution(args):
+    """Membandingkan rembg pada resolusi asli vs resolusi kerja 960x540"""
+    images = list_images(args.dataset, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+
+    get_session_pool().warm_up()
+    modes = {
+        'full_resolution': dict(downscale_first=False),
+        'working_size': dict(downscale_first=True),
+    }
+    if args.segmentation_size:
+        width, height = (int(v) for v in args.segmentation_size.lower().split('x'))
+        modes[f'seg_{width}x{height}'] = dict(downscale_first=True,
+                                             segmentation_size=(width, height))
+
+    runs = {name: [] for name in modes}
+    for path in images:
+        image_bytes = read_bytes(path)
+        for name, kwargs in modes.items():
+            results = process_parking_image(image_bytes, **kwargs)
+            runs[name].append(results['timings'])
+
+    print(f"{len(images)} images from {args.dataset}")
+    print_table({name: summarize_timings(r) for name, r in runs.items()})
+
+
+def remove_background_png_roundtrip(image_bytes: bytes, session_pool=None) -> np.ndarray:
+    """Implementasi lama remove_background (rembg bytes -> PNG -> cv2.imdecode)"""
+    from PIL import Image as PILImage
+
+    if session_pool is None:
+        session_pool = get_session_pool()
+    with session_pool.session() as session:
+        nobg_result = remove(image_bytes, session=session)
+
+    if isinstance(nobg_result, bytes):
+        nobg_bytes = nobg_result
+    elif isinstance(nobg_result, PILImage.Image):
+        buf = io.BytesIO()
+        nobg_result.save(buf, format='PNG')
+        nobg_bytes = buf.getvalue()
+    else:
+        _, encoded = cv2.imencode('.png', nobg_result)
+        nobg_bytes = encoded.tobytes()
+
+    img_nobg = cv2.imdecode(np.frombuffer(nobg_bytes, np.uint8), cv2.IMREAD_COLOR)
+    if img_nobg is None:
+        raise ValueError("Failed to decode image after background removal")
+    return img_nobg
+
+
+def time_call(func: Callable[[], object], repeat: int) -> List[float]:
+    """Menjalankan func sebanyak repeat kali dan mengembalikan durasi (ms)"""
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append((time.perf_counter() - start) * 1000.0)
+    return durations
+
+
+def bench_remove_background(args):
+    """Microbenchmark remove_background lama (PNG round-trip) vs jalur array"""
+    images = list_images(args.dataset, args.limit)
+    if not images:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+
+    pool = get_session_pool().warm_up()
+    variants = {
+        'png_roundtrip': lambda data, img: remove_background_png_roundtrip(data, pool),
+        'bytes': lambda data, img: remove_background(data, pool),
+        'array_bgr': lambda data, img: remove_background_array(img, pool),
+        'array_mask': lambda data, img: remove_background_array(img, pool, return_type='mask'),
+    }
+
+    durations = {name: [] for name in variants}
+    for path in images:
+        image_bytes = read_bytes(path)
+        image = decode_image(image_bytes)
+        if args.working_size:
+            # Input bytes ikut diperkecil agar semua varian memproses ukuran yang sama
+            image = resize_image(image)
+            image_bytes = cv2.imencode('.jpg', image)[1].tobytes()
+        for name, func in variants.items():
+            durations[name].extend(
+                time_call(lambda: func(image_bytes, image), args.repeat)
+            )
+
+    size = "960x540" if args.working_size else "full resolution"
+    print(f"{len(images)} images x {args.repeat} repeats at {size}")
+    print(f"{'variant':<16}{'mean ms':>12}{'min ms':>12}{'speedup':>10}")
+    baseline = statistics.mean(durations['png_roundtrip'])
+    for name, values in durations.items():
+        mean = statistics.mean(values)
+        print(f"{name:<16}{mean:>12.1f}{min(values):>12.1f}{baseline / mean:>9.2f}x")
+
+
+# ---------------- suite per tahap ----------------
+
+def _stage_decode(ctx):
+    ctx['decoded'] = decode_image(ctx['bytes'], min_size=WORKING_SIZE)
+
+
+def _stage_resize(ctx):
+    ctx['original'] = resize_image(ctx.pop('decoded'))
+
+
+def _stage_remove_background(ctx):
+    mask = remove_background_array(ctx['original'], ctx['pool'], return_type='mask')
+    ctx['nobg'] = apply_foreground_mask(ctx['original'], mask)
+
+
+def _stage_preprocess(ctx):
+    _, ctx['gray_blur'] = preprocess_image(ctx.pop('nobg'))
+
+
+def _stage_threshold(ctx):
+    ctx['thresh'] = apply_threshold(ctx.pop('gray_blur'))
+
+
+def _stage_morphology(ctx):
+    ctx['opening'] = apply_morphology(ctx.pop('thresh'))
+
+
+def _stage_distance_transform(ctx):
+    _, ctx['sure_fg'] = apply_distance_transform(ctx.pop('opening'))
+
+
+def _stage_detect_contours(ctx):
+    roi_motor, ctx['roi_y_start'] = extract_roi(ctx.pop('sure_fg'))
+    ctx['boxes'] = detect_motor_contours(roi_motor, ctx['roi_y_start'])
+
+
+def _stage_parking_slots(ctx):
+    create_parking_slots(ctx['original'], ctx['boxes'], ctx['roi_y_start'])
+
+
+# Urutan tahap sesuai process_parking_image; setiap tahap memakai output sebelumnya
+PIPELINE_STAGES = [
+    ('decode', _stage_decode),
+    ('resize_image', _stage_resize),
+    ('remove_background', _stage_remove_background),
+    ('preprocess_image', _stage_preprocess),
+    ('apply_threshold', _stage_threshold),
+    ('apply_morphology', _stage_morphology),
+    ('apply_distance_transform', _stage_distance_transform),
+    ('detect_motor_contours', _stage_detect_contours),
+    ('create_parking_slots', _stage_parking_slots),
+]
+
+
+def parse_resolution(text: str) -> Optional[Tuple[int, int]]:
+    """'full' -> None, '1920x1080' -> (1920, 1080)"""
+    if text == 'full':
+        return None
+    width, height = (int(v) for v in text.lower().split('x'))
+    return width, height
+
+
+def encode_at_resolution(image_bytes: bytes, resolution: Optional[Tuple[int, int]]) -> bytes:
+    """Menyiapkan input JPEG pada resolusi tertentu (None = file asli)"""
+    if resolution is None:
+        return image_bytes
+    image = cv2.resize(decode_image(image_bytes), resolution, interpolation=cv2.INTER_AREA)
+    return cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, 95])[1].tobytes()
+
+
+def peak_rss_mb() -> float:
+    """Peak RSS proses saat ini (MB); NaN jika tidak bisa diukur"""
+    try:
+        import resource
+    except ImportError:
+        # Windows: modul resource tidak ada, pakai psutil jika terpasang
+        try:
+            import psutil
+        except ImportError:
+            return float('nan')
+        info = psutil.Process().memory_info()
+        return getattr(info, 'peak_wset', info.rss) / (1024 * 1024)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux melaporkan KB, macOS byte
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def current_rss_mb() -> float:
+    """RSS proses saat ini (MB); fallback ke peak RSS di luar Linux"""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024)
+    except (OSError, ValueError, AttributeError):
+        return peak_rss_mb()
+
+
+def percentiles(values_ms: List[float]) -> Dict[str, float]:
+    p50, p95, p99 = np.percentile(values_ms, [50, 95, 99])
+    return {'p50_ms': float(p50), 'p95_ms': float(p95), 'p99_ms': float(p99),
+            'mean_ms': float(np.mean(values_ms))}
+
+
+def run_stage_config(paths: List[str],
+                     resolution: Optional[Tuple[int, int]],
+                     batch_size: int,
+                     repeat: int,
+                     model_name: Optional[str] = None) -> List[Dict]:
+    """
+    Mengukur setiap tahap pipeline untuk satu kombinasi resolusi x batch size
+
+    Setiap batch berisi batch_size gambar yang diproses berurutan per tahap;
+    satu sampel latensi = durasi satu tahap untuk seluruh batch.
+
+    Returns:
+        List[dict]: Satu baris per tahap (persentil, throughput, peak RSS)
+    """
+    start = time.perf_counter()
+    pool = configure_session_pool(model_name=model_name).warm_up()
+    model_load_ms = (time.perf_counter() - start) * 1000.0
+
+    inputs = [encode_at_resolution(read_bytes(path), resolution) for path in paths]
+    batches = [inputs[i:i + batch_size] for i in range(0, len(inputs), batch_size)]
+    samples = {name: [] for name, _ in PIPELINE_STAGES}
+    images = {name: 0 for name, _ in PIPELINE_STAGES}
+    rss_before = peak_rss_mb()
+
+    for _ in range(repeat):
+        for batch in batches:
+            contexts = [{'bytes': data, 'pool': pool} for data in batch]
+            for name, stage in PIPELINE_STAGES:
+                t0 = time.perf_counter()
+                for ctx in contexts:
+                    stage(ctx)
+                samples[name].append((time.perf_counter() - t0) * 1000.0)
+                images[name] += len(contexts)
+
+    label = 'full' if resolution is None else f"{resolution[0]}x{resolution[1]}"
+    rows = []
+    for name, _ in PIPELINE_STAGES:
+        total_s = sum(samples[name]) / 1000.0
+        rows.append(dict(
+            resolution=label,
+            batch_size=batch_size,
+            stage=name,
+            samples=len(samples[name]),
+            throughput_ips=images[name] / total_s if total_s > 0 else float('inf'),
+            **percentiles(samples[name]),
+        ))
+    peak = peak_rss_mb()
+    for row in rows:
+        row['peak_rss_mb'] = peak
+        row['rss_growth_mb'] = peak - rss_before
+        row['model_load_ms'] = model_load_ms
+    return rows
+
+
+def _run_stage_config_task(task):
+    return run_stage_config(*task)
+
+
+def environment_info(model_name: Optional[str]) -> Dict:
+    """Metadata lingkungan untuk membandingkan hasil antar versi"""
+    import onnxruntime
+
+    try:
+        commit = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'],
+            capture_output=True, text=True, check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'git_commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'opencv': cv2.__version__,
+        'numpy': np.__version__,
+        'onnxruntime': onnxruntime.__version__,
+        'model': model_name or os.environ.get('REMBG_MODEL', 'u2net'),
+    }
+
+
+def bench_stages(args):
+    """Benchmark setiap tahap untuk beberapa resolusi input dan batch size"""
+    paths = list_images(args.dataset, args.limit)
+    if not paths:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+
+    resolutions = [parse_resolution(r) for r in args.resolutions.split(',')]
+    batch_sizes = [int(b) for b in args.batch_sizes.split(',')]
+    tasks = [(paths, resolution, batch_size, args.repeat, args.model)
+             for resolution in resolutions for batch_size in batch_sizes]
+
+    rows = []
+    if args.no_isolate:
+        for task in tasks:
+            rows.extend(run_stage_config(*task))
+    else:
+        # Satu proses baru per konfigurasi agar peak RSS tidak tercampur
+        context = multiprocessing.get_context("spawn")
+        with context.Pool(1, maxtasksperchild=1) as pool:
+            for config_rows in pool.imap(_run_stage_config_task, tasks):
+                rows.extend(config_rows)
+
+    print(f"{len(paths)} images x {args.repeat} repeats")
+    print(f"{'resolution':<11}{'batch':>6}  {'stage':<26}{'p50':>9}{'p95':>9}{'p99':>9}"
+          f"{'img/s':>10}{'peakMB':>9}")
+    for row in rows:
+        print(f"{row['resolution']:<11}{row['batch_size']:>6}  {row['stage']:<26}"
+              f"{row['p50_ms']:>9.2f}{row['p95_ms']:>9.2f}{row['p99_ms']:>9.2f}"
+              f"{row['throughput_ips']:>10.1f}{row['peak_rss_mb']:>9.0f}")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'environment': environment_info(args.model), 'results': rows}, f, indent=2)
+        print(f"Saved {args.output}")
+
+
+def bench_compare(args):
+    """Membandingkan dua file hasil 'stages' dan menandai regresi p50"""
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.current) as f:
+        current = json.load(f)
+
+    def index(report):
+        return {(r['resolution'], r['batch_size'], r['stage']): r for r in report['results']}
+
+    old, new = index(baseline), index(current)
+    regressions = 0
+    print(f"baseline {baseline['environment'].get('git_commit')} -> "
+          f"current {current['environment'].get('git_commit')}")
+    print(f"{'resolution':<11}{'batch':>6}  {'stage':<26}{'old p50':>10}{'new p50':>10}{'ratio':>8}")
+    for key in sorted(set(old) & set(new)):
+        ratio = new[key]['p50_ms'] / old[key]['p50_ms'] if old[key]['p50_ms'] > 0 else 1.0
+        flag = ''
+        if ratio > 1.0 + args.threshold and new[key]['p50_ms'] - old[key]['p50_ms'] > args.min_ms:
+            flag = '  REGRESSION'
+            regressions += 1
+        print(f"{key[0]:<11}{key[1]:>6}  {key[2]:<26}{old[key]['p50_ms']:>10.2f}"
+              f"{new[key]['p50_ms']:>10.2f}{ratio:>7.2f}x{flag}")
+
+    if regressions:
+        raise SystemExit(f"{regressions} stage(s) regressed by more than {args.threshold:.0%}")
+
+
+def bench_micro_batch(args):
+    """Throughput vs latensi segmentasi untuk beberapa konfigurasi micro-batch"""
+    _, frames, _ = load_frames(args)
+    pool = configure_session_pool(model_name=args.model).warm_up()
+
+    print(f"{len(frames)} frames, {args.requests} requests, concurrency {args.concurrency}")
+    print(f"{'batch:wait_ms':<15}{'img/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'avg batch':>11}")
+    for config in args.configs.split(','):
+        batch_size, wait_ms = config.split(':')
+        batcher = MicroBatcher(pool, int(batch_size), float(wait_ms)).warm_up()
+        latencies = []
+
+        def request(index):
+            start = time.perf_counter()
+            segment_foreground(frames[index % len(frames)], batcher)
+            latencies.append((time.perf_counter() - start) * 1000.0)
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+            list(executor.map(request, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        batcher.close()
+
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        batches = batcher.stats['batches']
+        avg_batch = batcher.stats['images'] / batches if batches else 1.0
+        print(f"{config:<15}{args.requests / elapsed:>9.2f}{p50:>10.1f}{p95:>10.1f}"
+              f"{p99:>10.1f}{avg_batch:>11.2f}")
+
+
+def mask_iou(a: np.ndarray, b: np.ndarray) -> float:
+    """IoU dua mask setelah dibinerkan pada nilai 128"""
+    a, b = a >= 128, b >= 128
+    union = np.count_nonzero(a | b)
+    return np.count_nonzero(a & b) / union if union else 1.0
+
+
+def bench_backends(args):
+    """Akurasi dan kecepatan backend segmentasi klasik dibanding rembg"""
+    paths, frames, _ = load_frames(args)
+    rgb_frames = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+    labels = load_labels(args.labels) if args.labels else {}
+
+    # Background dipelajari dari frame dataset itu sendiri (kamera tetap)
+    if args.background:
+        static = StaticBackgroundBackend.from_file(args.background, threshold=args.threshold)
+    else:
+        static = StaticBackgroundBackend(learn_background(rgb_frames), threshold=args.threshold)
+    mog2 = MOG2Backend(learning_rate=0.0).learn(rgb_frames)
+    backends = {'rembg': get_session_pool().warm_up(), 'static': static, 'mog2': mog2}
+
+    reference = {}
+    rows = {}
+    for name, backend in backends.items():
+        times, ious, agree, correct, total = [], [], 0, 0, 0
+        for path, frame in zip(paths, frames):
+            start = time.perf_counter()
+            mask = segment_foreground(frame, backend)
+            times.append((time.perf_counter() - start) * 1000.0)
+            slots = analyze_segmentation(frame, mask, stages=())['slot_results']
+            if name == 'rembg':
+                reference[path] = (mask, slots)
+            ref_mask, ref_slots = reference[path]
+            ious.append(mask_iou(mask, ref_mask))
+            agree += sum(s == r for s, r in zip(slots, ref_slots))
+            expected = labels.get(os.path.basename(path), {}).get('slot_results')
+            if expected:
+                correct += sum(s == e for s, e in zip(slots, expected))
+                total += len(expected)
+        rows[name] = {
+            'mask ms': statistics.mean(times),
+            'IoU vs rembg': statistics.mean(ious),
+            'slot agree': agree / sum(len(r[1]) for r in reference.values()),
+            'slot acc (label)': correct / total if total else float('nan'),
+        }
+
+    print(f"{len(frames)} frames at {WORKING_SIZE[0]}x{WORKING_SIZE[1]}")
+    metrics = list(next(iter(rows.values())))
+    print(f"{'backend':<10}" + "".join(f"{m:>18}" for m in metrics))
+    for name, row in rows.items():
+        print(f"{name:<10}" + "".join(f"{row[m]:>18.3f}" for m in metrics))
+
+
+def measure_model(model_name: str, paths: List[str]) -> Dict:
+    """
+    Mengukur satu model rembg di proses ini: ukuran file, waktu muat,
+    tambahan RSS setelah model dimuat, latensi per gambar, serta mask
+    (bit-packed) dan status slot untuk perbandingan akurasi
+    """
+    frames = [resize_image(decode_image(read_bytes(path), min_size=WORKING_SIZE)) for path in paths]
+    rss_before = current_rss_mb()
+    start = time.perf_counter()
+    pool = configure_session_pool(model_name=model_name, size=1).warm_up()
+    load_ms = (time.perf_counter() - start) * 1000.0
+    model_rss_mb = current_rss_mb() - rss_before
+
+    latencies, masks, slots = [], [], []
+    for frame in frames:
+        start = time.perf_counter()
+        mask = segment_foreground(frame, pool)
+        latencies.append((time.perf_counter() - start) * 1000.0)
+        masks.append(np.packbits(mask >= 128))
+        slots.append(analyze_segmentation(frame, mask, stages=())['slot_results'])
+
+    return dict(
+        model=model_name,
+        file_mb=os.path.getsize(resolve_model_path(model_name)) / 1e6,
+        load_ms=load_ms,
+        model_rss_mb=model_rss_mb,
+        peak_rss_mb=peak_rss_mb(),
+        latency=percentiles(latencies),
+        masks=masks,
+        slots=slots,
+    )
+
+
+def _measure_model_task(task):
+    return measure_model(*task)
+
+
+def bench_models(args):
+    """Waktu muat, memori, latensi, dan akurasi beberapa model rembg"""
+    paths = list_images(args.dataset, args.limit)
+    if not paths:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+    labels = load_labels(args.labels) if args.labels else {}
+    models = args.models.split(',')
+
+    # Proses baru per model agar waktu muat dan RSS tidak dipengaruhi model lain
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(1, maxtasksperchild=1) as pool:
+        results = list(pool.imap(_measure_model_task, [(model, paths) for model in models]))
+
+    reference = results[0]
+    print(f"{len(paths)} images; accuracy relative to {reference['model']}")
+    print(f"{'model':<28}{'file MB':>9}{'load ms':>9}{'RSS MB':>8}{'p50 ms':>8}{'p95 ms':>8}"
+          f"{'IoU':>7}{'agree':>7}{'label':>7}")
+    for result in results:
+        ious = []
+        for packed, ref_packed in zip(result['masks'], reference['masks']):
+            a, b = np.unpackbits(packed).astype(bool), np.unpackbits(ref_packed).astype(bool)
+            union = np.count_nonzero(a | b)
+            ious.append(np.count_nonzero(a & b) / union if union else 1.0)
+        agree = total = correct = labelled = 0
+        for path, slots, ref_slots in zip(paths, result['slots'], reference['slots']):
+            agree += sum(s == r for s, r in zip(slots, ref_slots))
+            total += len(ref_slots)
+            expected = labels.get(os.path.basename(path), {}).get('slot_results')
+            if expected:
+                correct += sum(s == e for s, e in zip(slots, expected))
+                labelled += len(expected)
+        name = result['model'] if len(result['model']) <= 27 else "..." + result['model'][-24:]
+        print(f"{name:<28}{result['file_mb']:>9.1f}{result['load_ms']:>9.0f}"
+              f"{result['model_rss_mb']:>8.0f}{result['latency']['p50_ms']:>8.1f}"
+              f"{result['latency']['p95_ms']:>8.1f}{statistics.mean(ious):>7.3f}"
+              f"{agree / total if total else float('nan'):>7.3f}"
+              f"{correct / labelled if labelled else float('nan'):>7.3f}")
+
+
+def occupancy_loop(slots: List[Tuple[int, int, int, int]],
+                   boxes: List[Tuple[float, float, float, float]]) -> List[bool]:
+    """Referensi: cek setiap slot terhadap setiap box dengan loop Python"""
+    return [any(bx < ex and bx + bw > sx and by < ey and by + bh > sy
+                for bx, by, bw, bh in boxes)
+            for sx, sy, ex, ey in slots]
+
+
+def bench_occupancy(args):
+    """Loop Python vs mesin occupancy NumPy untuk berbagai jumlah slot/box"""
+    rng = np.random.default_rng(args.seed)
+    width, height = 3840, 2160
+    print(f"{'slots':>7}{'boxes':>7}{'loop ms':>10}{'rect ms':>10}{'polygon ms':>12}")
+    for slot_count in (int(n) for n in args.slots.split(',')):
+        columns = int(np.ceil(np.sqrt(slot_count * width / height)))
+        rows = int(np.ceil(slot_count / columns))
+        sw, sh = width / columns, height / rows
+        slots = [(int(c * sw), int(r * sh), int((c + 1) * sw), int((r + 1) * sh))
+                 for r in range(rows) for c in range(columns)][:slot_count]
+        rects = SlotLayout.from_rects(slots)
+        # Slot miring (jajaran genjang) dengan bounding rectangle yang sama
+        skew = sw * 0.2
+        polygons = SlotLayout([[(sx + skew, sy), (ex, sy), (ex - skew, ey), (sx, ey)]
+                               for sx, sy, ex, ey in slots])
+        for box_count in (int(n) for n in args.boxes.split(',')):
+            # Box motor berada di dalam separuh slot (slot lain kosong)
+            occupied = rng.choice(slot_count, max(1, slot_count // 2), replace=False)
+            cells = np.array(slots, dtype=np.float64)[rng.choice(occupied, box_count)]
+            size = rng.uniform(0.2, 0.6, (box_count, 2)) * (sw, sh)
+            origin = cells[:, :2] + rng.uniform(0, 1, (box_count, 2)) * ((sw, sh) - size)
+            boxes = [tuple(b) for b in np.concatenate([origin, size], axis=1)]
+            loop = min(time_call(lambda: occupancy_loop(slots, boxes), args.repeat))
+            rect = min(time_call(lambda: slot_occupancy(rects, boxes), args.repeat))
+            polygon = min(time_call(lambda: slot_occupancy(polygons, boxes), args.repeat))
+            if list(slot_occupancy(rects, boxes)) != occupancy_loop(slots, boxes):
+                raise SystemExit("Vectorized occupancy disagrees with the loop reference")
+            print(f"{slot_count:>7}{box_count:>7}{loop:>10.2f}{rect:>10.2f}{polygon:>12.2f}")
+
+
+def add_mask_noise(mask: np.ndarray, fraction: float, rng: np.random.Generator) -> np.ndarray:
+    """Membalik sebagian kecil piksel mask (noise salt-and-pepper)"""
+    if fraction <= 0:
+        return mask
+    noisy = mask.copy()
+    flip = rng.random(mask.shape) < fraction
+    noisy[flip] = 255 - noisy[flip]
+    return noisy
+
+
+def bench_scoring(args):
+    """Scoring slot berbasis kontur vs cv2.integral pada mask dataset"""
+    paths, frames, store = load_frames(args)
+    labels = load_labels(args.labels) if args.labels else {}
+    if store is not None and store.masks is not None:
+        print(f"masks from {args.store} ({store.mask_model}, binarized)")
+        masks = [store.masks[i] for i in range(len(frames))]
+    else:
+        backend = get_session_pool().warm_up()
+        masks = [segment_foreground(frame, backend) for frame in frames]
+
+    configs = [('contours', {'scoring': 'contours'})]
+    for fraction in (float(v) for v in args.min_fractions.split(',')):
+        for score_mask in ('sure_foreground', 'opening'):
+            configs.append((f"integral/{score_mask}@{fraction:g}",
+                            {'scoring': 'integral', 'score_mask': score_mask,
+                             'min_fraction': fraction}))
+
+    rng = np.random.default_rng(0)
+    print(f"{len(frames)} frames at {WORKING_SIZE[0]}x{WORKING_SIZE[1]}; agreement relative to contours")
+    print(f"{'noise':>6}  {'scoring':<34}{'p50 ms':>8}{'slots ms':>10}{'agree':>7}{'label':>7}")
+    for noise in (float(v) for v in args.noise.split(',')):
+        noisy = [add_mask_noise(mask, noise, rng) for mask in masks]
+        reference = None
+        for name, params in configs:
+            durations, slot_ms, results = [], [], []
+            for frame, mask in zip(frames, noisy):
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    result = analyze_segmentation(frame, mask, stages=(), **params)
+                    durations.append((time.perf_counter() - start) * 1000.0)
+                    # Biaya yang berbeda antar mode: kontur + slot, atau integral + lookup
+                    timings = result['timings']
+                    slot_ms.append((timings.get('detect_contours', 0.0)
+                                    + timings['parking_slots']) * 1000.0)
+                results.append(result['slot_results'])
+            if reference is None:
+                reference = results
+            agree = total = correct = labelled = 0
+            for path, slots, ref_slots in zip(paths, results, reference):
+                agree += sum(s == r for s, r in zip(slots, ref_slots))
+                total += len(ref_slots)
+                expected = labels.get(os.path.basename(path), {}).get('slot_results')
+                if expected:
+                    correct += sum(s == e for s, e in zip(slots, expected))
+                    labelled += len(expected)
+            print(f"{noise:>6g}  {name:<34}{percentiles(durations)['p50_ms']:>8.2f}"
+                  f"{statistics.median(slot_ms):>10.3f}{agree / total:>7.3f}"
+                  f"{correct / labelled if labelled else float('nan'):>7.3f}")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark pipeline deteksi parkir")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("resolution", help="rembg resolusi asli vs resolusi kerja")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=0, help="jumlah gambar (0 = semua)")
+    p.add_argument("--segmentation-size", default=None,
+                   help="ukuran inferensi tambahan, mis. 320x320")
+    p.set_defaults(func=bench_resolution)
+
+    p = sub.add_parser("remove-background",
+                       help="remove_background lama (PNG round-trip) vs jalur array")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=5, help="jumlah gambar (0 = semua)")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--working-size", action="store_true",
+                   help="jalankan pada gambar yang sudah di-resize ke 960x540")
+    p.set_defaults(func=bench_remove_background)
+
+    p = sub.add_parser("stages", help="latensi p50/p95/p99, throughput, dan peak RSS per tahap")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=20, help="jumlah gambar (0 = semua)")
+    p.add_argument("--repeat", type=int, default=1)
+    p.add_argument("--resolutions", default="full,1920x1080,960x540",
+                   help="resolusi input dipisah koma ('full' = file asli)")
+    p.add_argument("--batch-sizes", default="1,8", help="batch size dipisah koma")
+    p.add_argument("--model", default=None, help="nama model rembg")
+    p.add_argument("--no-isolate", action="store_true",
+                   help="jalankan semua konfigurasi di proses ini (peak RSS tercampur)")
+    p.add_argument("--output", "-o", default=None, help="simpan hasil ke file JSON")
+    p.set_defaults(func=bench_stages)
+
+    p = sub.add_parser("compare", help="bandingkan dua file JSON hasil 'stages'")
+    p.add_argument("baseline")
+    p.add_argument("current")
+    p.add_argument("--threshold", type=float, default=0.10,
+                   help="kenaikan p50 relatif yang dianggap regresi")
+    p.add_argument("--min-ms", type=float, default=0.5,
+                   help="abaikan selisih absolut di bawah nilai ini")
+    p.set_defaults(func=bench_compare)
+
+    p = sub.add_parser("micro-batch", help="throughput vs latensi micro-batching segmentasi")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=16, help="jumlah frame berbeda")
+    p.add_argument("--requests", type=int, default=64)
+    p.add_argument("--concurrency", type=int, default=8, help="jumlah thread pemanggil")
+    p.add_argument("--configs", default="1:0,2:5,4:10,8:20",
+                   help="daftar max_batch_size:max_wait_ms dipisah koma (1 = tanpa batching)")
+    p.add_argument("--model", default=None, help="nama model rembg")
+    p.add_argument("--store", default=None, help="store frame_store.py (tanpa decode JPEG)")
+    p.set_defaults(func=bench_micro_batch)
+
+    p = sub.add_parser("backends", help="bandingkan backend segmentasi (rembg, static, mog2)")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=30)
+    p.add_argument("--labels", default=None, help="CSV label (lihat param_sweep.py) untuk akurasi slot")
+    p.add_argument("--background", default=None,
+                   help="gambar background untuk 'static' (default: median frame dataset)")
+    p.add_argument("--threshold", type=int, default=30, help="ambang selisih backend 'static'")
+    p.add_argument("--store", default=None, help="store frame_store.py (tanpa decode JPEG)")
+    p.set_defaults(func=bench_backends)
+
+    p = sub.add_parser("models", help="bandingkan model rembg (waktu muat, memori, latensi, akurasi)")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=20)
+    p.add_argument("--models", default="u2net,u2netp,silueta",
+                   help="nama model rembg atau path .onnx dipisah koma (yang pertama = referensi)")
+    p.add_argument("--labels", default=None, help="CSV label (lihat param_sweep.py) untuk akurasi slot")
+    p.set_defaults(func=bench_models)
+
+    p = sub.add_parser("occupancy", help="loop Python vs mesin occupancy NumPy")
+    p.add_argument("--slots", default="4,100,500", help="jumlah slot dipisah koma")
+    p.add_argument("--boxes", default="10,1000,5000", help="jumlah box dipisah koma")
+    p.add_argument("--repeat", type=int, default=5)
+    p.add_argument("--seed", type=int, default=0)
+    p.set_defaults(func=bench_occupancy)
+
+    p = sub.add_parser("scoring", help="scoring slot kontur vs cv2.integral (latensi dan kesesuaian)")
+    p.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    p.add_argument("--limit", type=int, default=30)
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--labels", default=None, help="CSV label (lihat param_sweep.py) untuk akurasi slot")
+    p.add_argument("--min-fractions", default="0.05,0.1,0.2",
+                   help="ambang fraksi foreground scoring integral dipisah koma")
+    p.add_argument("--noise", default="0,0.02",
+                   help="fraksi piksel mask yang dibalik (uji ketahanan terhadap noise)")
+    p.add_argument("--store", default=None, help="store frame_store.py (tanpa decode JPEG)")
+    p.set_defaults(func=bench_scoring)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""
+Store dataset ter-decode: frame ukuran kerja dan mask rembg bit-packed
+dalam file memmap NumPy, untuk eksperimen berulang tanpa decode JPEG
+Kelompok: AFEnter
+
+Isi folder store:
+    frames.npy   uint8 (N, H, W, 3), frame BGR hasil decode_image + resize_image
+    masks.npy    uint8 (N, H, ceil(W/8)), mask foreground >= ambang, np.packbits
+                 per baris (opsional)
+    index.json   path sumber (urut nama), ukuran/mtime sumber, ukuran kerja,
+                 model dan ambang mask, serta file yang gagal di-decode
+
+index.json ditulis paling akhir, sehingga store yang build-nya terputus
+tidak bisa dibuka. Frame dibaca zero-copy dari memmap; mask dibuka per
+gambar (np.unpackbits) menjadi uint8 0/255.
+
+Contoh:
+    python frame_store.py build "dataset/All Dataset" --output store/ --masks
+    python frame_store.py info store/
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_processing import WORKING_SIZE, decode_image, list_image_files, resize_image
+from rembg_session import is_model_path
+from result_cache import SegmentationCache
+from segmentation_backends import get_segmentation_backend
+
+
+INDEX_FILE = 'index.json'
+FRAMES_FILE = 'frames.npy'
+MASKS_FILE = 'masks.npy'
+STORE_VERSION = 1
+
+
+def _model_key(model_name: str) -> str:
+    """Nama model yang sebanding: path .onnx dijadikan absolut"""
+    if is_model_path(model_name):
+        return os.path.abspath(os.path.expanduser(model_name))
+    return model_name
+
+
+def _source_stat(path: str) -> List[int]:
+    stat = os.stat(path)
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+# ---------------- build ----------------
+
+_segmentation_cache: Optional[SegmentationCache] = None
+_working_size: Tuple[int, int] = WORKING_SIZE
+_mask_threshold: Optional[int] = None
+
+
+def _init_build_worker(working_size: Tuple[int, int],
+                       mask_threshold: Optional[int],
+                       cache_dir: Optional[str]):
+    global _segmentation_cache, _working_size, _mask_threshold
+    cv2.setNumThreads(1)
+    _working_size = tuple(working_size)
+    _mask_threshold = mask_threshold
+    if mask_threshold is not None:
+        get_segmentation_backend().warm_up()
+        _segmentation_cache = SegmentationCache(max_entries=1, disk_dir=cache_dir)
+
+
+def _convert_file(task: Tuple[int, str]):
+    index, path = task
+    try:
+        with open(path, "rb") as f:
+            image_bytes = f.read()
+        if _segmentation_cache is None:
+            frame = resize_image(decode_image(image_bytes, min_size=_working_size), *_working_size)
+            return index, frame, None, None
+        # Sama dengan jalur pipeline sehingga mask dari cache disk dipakai ulang
+        frame, mask = _segmentation_cache.segment(image_bytes, working_size=_working_size)
+        return index, frame, np.packbits(mask >= _mask_threshold, axis=-1), None
+    except Exception as e:
+        return index, None, None, f"{type(e).__name__}: {e}"
+
+
+def build_frame_store(paths: List[str],
+                      store_dir: str,
+                      working_size: Tuple[int, int] = WORKING_SIZE,
+                      masks: bool = False,
+                      mask_threshold: int = 128,
+                      workers: Optional[int] = None,
+                      cache_dir: Optional[str] = None) -> Dict:
+    """
+    Men-decode semua gambar sekali dan menulisnya ke store memmap
+
+    Args:
+        paths: File gambar (urutan ini menjadi urutan baris store)
+        store_dir: Folder output (dibuat jika belum ada; isi lama ditimpa)
+        working_size: (width, height) ukuran frame
+        masks: Juga menyimpan mask segmentasi (backend dari
+            get_segmentation_backend, mis. REMBG_MODEL)
+        mask_threshold: Nilai mask (0-255) minimum yang dianggap foreground
+        workers: Jumlah proses worker (default: jumlah core)
+        cache_dir: Folder SegmentationCache di disk; mask yang sudah ada di
+            sana tidak dihitung ulang, dan mask baru ikut disimpan
+
+    Returns:
+        dict: Isi index.json
+    """
+    width, height = working_size
+    os.makedirs(store_dir, exist_ok=True)
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    if os.path.exists(index_path):
+        os.remove(index_path)
+
+    frames = np.lib.format.open_memmap(
+        os.path.join(store_dir, FRAMES_FILE), mode='w+', dtype=np.uint8,
+        shape=(len(paths), height, width, 3))
+    packed = None
+    if masks:
+        packed = np.lib.format.open_memmap(
+            os.path.join(store_dir, MASKS_FILE), mode='w+', dtype=np.uint8,
+            shape=(len(paths), height, (width + 7) // 8))
+
+    errors = {}
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+    initargs = (working_size, mask_threshold if masks else None, cache_dir)
+    with context.Pool(workers, _init_build_worker, initargs) as pool:
+        for index, frame, mask, error in pool.imap_unordered(_convert_file, enumerate(paths)):
+            if error is not None:
+                errors[paths[index]] = error
+                continue
+            frames[index] = frame
+            if packed is not None:
+                packed[index] = mask
+
+    frames.flush()
+    del frames
+    if packed is not None:
+        packed.flush()
+        del packed
+
+    index = {
+        'version': STORE_VERSION,
+        'working_size': [width, height],
+        'paths': list(paths),
+        'sources': [_source_stat(path) for path in paths],
+        'masks': {
+            'model': get_segmentation_backend().model_name,
+            'threshold': mask_threshold,
+        } if masks else None,
+        'errors': errors,
+        'created': time.time(),
+    }
+    tmp_path = index_path + '.tmp'
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index, f, indent=1)
+    os.replace(tmp_path, index_path)
+    return index
+
+
+# ---------------- baca ----------------
+
+class PackedMasks:
+    """Akses mask bit-packed per indeks sebagai uint8 0/255"""
+
+    def __init__(self, packed: np.ndarray, width: int, rows: np.ndarray):
+        self._packed = packed
+        self._width = width
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        mask = np.unpackbits(self._packed[self._rows[index]], axis=-1, count=self._width)
+        return np.multiply(mask, 255, out=mask)
+
+
+class FrameView:
+    """Akses frame per indeks sebagai view read-only dari memmap (zero-copy)"""
+
+    def __init__(self, frames: np.ndarray, rows: np.ndarray):
+        self._frames = frames
+        self._rows = rows
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def __getitem__(self, index: int) -> np.ndarray:
+        return self._frames[self._rows[index]]
+
+
+class FrameStore:
+    """
+    Store hasil build_frame_store. Gambar yang gagal di-decode saat build
+    tidak ikut; ``frames[i]``, ``masks[i]`` dan ``paths[i]`` selalu
+    berpasangan.
+    """
+
+    def __init__(self, store_dir: str, paths: Optional[List[str]] = None):
+        """
+        Args:
+            store_dir: Folder store
+            paths: Hanya baris untuk path ini, dengan urutan ini
+                (default: semua gambar yang berhasil di-decode)
+
+        Raises:
+            ValueError: Jika store tidak lengkap atau path tidak ada di store
+        """
+        index_path = os.path.join(store_dir, INDEX_FILE)
+        if not os.path.exists(index_path):
+            raise ValueError(f"{store_dir!r} is not a frame store (missing {INDEX_FILE})")
+        with open(index_path, encoding="utf-8") as f:
+            self.index = json.load(f)
+        if self.index.get('version') != STORE_VERSION:
+            raise ValueError(f"Unsupported frame store version: {self.index.get('version')!r}")
+
+        self.store_dir = store_dir
+        self.working_size = tuple(self.index['working_size'])
+        self.mask_model = (self.index['masks'] or {}).get('model')
+        errors = self.index['errors']
+        row_of = {os.path.normpath(path): row for row, path in enumerate(self.index['paths'])
+                  if path not in errors}
+        if paths is None:
+            paths = [path for path in self.index['paths'] if path not in errors]
+        missing = [path for path in paths if os.path.normpath(path) not in row_of]
+        if missing:
+            raise ValueError(f"{len(missing)} paths are not in the frame store, e.g. {missing[0]!r}")
+        self.paths = list(paths)
+        rows = np.array([row_of[os.path.normpath(path)] for path in self.paths], dtype=np.intp)
+
+        self.frames = FrameView(
+            np.load(os.path.join(store_dir, FRAMES_FILE), mmap_mode='r'), rows)
+        self.masks = None
+        if self.index['masks'] is not None:
+            self.masks = PackedMasks(
+                np.load(os.path.join(store_dir, MASKS_FILE), mmap_mode='r'),
+                self.working_size[0], rows)
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def check_mask_model(self, model_name: Optional[str]):
+        """
+        Memastikan mask store berasal dari model_name
+
+        Args:
+            model_name: Model yang diminta pemanggil (None = tidak diperiksa)
+
+        Raises:
+            ValueError: Jika store berisi mask dari model lain
+        """
+        if model_name is None or self.masks is None:
+            return
+        if _model_key(model_name) != _model_key(self.mask_model):
+            raise ValueError(f"Frame store {self.store_dir!r} holds masks from {self.mask_model!r}, "
+                             f"not {model_name!r}; rebuild it or drop the model argument")
+
+    def split_paths(self, paths: List[str]) -> Tuple[List[str], List[str]]:
+        """
+        Memisahkan path menjadi (yang bisa dibaca dari store, sisanya).
+        Sisanya adalah path yang tidak ada di store, gagal di-decode saat
+        build, atau file sumbernya berubah sejak build.
+        """
+        known = {os.path.normpath(path) for path in self.paths}
+        in_store = [path for path in paths if os.path.normpath(path) in known]
+        stale = {os.path.normpath(path)
+                 for path in FrameStore(self.store_dir, in_store).stale_paths()}
+        usable = [path for path in in_store if os.path.normpath(path) not in stale]
+        usable_set = set(usable)
+        return usable, [path for path in paths if path not in usable_set]
+
+    def stale_paths(self) -> List[str]:
+        """Path yang file sumbernya sudah berubah atau hilang sejak build"""
+        sources = {os.path.normpath(path): source
+                   for path, source in zip(self.index['paths'], self.index['sources'])}
+        stale = []
+        for path in self.paths:
+            try:
+                changed = _source_stat(path) != sources[os.path.normpath(path)]
+            except OSError:
+                changed = True
+            if changed:
+                stale.append(path)
+        return stale
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Store dataset ter-decode (memmap) untuk eksperimen")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("build", help="decode dataset sekali ke store memmap")
+    p.add_argument("dataset", help="folder dataset, mis. 'dataset/All Dataset'")
+    p.add_argument("--output", "-o", required=True, help="folder store")
+    p.add_argument("--masks", action="store_true",
+                   help="simpan juga mask segmentasi (bit-packed)")
+    p.add_argument("--mask-threshold", type=int, default=128)
+    p.add_argument("--workers", "-j", type=int, default=None)
+    p.add_argument("--cache-dir", default=None,
+                   help="folder cache segmentasi di disk untuk dipakai ulang")
+
+    p = sub.add_parser("info", help="ringkasan isi store")
+    p.add_argument("store")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        store = FrameStore(args.store)
+        size = sum(os.path.getsize(os.path.join(args.store, name))
+                   for name in (FRAMES_FILE, MASKS_FILE, INDEX_FILE)
+                   if os.path.exists(os.path.join(args.store, name)))
+        width, height = store.working_size
+        print(f"{len(store)} frames {width}x{height}, {size / 1e6:.1f} MB, "
+              f"masks: {store.mask_model or '-'}")
+        for path, error in store.index['errors'].items():
+            print(f"  failed: {path}: {error}")
+        stale = store.stale_paths()
+        if stale:
+            print(f"  {len(stale)} source files changed since build; run 'build' again")
+        return
+
+    paths = list_image_files(args.dataset)
+    if not paths:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+    start = time.perf_counter()
+    index = build_frame_store(paths, args.output, masks=args.masks,
+                              mask_threshold=args.mask_threshold,
+                              workers=args.workers, cache_dir=args.cache_dir)
+    elapsed = time.perf_counter() - start
+    print(f"{len(paths) - len(index['errors'])} frames ({len(index['errors'])} failed) "
+          f"in {elapsed:.1f} s -> {args.output}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,49 +5,190 @@ Kelompok: AFEnter
 
 import cv2
 import numpy as np
-from rembg import remove
-from typing import Tuple, List
+from typing import Tuple, List, Optional, Dict, Iterable, Union
 import io
+import os
 
+from instrumentation import request_span, stage_span
+from occupancy import SlotLayout, foreground_integral, slot_occupancy, slot_scores
+from rembg_session import RembgSessionPool
+from segmentation_backends import get_segmentation_backend
+from slot_layouts import get_slot_layout
 
-def remove_background(image_bytes: bytes) -> np.ndarray:
+
+WORKING_SIZE = (960, 540)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.heic')
+
+_REDUCED_DECODE_FLAGS = (
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+)
+
+
+def list_image_files(dataset_path: str) -> List[str]:
+    """
+    Mengambil daftar file gambar di dalam folder (rekursif, urut nama)
+    
+    Args:
+        dataset_path: Folder dataset
+        
+    Returns:
+        List[str]: Path setiap file gambar
+    """
+    images = []
+    for root, _, files in os.walk(dataset_path):
+        for file in files:
+            if file.lower().endswith(IMAGE_EXTENSIONS):
+                images.append(os.path.join(root, file))
+    images.sort()
+    return images
+
+
+def _reduced_decode_flag(image_bytes: bytes, min_size: Tuple[int, int]) -> int:
+    """
+    Memilih flag imdecode dengan faktor pengecilan terbesar yang hasilnya
+    masih tidak lebih kecil dari min_size (orientasi EXIF diperhitungkan)
+    """
+    from PIL import Image as PILImage, UnidentifiedImageError
+    
+    try:
+        # PIL hanya membaca header di sini, piksel belum di-decode
+        with PILImage.open(io.BytesIO(image_bytes)) as probe:
+            src_w, src_h = probe.size
+    except (UnidentifiedImageError, OSError):
+        return cv2.IMREAD_COLOR
+    
+    src_long, src_short = max(src_w, src_h), min(src_w, src_h)
+    min_long, min_short = max(min_size), min(min_size)
+    for factor, flag in _REDUCED_DECODE_FLAGS:
+        if src_long // factor >= min_long and src_short // factor >= min_short:
+            return flag
+    return cv2.IMREAD_COLOR
+
+
+def decode_image(image_bytes: bytes,
+                 min_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Decode bytes gambar menjadi array BGR
+    
+    Args:
+        image_bytes: Bytes dari gambar input
+        min_size: (width, height) minimum hasil decode. Jika gambar sumber
+            jauh lebih besar, decode dilakukan pada skala 1/2, 1/4 atau 1/8
+            (IMREAD_REDUCED_COLOR_*) sehingga CPU dan memori jauh lebih hemat.
+            None = decode resolusi penuh.
+        
+    Returns:
+        np.ndarray: Gambar BGR
+    """
+    flag = cv2.IMREAD_COLOR
+    if min_size is not None:
+        flag = _reduced_decode_flag(image_bytes, min_size)
+    
+    nparr = np.frombuffer(image_bytes, np.uint8)
+    image = cv2.imdecode(nparr, flag)
+    if image is None:
+        raise ValueError("Failed to decode input image")
+    return image
+
+
+def remove_background(image_bytes: bytes,
+                      session_pool: Optional[RembgSessionPool] = None) -> np.ndarray:
     """
     Menghapus background dari gambar menggunakan rembg
     
     Args:
         image_bytes: Bytes dari gambar input
+        session_pool: Pool session rembg (default: pool bersama proses)
         
     Returns:
         np.ndarray: Gambar tanpa background
     """
-    from PIL import Image as PILImage
-    
-    nobg_result = remove(image_bytes)
-    
-    # Convert result to bytes if it's not already
-    if isinstance(nobg_result, bytes):
-        nobg_bytes = nobg_result
-    elif isinstance(nobg_result, PILImage.Image):
-        # Handle PIL Image from rembg
-        buf = io.BytesIO()
-        nobg_result.save(buf, format='PNG')
-        nobg_bytes = buf.getvalue()
-    elif isinstance(nobg_result, np.ndarray):
-        # Handle ndarray
-        _, encoded = cv2.imencode('.png', nobg_result)
-        nobg_bytes = encoded.tobytes()
-    else:
-        # Fallback - try to get bytes
-        nobg_bytes = bytes(nobg_result)
+    return remove_background_array(decode_image(image_bytes), session_pool)
+
+
+def remove_background_array(image: np.ndarray,
+                            session_pool: Optional[RembgSessionPool] = None,
+                            return_type: str = 'bgr',
+                            segmentation_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Menghapus background langsung dari array tanpa encode/decode PNG
+    
+    Args:
+        image: Gambar input (BGR)
+        session_pool: Pool session rembg (default: pool bersama proses)
+        return_type: 'bgr' (background hitam), 'bgra' (alpha = mask),
+            atau 'mask' (mask uint8 saja)
+        segmentation_size: (width, height) untuk inferensi; None = ukuran image
+        
+    Returns:
+        np.ndarray: Hasil sesuai return_type, berukuran sama dengan image
+    """
+    if return_type not in ('bgr', 'bgra', 'mask'):
+        raise ValueError(f"Unknown return_type: {return_type!r}")
     
-    nparr = np.frombuffer(nobg_bytes, np.uint8)
-    img_nobg = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img_nobg is None:
-        raise ValueError("Failed to decode image after background removal")
-    return img_nobg
+    mask = segment_foreground(image, session_pool, segmentation_size)
+    if return_type == 'mask':
+        return mask
+    if return_type == 'bgra':
+        bgra = cv2.cvtColor(image, cv2.COLOR_BGR2BGRA)
+        bgra[:, :, 3] = mask
+        return bgra
+    return apply_foreground_mask(image, mask)
 
 
-def resize_image(image: np.ndarray, width: int = 960, height: int = 540) -> np.ndarray:
+def segment_foreground(image: np.ndarray,
+                       session_pool: Optional[RembgSessionPool] = None,
+                       segmentation_size: Optional[Tuple[int, int]] = None) -> np.ndarray:
+    """
+    Menghasilkan mask foreground rembg langsung dari array gambar
+    
+    Args:
+        image: Gambar input (BGR), biasanya sudah di-resize ke ukuran kerja
+        session_pool: Backend segmentasi dengan predict_mask(rgb): pool session
+            rembg, MicroBatcher, atau backend di segmentation_backends
+            (default: get_segmentation_backend())
+        segmentation_size: (width, height) untuk inferensi; None = ukuran image.
+            Mask hanya diperbesar kembali ke ukuran image, tidak lebih.
+        
+    Returns:
+        np.ndarray: Mask uint8 (0-255) berukuran sama dengan image
+    """
+    if session_pool is None:
+        session_pool = get_segmentation_backend()
+    
+    h, w = image.shape[:2]
+    src = image
+    if segmentation_size is not None and tuple(segmentation_size) != (w, h):
+        src = cv2.resize(image, segmentation_size, interpolation=cv2.INTER_AREA)
+    rgb = cv2.cvtColor(src, cv2.COLOR_BGR2RGB)
+    
+    mask = session_pool.predict_mask(rgb)
+    
+    if mask.shape[:2] != (h, w):
+        mask = cv2.resize(mask, (w, h), interpolation=cv2.INTER_LINEAR)
+    return mask
+
+
+def apply_foreground_mask(image: np.ndarray, mask: np.ndarray) -> np.ndarray:
+    """
+    Menghitamkan background dengan mask foreground (setara cutout rembg
+    yang kanal alpha-nya dibuang)
+    
+    Args:
+        image: Gambar input (BGR)
+        mask: Mask uint8 (0-255) berukuran sama dengan image
+        
+    Returns:
+        np.ndarray: Gambar tanpa background (BGR)
+    """
+    return cv2.multiply(image, cv2.merge((mask, mask, mask)), scale=1.0 / 255)
+
+
+def resize_image(image: np.ndarray,
+                 width: int = WORKING_SIZE[0],
+                 height: int = WORKING_SIZE[1]) -> np.ndarray:
     """
     Resize gambar ke ukuran yang ditentukan
     
@@ -62,18 +203,51 @@ def resize_image(image: np.ndarray, width: int = 960, height: int = 540) -> np.n
     return cv2.resize(image, (width, height))
 
 
-def preprocess_image(image: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+def measure_image_quality(image: np.ndarray,
+                          working_size: Tuple[int, int] = WORKING_SIZE) -> Dict[str, float]:
+    """
+    Metrik validasi murah untuk gambar yang sudah di-decode (boleh hasil
+    decode tereduksi, lihat decode_image). Blur dan exposure diukur pada
+    resolusi kerja pipeline, sehingga ukuran file sumber tidak berpengaruh.
+    
+    Args:
+        image: Gambar BGR
+        working_size: (width, height) resolusi kerja pipeline
+        
+    Returns:
+        Dict[str, float]: 'aspect' (lebar/tinggi sumber), 'blur' (variansi
+        Laplacian), 'brightness' (rata-rata 0-255), 'dark_fraction' dan
+        'bright_fraction' (proporsi piksel < 16 dan >= 240)
+    """
+    h, w = image.shape[:2]
+    gray = resize_image(cv2.cvtColor(image, cv2.COLOR_BGR2GRAY), *working_size)
+    
+    # Laplacian int16 (cukup untuk input uint8) jauh lebih murah dari float64
+    _, std = cv2.meanStdDev(cv2.Laplacian(gray, cv2.CV_16S))
+    hist = cv2.calcHist([gray], [0], None, [256], [0, 256]).ravel() / gray.size
+    return {
+        'aspect': w / h,
+        'blur': float(std[0, 0]) ** 2,
+        'brightness': float(hist @ np.arange(256)),
+        'dark_fraction': float(hist[:16].sum()),
+        'bright_fraction': float(hist[240:].sum()),
+    }
+
+
+def preprocess_image(image: np.ndarray,
+                     blur_kernel: int = 5) -> Tuple[np.ndarray, np.ndarray]:
     """
     Melakukan preprocessing: grayscale dan gaussian blur
     
     Args:
         image: Gambar input (BGR)
+        blur_kernel: Ukuran kernel Gaussian blur (ganjil)
         
     Returns:
         Tuple[np.ndarray, np.ndarray]: (grayscale, blur)
     """
     gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-    gray_blur = cv2.GaussianBlur(gray, (5, 5), 0)
+    gray_blur = cv2.GaussianBlur(gray, (blur_kernel, blur_kernel), 0)
     return gray, gray_blur
 
 
@@ -94,44 +268,73 @@ def apply_threshold(gray_blur: np.ndarray) -> np.ndarray:
     return thresh
 
 
-def apply_morphology(thresh: np.ndarray) -> np.ndarray:
+def apply_morphology(thresh: np.ndarray,
+                     kernel_size: int = 5,
+                     close_iterations: int = 2,
+                     open_iterations: int = 1) -> np.ndarray:
     """
     Menerapkan operasi morfologi (closing + opening)
     
     Args:
         thresh: Binary image hasil threshold
+        kernel_size: Ukuran kernel persegi morfologi
+        close_iterations: Jumlah iterasi closing
+        open_iterations: Jumlah iterasi opening
         
     Returns:
         np.ndarray: Image setelah operasi morfologi
     """
-    kernel = np.ones((5, 5), np.uint8)
-    closing = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=2)
-    opening = cv2.morphologyEx(closing, cv2.MORPH_OPEN, kernel, iterations=1)
+    kernel = np.ones((kernel_size, kernel_size), np.uint8)
+    closing = cv2.morphologyEx(thresh, cv2.MORPH_CLOSE, kernel, iterations=close_iterations)
+    opening = cv2.morphologyEx(closing, cv2.MORPH_OPEN, kernel, iterations=open_iterations)
     return opening
 
 
-def apply_distance_transform(opening: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+def distance_transform(opening: np.ndarray,
+                       fg_ratio: float = 0.3) -> Tuple[np.ndarray, np.ndarray]:
     """
-    Menerapkan distance transform dan menghasilkan sure foreground
-    
+    Menghitung distance transform mentah dan sure foreground
+
     Args:
         opening: Image hasil morfologi
-        
+        fg_ratio: Ambang sure foreground relatif terhadap jarak maksimum
+
     Returns:
-        Tuple[np.ndarray, np.ndarray]: (distance_transform_normalized, sure_foreground)
+        Tuple[np.ndarray, np.ndarray]: (distance_transform float32, sure_foreground)
     """
     dist_transform = cv2.distanceTransform(opening, cv2.DIST_L2, 5)
-    dist_norm = np.zeros_like(dist_transform, dtype=np.float32)
-    cv2.normalize(dist_transform, dist_norm, 0, 1.0, cv2.NORM_MINMAX)
-    
     _, sure_fg_result = cv2.threshold(
         dist_transform,
-        0.3 * dist_transform.max(),
+        fg_ratio * dist_transform.max(),
         255, 0
     )
-    sure_fg = np.uint8(sure_fg_result)
+    return dist_transform, np.array(sure_fg_result, dtype=np.uint8)
+
+
+def normalize_distance(dist_transform: np.ndarray) -> np.ndarray:
+    """Distance transform dinormalisasi ke 0-1 (untuk visualisasi)"""
+    dist_norm = np.zeros_like(dist_transform, dtype=np.float32)
+    cv2.normalize(dist_transform, dist_norm, 0, 1.0, cv2.NORM_MINMAX)
+    return dist_norm
+
+
+def apply_distance_transform(opening: np.ndarray,
+                             normalize: bool = True,
+                             fg_ratio: float = 0.3) -> Tuple[Optional[np.ndarray], np.ndarray]:
+    """
+    Menerapkan distance transform dan menghasilkan sure foreground
     
-    return dist_norm, np.array(sure_fg, dtype=np.uint8)
+    Args:
+        opening: Image hasil morfologi
+        normalize: Jika False, distance transform ternormalisasi (hanya untuk
+            visualisasi) tidak dibuat dan dikembalikan sebagai None
+        fg_ratio: Ambang sure foreground relatif terhadap jarak maksimum
+        
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (distance_transform_normalized, sure_foreground)
+    """
+    dist_transform, sure_fg = distance_transform(opening, fg_ratio)
+    return (normalize_distance(dist_transform) if normalize else None), sure_fg
 
 
 def extract_roi(sure_fg: np.ndarray, roi_percentage: float = 0.35) -> Tuple[np.ndarray, int]:
@@ -183,47 +386,92 @@ def detect_motor_contours(roi_motor: np.ndarray,
     return motor_boxes
 
 
-def create_parking_slots(image: np.ndarray,
-                        motor_boxes: List[Tuple[int, int, int, int]],
+def resolve_slot_layout(image_shape: Tuple[int, ...],
                         roi_y_start: int,
-                        slot_count: int = 4) -> Tuple[np.ndarray, List[str]]:
+                        slot_count: int = 4,
+                        slot_layout: Union[SlotLayout, str, None] = None) -> SlotLayout:
     """
-    Membuat grid slot parkir dan mendeteksi occupancy
+    Layout slot dalam koordinat piksel gambar
     
     Args:
-        image: Gambar original untuk digambar
-        motor_boxes: List bounding boxes motor
+        image_shape: Shape gambar (height, width, ...)
         roi_y_start: Y start dari ROI
         slot_count: Jumlah slot parkir
+        slot_layout: SlotLayout, spesifikasi file layout ('path' atau
+            'path#kamera', lihat slot_layouts.py), atau None = slot_count
+            strip vertikal selebar w // slot_count di bawah ROI
         
     Returns:
-        Tuple[np.ndarray, List[str]]: (Image dengan grid, status setiap slot)
+        SlotLayout: Layout yang sudah diskalakan ke ukuran gambar
     """
-    h, w = image.shape[:2]
-    slot_width = w // slot_count
+    if slot_layout is None:
+        return SlotLayout.strips(image_shape, roi_y_start, slot_count)
+    if isinstance(slot_layout, str):
+        slot_layout = get_slot_layout(slot_layout)
+    return slot_layout.scaled_to(image_shape)
+
+
+def compute_slot_occupancy(image_shape: Tuple[int, ...],
+                           motor_boxes: List[Tuple[int, int, int, int]],
+                           roi_y_start: int,
+                           slot_count: int = 4,
+                           slot_layout: Union[SlotLayout, str, None] = None,
+                           foreground: Optional[np.ndarray] = None) -> Tuple[List[Tuple[int, int, int, int]], List[str]]:
+    """
+    Membagi area parkir menjadi slot dan menentukan occupancy tanpa menggambar
     
-    output_grid = image.copy()
-    slot_results = []
+    Overlap seluruh slot dengan seluruh motor dihitung sekaligus oleh
+    occupancy.slot_occupancy (NumPy), sehingga tetap cepat untuk ratusan slot
+    dan ribuan bounding box. Layout dengan metric 'foreground' dinilai dari
+    mask slot terpack atas citra foreground.
     
-    for i in range(slot_count):
-        sx = i * slot_width
-        sy = roi_y_start
-        ex = sx + slot_width
-        ey = h
+    Args:
+        image_shape: Shape gambar (height, width, ...)
+        motor_boxes: List bounding boxes motor
+        roi_y_start: Y start dari ROI
+        slot_count: Jumlah slot parkir
+        slot_layout: Layout slot (lihat resolve_slot_layout)
+        foreground: Citra sure foreground (wajib untuk metric 'foreground')
         
-        # Cek apakah ada motor dalam slot ini
-        occupied = False
-        for (mx, my, mw, mh) in motor_boxes:
-            if mx < ex and mx + mw > sx:
-                occupied = True
-                break
+    Returns:
+        Tuple[List[Tuple[int, int, int, int]], List[str]]:
+            (rectangle (sx, sy, ex, ey) setiap slot, status setiap slot)
+    """
+    slot_layout = resolve_slot_layout(image_shape, roi_y_start, slot_count, slot_layout)
+    occupied = slot_occupancy(slot_layout, motor_boxes, foreground=foreground)
+    slot_results = ["Occupied" if o else "Empty" for o in occupied]
+    return slot_layout.rects(), slot_results
+
+
+def draw_parking_slots(image: np.ndarray,
+                       slots: List[Tuple[int, int, int, int]],
+                       slot_results: List[str],
+                       slot_layout: Union[SlotLayout, str, None] = None) -> np.ndarray:
+    """
+    Menggambar grid slot parkir beserta statusnya
+    
+    Args:
+        image: Gambar original untuk digambar
+        slots: Rectangle (sx, sy, ex, ey) setiap slot
+        slot_results: Status setiap slot
+        slot_layout: Jika diberikan, slot poligon digambar sebagai poligon
         
-        color = (0, 0, 255) if occupied else (0, 255, 0)
-        status = "Occupied" if occupied else "Empty"
-        slot_results.append(status)
+    Returns:
+        np.ndarray: Salinan image dengan grid slot
+    """
+    output_grid = image.copy()
+    if slot_layout is not None:
+        slot_layout = resolve_slot_layout(image.shape, 0, slot_layout=slot_layout)
+    
+    for i, ((sx, sy, ex, ey), status) in enumerate(zip(slots, slot_results)):
+        color = (0, 0, 255) if status == "Occupied" else (0, 255, 0)
         
-        # Gambar rectangle dan text
-        cv2.rectangle(output_grid, (sx, sy), (ex, ey), color, 3)
+        # Gambar rectangle (atau poligon) dan text
+        if slot_layout is not None and not slot_layout.is_rect[i]:
+            points = np.round(slot_layout.polygons[i]).astype(np.int32)
+            cv2.polylines(output_grid, [points], True, color, 3)
+        else:
+            cv2.rectangle(output_grid, (sx, sy), (ex, ey), color, 3)
         cv2.putText(
             output_grid, 
             status, 
@@ -234,73 +482,518 @@ def create_parking_slots(image: np.ndarray,
             2
         )
     
-    return output_grid, slot_results
+    return output_grid
 
 
-def process_parking_image(image_bytes: bytes) -> dict:
+def create_parking_slots(image: np.ndarray,
+                        motor_boxes: List[Tuple[int, int, int, int]],
+                        roi_y_start: int,
+                        slot_count: int = 4,
+                        slot_layout: Union[SlotLayout, str, None] = None) -> Tuple[np.ndarray, List[str]]:
     """
-    Fungsi utama untuk memproses gambar parkir secara lengkap
+    Membuat grid slot parkir dan mendeteksi occupancy
+    
+    Args:
+        image: Gambar original untuk digambar
+        motor_boxes: List bounding boxes motor
+        roi_y_start: Y start dari ROI
+        slot_count: Jumlah slot parkir
+        slot_layout: Layout slot (lihat resolve_slot_layout)
+        
+    Returns:
+        Tuple[np.ndarray, List[str]]: (Image dengan grid, status setiap slot)
+    """
+    slots, slot_results = compute_slot_occupancy(
+        image.shape, motor_boxes, roi_y_start, slot_count, slot_layout
+    )
+    return draw_parking_slots(image, slots, slot_results, slot_layout), slot_results
+
+
+# Cara menilai slot: 'contours' = kontur motor (bounding box) dibandingkan
+# dengan slot; 'integral' = fraksi foreground slot dari satu cv2.integral
+SCORING_MODES = ('contours', 'integral')
+SCORE_MASKS = ('sure_foreground', 'opening')
+
+STAGE_OUTPUTS = (
+    'original',
+    'no_background',
+    'grayscale',
+    'gaussian_blur',
+    'threshold',
+    'morphology',
+    'distance_transform',
+    'sure_foreground',
+    'final_output',
+)
+
+
+THUMBNAIL_FORMATS = {'webp': cv2.IMWRITE_WEBP_QUALITY, 'jpeg': cv2.IMWRITE_JPEG_QUALITY}
+
+
+def stage_to_uint8(image: np.ndarray) -> np.ndarray:
+    """Citra tahapan sebagai uint8 (distance transform float [0, 1] dikali 255)"""
+    if image.dtype == np.uint8:
+        return image
+    return cv2.convertScaleAbs(image, alpha=255.0)
+
+
+def encode_stage_thumbnails(results: Dict,
+                            stages: Iterable[str] = STAGE_OUTPUTS,
+                            width: int = 320,
+                            fmt: str = 'webp',
+                            quality: int = 80) -> Dict[str, bytes]:
+    """
+    Mengecilkan citra tahapan ke ukuran tampilan dan meng-encode-nya
+    (BGR di-encode langsung, tanpa salinan RGB)
+    
+    Args:
+        results: Hasil process_parking_image
+        stages: Citra tahapan yang dibuat thumbnail-nya (yang ada di results)
+        width: Lebar thumbnail dalam piksel (tinggi mengikuti rasio)
+        fmt: Format encode, salah satu THUMBNAIL_FORMATS
+        quality: Kualitas encode (1-100)
+        
+    Returns:
+        Dict[str, bytes]: Nama tahapan -> bytes gambar ter-encode
+    """
+    if fmt not in THUMBNAIL_FORMATS:
+        raise ValueError(f"Unknown thumbnail format: {fmt!r} (use one of {tuple(THUMBNAIL_FORMATS)})")
+    params = [THUMBNAIL_FORMATS[fmt], int(quality)]
+    thumbnails = {}
+    for stage in stages:
+        image = results.get(stage)
+        if image is None:
+            continue
+        h, w = image.shape[:2]
+        if w > width:
+            image = cv2.resize(image, (width, max(1, round(h * width / w))),
+                               interpolation=cv2.INTER_AREA)
+        ok, encoded = cv2.imencode('.' + fmt, stage_to_uint8(image), params)
+        if not ok:
+            raise ValueError(f"Could not encode {stage!r} as {fmt}")
+        thumbnails[stage] = encoded.tobytes()
+    return thumbnails
+
+
+def segment_parking_image(image_bytes: bytes,
+                          session_pool: Optional[RembgSessionPool] = None,
+                          downscale_first: bool = True,
+                          segmentation_size: Optional[Tuple[int, int]] = None,
+                          working_size: Tuple[int, int] = WORKING_SIZE,
+                          timings: Optional[Dict[str, float]] = None,
+                          decoded: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Tahap mahal pipeline: decode, resize, dan segmentasi foreground rembg.
+    Hasilnya hanya bergantung pada gambar, model, dan parameter di sini,
+    sehingga dapat di-memoize terpisah dari tahap analisis.
     
     Args:
         image_bytes: Bytes dari gambar input
+        session_pool: Pool session rembg (default: pool bersama proses)
+        downscale_first: Jika True, gambar di-decode sekali lalu di-resize ke
+            working_size sebelum remove background. Jika False, rembg
+            dijalankan pada resolusi asli (perilaku lama).
+        segmentation_size: (width, height) untuk inferensi rembg saat
+            downscale_first=True; None = working_size
+        working_size: (width, height) resolusi kerja pipeline
+        timings: Dict untuk mencatat durasi tiap tahap (opsional)
+        decoded: Hasil decode_image(image_bytes, min_size=working_size) yang
+            sudah ada (mis. dari validasi); dipakai hanya jika downscale_first
         
     Returns:
-        dict: Dictionary berisi semua hasil pemrosesan dan statistik
+        Tuple[np.ndarray, np.ndarray]: (gambar original ukuran kerja, mask foreground uint8)
     """
-    # 1. Baca dan resize gambar asli
-    nparr = np.frombuffer(image_bytes, np.uint8)
-    img_original = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-    if img_original is None:
-        raise ValueError("Failed to decode input image")
-    img_original = resize_image(img_original)
+    if timings is None:
+        timings = {}
     
-    # 2. Remove background
-    img_nobg = remove_background(image_bytes)
-    img_nobg = resize_image(img_nobg)
+    # 1. Baca gambar asli (decode sekali, dipakai kedua cabang)
+    if decoded is not None and downscale_first:
+        img_decoded = decoded
+    else:
+        with stage_span(timings, 'decode'):
+            img_decoded = decode_image(
+                image_bytes, min_size=working_size if downscale_first else None
+            )
+    return segment_parking_frame(
+        img_decoded, session_pool, downscale_first, segmentation_size,
+        working_size, timings
+    )
+
+
+def segment_parking_frame(frame: np.ndarray,
+                          session_pool: Optional[RembgSessionPool] = None,
+                          downscale_first: bool = True,
+                          segmentation_size: Optional[Tuple[int, int]] = None,
+                          working_size: Tuple[int, int] = WORKING_SIZE,
+                          timings: Optional[Dict[str, float]] = None) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Seperti segment_parking_image, untuk frame BGR yang sudah di-decode
+    (mis. dari cv2.VideoCapture)
+    
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: (gambar original ukuran kerja, mask foreground uint8)
+    """
+    if timings is None:
+        timings = {}
+    
+    with stage_span(timings, 'resize'):
+        img_original = resize_image(frame, *working_size)
+    
+    # 2. Segmentasi foreground (rembg)
+    with stage_span(timings, 'remove_background'):
+        if downscale_first:
+            mask = segment_foreground(img_original, session_pool, segmentation_size)
+        else:
+            mask = cv2.resize(
+                segment_foreground(frame, session_pool),
+                working_size,
+                interpolation=cv2.INTER_AREA
+            )
+    
+    return img_original, mask
+
+
+def validate_analysis_params(params: Dict) -> None:
+    """
+    Memeriksa rentang parameter numerik analyze_segmentation, agar nilai
+    yang tidak valid gagal sebagai ValueError, bukan cv2.error di tengah
+    pipeline. Parameter yang tidak ada di params dilewati.
+
+    Raises:
+        ValueError: Jika ada parameter di luar rentangnya
+    """
+    for name in ('blur_kernel', 'morph_kernel'):
+        if name in params and (params[name] < 1 or params[name] % 2 == 0):
+            raise ValueError(f"{name} must be a positive odd integer, got {params[name]!r}")
+    for name in ('min_area', 'max_area', 'close_iterations', 'open_iterations'):
+        if name in params and params[name] < 0:
+            raise ValueError(f"{name} must not be negative, got {params[name]!r}")
+    if params.get('slot_count', 1) < 1:
+        raise ValueError(f"slot_count must be at least 1, got {params['slot_count']!r}")
+    if not 0.0 <= params.get('roi_percentage', 0.0) < 1.0:
+        raise ValueError(f"roi_percentage must be in [0, 1), got {params['roi_percentage']!r}")
+    for name in ('fg_ratio', 'min_fraction'):
+        if name in params and not 0.0 <= params[name] <= 1.0:
+            raise ValueError(f"{name} must be in [0, 1], got {params[name]!r}")
+    if params.get('max_motors') is not None and params['max_motors'] < 0:
+        raise ValueError(f"max_motors must not be negative, got {params['max_motors']!r}")
+
+
+def analyze_segmentation(img_original: np.ndarray,
+                         mask: np.ndarray,
+                         stages: Iterable[str] = STAGE_OUTPUTS,
+                         roi_percentage: float = 0.35,
+                         min_area: int = 300,
+                         max_area: int = 250000,
+                         slot_count: int = 4,
+                         blur_kernel: int = 5,
+                         morph_kernel: int = 5,
+                         close_iterations: int = 2,
+                         open_iterations: int = 1,
+                         fg_ratio: float = 0.3,
+                         slot_layout: Union[SlotLayout, str, None] = None,
+                         scoring: str = 'contours',
+                         score_mask: str = 'sure_foreground',
+                         min_fraction: float = 0.1,
+                         max_motors: Optional[int] = None,
+                         timings: Optional[Dict[str, float]] = None) -> dict:
+    """
+    Tahap murah pipeline: dari mask foreground hingga status slot parkir.
+    Cocok untuk mencoba banyak parameter pada satu hasil segmentasi.
+    
+    Args:
+        img_original: Gambar original ukuran kerja (BGR)
+        mask: Mask foreground uint8 dari segment_parking_image
+        stages: Citra tahapan yang ikut dikembalikan (lihat STAGE_OUTPUTS)
+        roi_percentage: Persentase dari atas yang diabaikan (extract_roi)
+        min_area: Luas minimum kontur motor (detect_motor_contours)
+        max_area: Luas maksimum kontur motor (detect_motor_contours)
+        slot_count: Jumlah slot parkir
+        blur_kernel: Ukuran kernel Gaussian blur (preprocess_image)
+        morph_kernel: Ukuran kernel morfologi (apply_morphology)
+        close_iterations: Jumlah iterasi closing (apply_morphology)
+        open_iterations: Jumlah iterasi opening (apply_morphology)
+        fg_ratio: Ambang sure foreground (apply_distance_transform)
+        slot_layout: SlotLayout atau file layout 'path[#kamera]';
+            None = slot_count strip (lihat resolve_slot_layout)
+        scoring: 'contours' (deteksi kontur motor lalu metric layout) atau
+            'integral' (tanpa kontur: fraksi foreground setiap slot dari
+            cv2.integral score_mask; motor_count = jumlah slot terisi)
+        score_mask: Citra untuk scoring='integral': 'sure_foreground' atau
+            'opening' (hasil morfologi; distance transform dilewati)
+        min_fraction: Slot terisi jika fraksi foreground > nilai ini
+            (scoring='integral')
+        max_motors: Batas jumlah motor. Jika terlampaui, analisis berhenti
+            sebelum slot dinilai dan digambar, dan hasilnya hanya berisi
+            'rejected' (True), 'motor_count', 'motor_boxes', dan 'timings'.
+            None = tanpa batas
+        timings: Dict untuk mencatat durasi tiap tahap (opsional)
+        
+    Returns:
+        dict: Citra tahapan yang diminta, statistik, 'slot_scores' (skor
+        per slot: fraksi foreground atau skor metric layout), 'motor_boxes',
+        'rejected' (False), dan 'timings'
+    """
+    stages = frozenset(stages)
+    unknown = stages.difference(STAGE_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown stage outputs: {sorted(unknown)}")
+    if scoring not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {scoring!r} (choose from {SCORING_MODES})")
+    if score_mask not in SCORE_MASKS:
+        raise ValueError(f"Unknown score mask: {score_mask!r} (choose from {SCORE_MASKS})")
+    validate_analysis_params({
+        'roi_percentage': roi_percentage, 'min_area': min_area, 'max_area': max_area,
+        'slot_count': slot_count, 'blur_kernel': blur_kernel, 'morph_kernel': morph_kernel,
+        'close_iterations': close_iterations, 'open_iterations': open_iterations,
+        'fg_ratio': fg_ratio, 'min_fraction': min_fraction, 'max_motors': max_motors,
+    })
+    
+    if timings is None:
+        timings = {}
+    outputs = {}
+    
+    def keep(stage: str, image: np.ndarray):
+        if stage in stages:
+            outputs[stage] = image
+    
+    def reject(motor_count: int, motor_boxes: List) -> dict:
+        return {
+            'rejected': True,
+            'motor_count': motor_count,
+            'motor_boxes': motor_boxes,
+            'timings': timings,
+        }
+    
+    keep('original', img_original)
+    
+    # 2b. Terapkan mask foreground
+    with stage_span(timings, 'apply_mask'):
+        img_nobg = apply_foreground_mask(img_original, mask)
+    keep('no_background', img_nobg)
     
     # 3. Preprocessing
-    gray, gray_blur = preprocess_image(img_nobg)
+    with stage_span(timings, 'preprocess'):
+        gray, gray_blur = preprocess_image(img_nobg, blur_kernel)
+    keep('grayscale', gray)
+    keep('gaussian_blur', gray_blur)
     
     # 4. Threshold
-    thresh = apply_threshold(gray_blur)
+    with stage_span(timings, 'threshold'):
+        thresh = apply_threshold(gray_blur)
+    keep('threshold', thresh)
     
     # 5. Morfologi
-    opening = apply_morphology(thresh)
+    with stage_span(timings, 'morphology'):
+        opening = apply_morphology(thresh, morph_kernel, close_iterations, open_iterations)
+    keep('morphology', opening)
     
-    # 6. Distance Transform
-    dist_norm, sure_fg = apply_distance_transform(opening)
+    # 6. Distance Transform (tidak diperlukan untuk skor integral atas opening).
+    # Normalisasi untuk visualisasi ditunda sampai lolos pemeriksaan max_motors.
+    dist_transform = sure_fg = None
+    if (scoring == 'contours' or score_mask == 'sure_foreground'
+            or stages & {'distance_transform', 'sure_foreground'}):
+        with stage_span(timings, 'distance_transform'):
+            dist_transform, sure_fg = distance_transform(opening, fg_ratio)
+        keep('sure_foreground', sure_fg)
     
     # 7. Extract ROI
-    roi_motor, roi_y_start = extract_roi(sure_fg)
+    roi_motor, roi_y_start = extract_roi(sure_fg if sure_fg is not None else opening, roi_percentage)
     
     # 8. Deteksi motor
-    motor_boxes = detect_motor_contours(roi_motor, roi_y_start)
+    motor_boxes = []
+    if scoring == 'contours':
+        with stage_span(timings, 'detect_contours'):
+            motor_boxes = detect_motor_contours(roi_motor, roi_y_start, min_area, max_area)
+        if max_motors is not None and len(motor_boxes) > max_motors:
+            return reject(len(motor_boxes), motor_boxes)
     
-    # 9. Create parking slots
-    output_grid, slot_results = create_parking_slots(
-        img_original, 
-        motor_boxes, 
-        roi_y_start
-    )
+    # 9. Create parking slots (grid hanya digambar jika diminta)
+    with stage_span(timings, 'parking_slots'):
+        slot_layout = resolve_slot_layout(img_original.shape, roi_y_start, slot_count, slot_layout)
+        if scoring == 'integral':
+            score_image = opening if score_mask == 'opening' else sure_fg
+            scores = slot_layout.masks(score_image.shape).integral_fractions(
+                foreground_integral(score_image)
+            )
+            occupied = scores > min_fraction
+            if max_motors is not None and occupied.sum() > max_motors:
+                return reject(int(occupied.sum()), motor_boxes)
+        else:
+            scores = slot_scores(slot_layout, motor_boxes, foreground=sure_fg)
+            occupied = scores > slot_layout.threshold
+        slots = slot_layout.rects()
+        slot_results = ["Occupied" if o else "Empty" for o in occupied]
+        if 'final_output' in stages:
+            outputs['final_output'] = draw_parking_slots(img_original, slots, slot_results, slot_layout)
+    
+    # 6b. Distance transform ternormalisasi, hanya untuk hasil yang tidak ditolak
+    if dist_transform is not None and 'distance_transform' in stages:
+        with stage_span(timings, 'normalize_distance'):
+            outputs['distance_transform'] = normalize_distance(dist_transform)
     
     # Hitung statistik
     total_slots = len(slot_results)
     occupied_slots = sum(1 for s in slot_results if s == "Occupied")
     empty_slots = total_slots - occupied_slots
     
-    return {
-        'original': img_original,
-        'no_background': img_nobg,
-        'grayscale': gray,
-        'gaussian_blur': gray_blur,
-        'threshold': thresh,
-        'morphology': opening,
-        'distance_transform': dist_norm,
-        'sure_foreground': sure_fg,
-        'final_output': output_grid,
+    outputs.update({
         'slot_results': slot_results,
+        'slot_names': list(slot_layout.names),
+        'slot_scores': [float(score) for score in scores],
         'total_slots': total_slots,
         'occupied_slots': occupied_slots,
         'empty_slots': empty_slots,
-        'motor_count': len(motor_boxes)
-    }
+        'motor_count': len(motor_boxes) if scoring == 'contours' else occupied_slots,
+        'motor_boxes': motor_boxes,
+        'rejected': False,
+        'timings': timings
+    })
+    return outputs
+
+
+def process_parking_image(image_bytes: bytes,
+                          session_pool: Optional[RembgSessionPool] = None,
+                          downscale_first: bool = True,
+                          segmentation_size: Optional[Tuple[int, int]] = None,
+                          stages: Iterable[str] = STAGE_OUTPUTS,
+                          working_size: Tuple[int, int] = WORKING_SIZE,
+                          roi_percentage: float = 0.35,
+                          min_area: int = 300,
+                          max_area: int = 250000,
+                          slot_count: int = 4,
+                          blur_kernel: int = 5,
+                          morph_kernel: int = 5,
+                          close_iterations: int = 2,
+                          open_iterations: int = 1,
+                          fg_ratio: float = 0.3,
+                          slot_layout: Union[SlotLayout, str, None] = None,
+                          scoring: str = 'contours',
+                          score_mask: str = 'sure_foreground',
+                          min_fraction: float = 0.1,
+                          max_motors: Optional[int] = None) -> dict:
+    """
+    Fungsi utama untuk memproses gambar parkir secara lengkap
+    (segment_parking_image lalu analyze_segmentation)
+    
+    Args:
+        image_bytes: Bytes dari gambar input
+        session_pool: Pool session rembg (default: pool bersama proses)
+        downscale_first: Jika True, gambar di-decode sekali lalu di-resize ke
+            working_size sebelum remove background. Jika False, rembg
+            dijalankan pada resolusi asli (perilaku lama).
+        segmentation_size: (width, height) untuk inferensi rembg saat
+            downscale_first=True; None = working_size
+        stages: Nama citra tahapan (lihat STAGE_OUTPUTS) yang ikut
+            dikembalikan. Default semua; gunakan () untuk mode headless
+            yang hanya butuh status slot dan statistik.
+        working_size: (width, height) resolusi kerja pipeline
+        roi_percentage: Persentase dari atas yang diabaikan (extract_roi)
+        min_area: Luas minimum kontur motor (detect_motor_contours)
+        max_area: Luas maksimum kontur motor (detect_motor_contours)
+        slot_count: Jumlah slot parkir
+        blur_kernel: Ukuran kernel Gaussian blur (preprocess_image)
+        morph_kernel: Ukuran kernel morfologi (apply_morphology)
+        close_iterations: Jumlah iterasi closing (apply_morphology)
+        open_iterations: Jumlah iterasi opening (apply_morphology)
+        fg_ratio: Ambang sure foreground (apply_distance_transform)
+        slot_layout: File layout slot 'path' atau 'path#kamera' (dimuat
+            sekali, hot reload saat file berubah) atau SlotLayout;
+            None = slot_count strip di bawah ROI
+        scoring: 'contours' atau 'integral' (lihat analyze_segmentation)
+        score_mask: Citra untuk scoring='integral' (lihat analyze_segmentation)
+        min_fraction: Ambang fraksi foreground untuk scoring='integral'
+        max_motors: Batas jumlah motor untuk penolakan dini (lihat
+            analyze_segmentation); None = tanpa batas
+        
+    Returns:
+        dict: Dictionary berisi citra tahapan yang diminta, statistik,
+        'motor_boxes', dan 'timings' (durasi tiap tahap dalam detik)
+    """
+    stages = frozenset(stages)
+    unknown = stages.difference(STAGE_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown stage outputs: {sorted(unknown)}")
+    
+    timings = {}
+    with request_span():
+        img_original, mask = segment_parking_image(
+            image_bytes, session_pool, downscale_first, segmentation_size,
+            working_size, timings
+        )
+        return analyze_segmentation(
+            img_original, mask, stages,
+            roi_percentage=roi_percentage,
+            min_area=min_area,
+            max_area=max_area,
+            slot_count=slot_count,
+            blur_kernel=blur_kernel,
+            morph_kernel=morph_kernel,
+            close_iterations=close_iterations,
+            open_iterations=open_iterations,
+            fg_ratio=fg_ratio,
+            slot_layout=slot_layout,
+            scoring=scoring,
+            score_mask=score_mask,
+            min_fraction=min_fraction,
+            max_motors=max_motors,
+            timings=timings
+        )
+
+
+def process_parking_frame(frame: np.ndarray,
+                          session_pool: Optional[RembgSessionPool] = None,
+                          downscale_first: bool = True,
+                          segmentation_size: Optional[Tuple[int, int]] = None,
+                          stages: Iterable[str] = STAGE_OUTPUTS,
+                          working_size: Tuple[int, int] = WORKING_SIZE,
+                          roi_percentage: float = 0.35,
+                          min_area: int = 300,
+                          max_area: int = 250000,
+                          slot_count: int = 4,
+                          blur_kernel: int = 5,
+                          morph_kernel: int = 5,
+                          close_iterations: int = 2,
+                          open_iterations: int = 1,
+                          fg_ratio: float = 0.3,
+                          slot_layout: Union[SlotLayout, str, None] = None,
+                          scoring: str = 'contours',
+                          score_mask: str = 'sure_foreground',
+                          min_fraction: float = 0.1,
+                          max_motors: Optional[int] = None) -> dict:
+    """
+    Seperti process_parking_image, untuk frame BGR yang sudah di-decode
+    (mis. frame video). Parameter sama dengan process_parking_image.
+    
+    Returns:
+        dict: Sama dengan process_parking_image (tanpa timing 'decode')
+    """
+    stages = frozenset(stages)
+    unknown = stages.difference(STAGE_OUTPUTS)
+    if unknown:
+        raise ValueError(f"Unknown stage outputs: {sorted(unknown)}")
+    
+    timings = {}
+    with request_span():
+        img_original, mask = segment_parking_frame(
+            frame, session_pool, downscale_first, segmentation_size,
+            working_size, timings
+        )
+        return analyze_segmentation(
+            img_original, mask, stages,
+            roi_percentage=roi_percentage,
+            min_area=min_area,
+            max_area=max_area,
+            slot_count=slot_count,
+            blur_kernel=blur_kernel,
+            morph_kernel=morph_kernel,
+            close_iterations=close_iterations,
+            open_iterations=open_iterations,
+            fg_ratio=fg_ratio,
+            slot_layout=slot_layout,
+            scoring=scoring,
+            score_mask=score_mask,
+            min_fraction=min_fraction,
+            max_motors=max_motors,
+            timings=timings
+        )
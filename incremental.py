@@ -0,0 +1,170 @@
+"""
+Update occupancy inkremental berbasis frame differencing
+Kelompok: AFEnter
+
+Frame kamera parkir yang berurutan hampir identik. Setiap frame baru
+dibandingkan dengan frame referensi (frame terakhir yang diproses penuh)
+pada resolusi kecil, per rectangle slot. Pipeline lengkap (rembg + OpenCV)
+hanya dijalankan ulang jika ada slot yang skor perubahannya melewati ambang;
+selain itu keputusan slot terakhir dipakai ulang.
+
+Catatan: u2net selalu berjalan pada input 320x320, sehingga memotong hanya
+slot yang berubah tidak menghemat inferensi. Karena itu gating dilakukan
+per frame, sedangkan skor perubahan dihitung per slot.
+
+Layout slot dari file diperiksa ulang setiap frame (lihat SlotLayoutStore);
+jika file layout berubah, rectangle slot dihitung ulang dan frame tersebut
+diproses penuh.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from image_processing import WORKING_SIZE, process_parking_frame, resolve_slot_layout
+from rembg_session import RembgSessionPool
+from slot_layouts import get_slot_layout
+
+
+_UNRESOLVED = object()
+
+
+def slot_change_scores(reference: np.ndarray,
+                       current: np.ndarray,
+                       slots: List[Tuple[int, int, int, int]],
+                       pixel_threshold: int = 25) -> List[float]:
+    """
+    Skor perubahan per slot: fraksi piksel yang berubah lebih dari
+    pixel_threshold (grayscale) di dalam rectangle slot
+
+    Args:
+        reference: Frame referensi grayscale
+        current: Frame saat ini grayscale (ukuran sama)
+        slots: Rectangle (sx, sy, ex, ey) dalam koordinat kedua frame
+        pixel_threshold: Selisih intensitas minimum agar piksel dianggap berubah
+
+    Returns:
+        List[float]: Skor 0-1 untuk setiap slot
+    """
+    diff = cv2.absdiff(reference, current)
+    _, changed = cv2.threshold(diff, pixel_threshold, 1, cv2.THRESH_BINARY)
+    scores = []
+    for sx, sy, ex, ey in slots:
+        area = max(1, (ex - sx) * (ey - sy))
+        scores.append(cv2.countNonZero(changed[sy:ey, sx:ex]) / area)
+    return scores
+
+
+class IncrementalOccupancy:
+    """
+    Menyimpan frame referensi dan keputusan slot terakhir, lalu menjalankan
+    ulang pipeline hanya untuk frame yang berubah cukup besar
+    """
+
+    def __init__(self,
+                 session_pool: Optional[RembgSessionPool] = None,
+                 change_threshold: float = 0.02,
+                 pixel_threshold: int = 25,
+                 diff_scale: int = 4,
+                 max_reuse_frames: int = 0,
+                 **params):
+        """
+        Args:
+            session_pool: Pool session rembg (default: pool bersama proses)
+            change_threshold: Fraksi piksel berubah dalam satu slot yang
+                memicu pemrosesan ulang
+            pixel_threshold: Selisih intensitas minimum per piksel
+            diff_scale: Faktor pengecilan resolusi kerja untuk differencing
+            max_reuse_frames: Paksa pemrosesan penuh setelah sejumlah frame
+                dipakai ulang berturut-turut (0 = tidak pernah)
+            **params: Parameter pipeline untuk process_parking_frame (tanpa
+                max_motors: frame yang ditolak tidak punya status slot)
+        """
+        if params.get('max_motors') is not None:
+            raise ValueError("max_motors is not supported for incremental occupancy")
+        self.session_pool = session_pool
+        self.change_threshold = change_threshold
+        self.pixel_threshold = pixel_threshold
+        self.max_reuse_frames = max_reuse_frames
+        self.params = params
+
+        width, height = params.get('working_size', WORKING_SIZE)
+        self.diff_scale = diff_scale
+        self.diff_size = (max(1, width // diff_scale), max(1, height // diff_scale))
+        self._layout = _UNRESOLVED
+        self.slots: List[Tuple[int, int, int, int]] = []
+        self._refresh_slots()
+
+        self.reference: Optional[np.ndarray] = None
+        self.last_result: Optional[Dict] = None
+        self.reused = 0
+        self.stats = {'frames': 0, 'recomputed': 0}
+
+    def _refresh_slots(self) -> bool:
+        """
+        Menghitung ulang rectangle slot jika layout berubah (file layout
+        dimuat ulang oleh get_slot_layout menghasilkan objek baru)
+
+        Returns:
+            bool: True jika rectangle slot dihitung ulang
+        """
+        layout = self.params.get('slot_layout')
+        if isinstance(layout, str):
+            layout = get_slot_layout(layout)
+        if layout is self._layout:
+            return False
+        self._layout = layout
+        width, height = self.params.get('working_size', WORKING_SIZE)
+        # Rectangle slot pada resolusi kerja, diperkecil ke resolusi differencing
+        rects = resolve_slot_layout(
+            (height, width), int(height * self.params.get('roi_percentage', 0.35)),
+            self.params.get('slot_count', 4), layout
+        ).rects()
+        self.slots = [tuple(int(v) // self.diff_scale for v in rect) for rect in rects]
+        return True
+
+    def _thumbnail(self, frame: np.ndarray) -> np.ndarray:
+        small = cv2.resize(frame, self.diff_size, interpolation=cv2.INTER_AREA)
+        return cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+
+    def reset(self):
+        """Melupakan frame referensi; frame berikutnya diproses penuh"""
+        self.reference = None
+        self.last_result = None
+        self.reused = 0
+
+    def update(self, frame: np.ndarray) -> Dict:
+        """
+        Memproses satu frame BGR
+
+        Returns:
+            dict: slot_results, total_slots, occupied_slots, empty_slots,
+            motor_count, motor_boxes, ditambah 'recomputed' (bool) dan
+            'change_scores' (skor per slot terhadap frame referensi)
+        """
+        self.stats['frames'] += 1
+        if self._refresh_slots():
+            # Keputusan lama milik layout sebelumnya
+            self.reset()
+        thumbnail = self._thumbnail(frame)
+
+        scores = None
+        if self.reference is not None:
+            scores = slot_change_scores(self.reference, thumbnail, self.slots, self.pixel_threshold)
+            stale = self.max_reuse_frames and self.reused >= self.max_reuse_frames
+            # Layout tanpa slot tidak punya dasar untuk dipakai ulang: selalu proses penuh
+            if scores and max(scores) < self.change_threshold and not stale:
+                self.reused += 1
+                return dict(self.last_result, recomputed=False, change_scores=scores)
+
+        results = process_parking_frame(frame, self.session_pool, stages=(), **self.params)
+        self.last_result = {key: results[key] for key in (
+            'slot_results', 'total_slots', 'occupied_slots', 'empty_slots',
+            'motor_count', 'motor_boxes',
+        )}
+        self.reference = thumbnail
+        self.reused = 0
+        self.stats['recomputed'] += 1
+        return dict(self.last_result, recomputed=True,
+                    change_scores=scores if scores is not None else [1.0] * len(self.slots))
@@ -0,0 +1,375 @@
+"""
+Instrumentasi pipeline: span per tahap, kolektor metrik di memori, dan
+exporter teks format Prometheus ke file lokal
+Kelompok: AFEnter
+
+Tanpa observer terdaftar, span hanya mengisi dict timings seperti biasa
+(satu pengecekan tuple kosong per tahap).
+
+Contoh:
+    collector = MetricsCollector()
+    add_observer(collector)
+    exporter = PrometheusFileExporter(collector, "metrics.prom").start()
+"""
+
+import bisect
+import math
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+
+DURATION_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTES_BUCKETS = tuple(float(1 << shift) for shift in range(10, 31, 2))  # 1 KiB .. 1 GiB
+
+
+class Observer:
+    """Basis observer instrumentasi; override metode yang dibutuhkan"""
+
+    def on_stage(self, stage: str, seconds: float, allocated_bytes: Optional[int]):
+        """Dipanggil setiap kali satu tahap pipeline selesai"""
+
+    def on_request(self, seconds: float, error: Optional[BaseException]):
+        """Dipanggil setiap kali satu pemrosesan gambar selesai (atau gagal)"""
+
+    def on_counter(self, name: str, value: float, labels: Dict[str, str]):
+        """Dipanggil untuk counter bebas (mis. hit/miss cache)"""
+
+
+_observers: Tuple[Observer, ...] = ()
+_track_allocations = False
+_lock = threading.Lock()
+
+
+def add_observer(observer: Observer, track_allocations: bool = False) -> Observer:
+    """
+    Mendaftarkan observer untuk seluruh pipeline di proses ini
+
+    Args:
+        observer: Observer (mis. MetricsCollector)
+        track_allocations: Jika True, byte yang dialokasikan tiap tahap ikut
+            diukur dengan tracemalloc (menambah overhead; hanya alokasi lewat
+            allocator Python/NumPy, bukan arena ONNX Runtime)
+
+    Returns:
+        Observer: Observer yang didaftarkan
+    """
+    global _observers, _track_allocations
+    with _lock:
+        if observer not in _observers:
+            _observers = _observers + (observer,)
+        if track_allocations:
+            _track_allocations = True
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+    return observer
+
+
+def remove_observer(observer: Observer):
+    """Melepas observer; tracemalloc dihentikan jika tidak ada observer tersisa"""
+    global _observers, _track_allocations
+    with _lock:
+        _observers = tuple(o for o in _observers if o is not observer)
+        if not _observers and _track_allocations:
+            _track_allocations = False
+            tracemalloc.stop()
+
+
+def enabled() -> bool:
+    """True jika ada observer yang terdaftar"""
+    return bool(_observers)
+
+
+@contextmanager
+def stage_span(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """
+    Mengukur satu tahap pipeline: durasi (detik) dicatat ke timings[stage]
+    dan diteruskan ke observer yang terdaftar
+
+    Jika pelacakan alokasi aktif, alokasi diukur sebagai kenaikan puncak
+    tracemalloc selama tahap berjalan (perkiraan bila beberapa thread
+    memproses gambar bersamaan).
+    """
+    observers = _observers
+    if not observers:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            timings[stage] = time.perf_counter() - start
+        return
+
+    track = _track_allocations and tracemalloc.is_tracing()
+    if track:
+        base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        timings[stage] = seconds
+        allocated = tracemalloc.get_traced_memory()[1] - base if track else None
+        for observer in observers:
+            observer.on_stage(stage, seconds, allocated)
+
+
+@contextmanager
+def request_span() -> Iterator[None]:
+    """Mengukur satu pemrosesan gambar lengkap (termasuk yang gagal)"""
+    observers = _observers
+    if not observers:
+        yield
+        return
+
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except BaseException as e:
+        error = e
+        raise
+    finally:
+        seconds = time.perf_counter() - start
+        for observer in observers:
+            observer.on_request(seconds, error)
+
+
+def increment(name: str, value: float = 1.0, **labels: str):
+    """Menambah counter bebas pada seluruh observer (no-op jika nonaktif)"""
+    for observer in _observers:
+        observer.on_counter(name, value, labels)
+
+
+class Histogram:
+    """Histogram kumulatif sederhana dengan bucket tetap"""
+
+    def __init__(self, buckets: Sequence[float]):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Perkiraan kuantil dengan interpolasi linear di dalam bucket"""
+        if self.count == 0:
+            return math.nan
+        rank = q * self.count
+        cumulative = 0
+        lower = 0.0
+        for upper, count in zip(self.buckets + (math.inf,), self.counts):
+            if cumulative + count >= rank and count > 0:
+                if math.isinf(upper):
+                    return lower
+                return lower + (upper - lower) * (rank - cumulative) / count
+            cumulative += count
+            lower = upper
+        return lower
+
+
+def _label_key(labels: Dict[str, str]) -> Tuple[Tuple[str, str], ...]:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(labels: Tuple[Tuple[str, str], ...], extra: Tuple[Tuple[str, str], ...] = ()) -> str:
+    pairs = labels + extra
+    if not pairs:
+        return ""
+    escaped = (k + '="' + v.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+               for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+
+class MetricsCollector(Observer):
+    """
+    Kolektor metrik di memori (thread-safe)
+
+    Metrik yang dikumpulkan:
+        parking_stage_duration_seconds{stage}    histogram
+        parking_stage_allocated_bytes{stage}     histogram (jika alokasi dilacak)
+        parking_request_duration_seconds         histogram
+        parking_requests_total / parking_request_errors_total
+        parking_<name>{labels}                   counter dari increment()
+    """
+
+    def __init__(self,
+                 duration_buckets: Sequence[float] = DURATION_BUCKETS,
+                 bytes_buckets: Sequence[float] = BYTES_BUCKETS):
+        self.duration_buckets = tuple(duration_buckets)
+        self.bytes_buckets = tuple(bytes_buckets)
+        self._histograms: Dict[Tuple[str, tuple], Histogram] = {}
+        self._counters: Dict[Tuple[str, tuple], float] = {}
+        self._lock = threading.Lock()
+
+    def _observe(self, name: str, labels: tuple, value: float, buckets: Sequence[float]):
+        histogram = self._histograms.get((name, labels))
+        if histogram is None:
+            histogram = self._histograms[(name, labels)] = Histogram(buckets)
+        histogram.observe(value)
+
+    def _add(self, name: str, labels: tuple, value: float):
+        self._counters[(name, labels)] = self._counters.get((name, labels), 0.0) + value
+
+    def on_stage(self, stage: str, seconds: float, allocated_bytes: Optional[int]):
+        labels = (('stage', stage),)
+        with self._lock:
+            self._observe('parking_stage_duration_seconds', labels, seconds, self.duration_buckets)
+            if allocated_bytes is not None:
+                self._observe('parking_stage_allocated_bytes', labels,
+                              allocated_bytes, self.bytes_buckets)
+
+    def on_request(self, seconds: float, error: Optional[BaseException]):
+        with self._lock:
+            self._observe('parking_request_duration_seconds', (), seconds, self.duration_buckets)
+            self._add('parking_requests_total', (), 1)
+            if error is not None:
+                self._add('parking_request_errors_total',
+                          (('error', type(error).__name__),), 1)
+
+    def on_counter(self, name: str, value: float, labels: Dict[str, str]):
+        with self._lock:
+            self._add(f'parking_{name}', _label_key(labels), value)
+
+    def reset(self):
+        """Menghapus seluruh metrik"""
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def snapshot(self) -> Dict:
+        """
+        Ringkasan metrik saat ini
+
+        Returns:
+            dict: {'counters': {...}, 'histograms': {...}} dengan kunci
+            'nama{label}' dan untuk histogram: count, sum, mean, p50, p95, p99
+        """
+        with self._lock:
+            counters = {name + _format_labels(labels): value
+                        for (name, labels), value in self._counters.items()}
+            histograms = {}
+            for (name, labels), h in self._histograms.items():
+                histograms[name + _format_labels(labels)] = {
+                    'count': h.count,
+                    'sum': h.sum,
+                    'mean': h.sum / h.count if h.count else math.nan,
+                    'p50': h.quantile(0.50),
+                    'p95': h.quantile(0.95),
+                    'p99': h.quantile(0.99),
+                }
+        return {'counters': counters, 'histograms': histograms}
+
+    def to_prometheus(self) -> str:
+        """Merender metrik dalam format teks eksposisi Prometheus"""
+        lines: List[str] = []
+        with self._lock:
+            seen = set()
+            for (name, labels), value in sorted(self._counters.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} counter")
+                    seen.add(name)
+                lines.append(f"{name}{_format_labels(labels)} {_format_value(value)}")
+
+            for (name, labels), h in sorted(self._histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                cumulative = 0
+                for upper, count in zip(h.buckets + (math.inf,), h.counts):
+                    cumulative += count
+                    le = (('le', _format_value(upper) if math.isinf(upper) else f"{upper:g}"),)
+                    lines.append(f"{name}_bucket{_format_labels(labels, le)} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(h.sum)}")
+                lines.append(f"{name}_count{_format_labels(labels)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+
+def write_prometheus(collector: MetricsCollector, path: str):
+    """Menulis metrik ke file teks secara atomik (untuk node_exporter textfile collector)"""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".prom")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(collector.to_prometheus())
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+
+
+class PrometheusFileExporter:
+    """Thread latar yang menulis metrik collector ke file secara berkala"""
+
+    def __init__(self, collector: MetricsCollector, path: str, interval: float = 15.0):
+        """
+        Args:
+            collector: Sumber metrik
+            path: File tujuan (mis. /var/lib/node_exporter/parking.prom)
+            interval: Jeda antar penulisan dalam detik
+        """
+        self.collector = collector
+        self.path = path
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            write_prometheus(self.collector, self.path)
+
+    def start(self) -> "PrometheusFileExporter":
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="prometheus-exporter", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        """Menghentikan thread lalu menulis metrik terakhir"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        write_prometheus(self.collector, self.path)
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def configure_from_env() -> Optional[MetricsCollector]:
+    """
+    Mengaktifkan metrik dari variabel environment
+
+    ``PARKING_METRICS_FILE``: file output Prometheus (wajib untuk mengaktifkan)
+    ``PARKING_METRICS_INTERVAL``: jeda penulisan dalam detik (default 15)
+    ``PARKING_TRACK_ALLOCATIONS``: '1' untuk mengukur alokasi per tahap
+
+    Returns:
+        MetricsCollector atau None jika PARKING_METRICS_FILE tidak di-set
+    """
+    path = os.environ.get("PARKING_METRICS_FILE")
+    if not path:
+        return None
+    collector = MetricsCollector()
+    add_observer(collector, track_allocations=os.environ.get("PARKING_TRACK_ALLOCATIONS") == "1")
+    interval = float(os.environ.get("PARKING_METRICS_INTERVAL", "15"))
+    PrometheusFileExporter(collector, path, interval).start()
+    return collector
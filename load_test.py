@@ -0,0 +1,120 @@
+"""
+Load test sederhana untuk service.py
+Kelompok: AFEnter
+
+Mengirim gambar dataset ke POST /v1/parking dari banyak koneksi bersamaan,
+lalu melaporkan throughput, persentil latensi, dan jumlah per status HTTP
+(503 = ditolak backpressure).
+
+Contoh:
+    python service.py --workers 2 --max-queue 8 &
+    python load_test.py --concurrency 16 --requests 200
+"""
+
+import argparse
+import http.client
+import os
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from image_processing import list_image_files
+
+
+def run_load_test(url: str,
+                  payloads: List[bytes],
+                  concurrency: int,
+                  total_requests: int,
+                  timeout: float = 120.0) -> Tuple[List[float], Counter, float]:
+    """
+    Menjalankan load test dengan satu koneksi keep-alive per thread klien
+
+    Returns:
+        Tuple: (latensi ms request sukses, jumlah per status, durasi total detik)
+    """
+    target = urlsplit(url)
+    local = threading.local()
+    counter = iter(range(total_requests))
+    counter_lock = threading.Lock()
+
+    def connection():
+        if getattr(local, 'conn', None) is None:
+            local.conn = http.client.HTTPConnection(target.hostname, target.port or 80,
+                                                    timeout=timeout)
+        return local.conn
+
+    def client(_):
+        latencies, statuses = [], Counter()
+        while True:
+            with counter_lock:
+                index = next(counter, None)
+            if index is None:
+                return latencies, statuses
+            body = payloads[index % len(payloads)]
+            start = time.perf_counter()
+            try:
+                conn = connection()
+                conn.request("POST", target.path or "/v1/parking", body,
+                             {'Content-Type': 'application/octet-stream'})
+                response = conn.getresponse()
+                response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+                    local.conn = None
+            except (OSError, http.client.HTTPException) as e:
+                status = type(e).__name__
+                local.conn = None
+            elapsed = (time.perf_counter() - start) * 1000.0
+            statuses[status] += 1
+            if status == 200:
+                latencies.append(elapsed)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        results = list(executor.map(client, range(concurrency)))
+    duration = time.perf_counter() - start
+
+    latencies, statuses = [], Counter()
+    for client_latencies, client_statuses in results:
+        latencies.extend(client_latencies)
+        statuses.update(client_statuses)
+    return latencies, statuses, duration
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Load test untuk service.py")
+    parser.add_argument("--url", default="http://127.0.0.1:8000/v1/parking")
+    parser.add_argument("--dataset", default=os.path.join("dataset", "All Dataset"))
+    parser.add_argument("--images", type=int, default=10, help="jumlah gambar berbeda yang dikirim")
+    parser.add_argument("--concurrency", "-c", type=int, default=8)
+    parser.add_argument("--requests", "-n", type=int, default=100)
+    args = parser.parse_args(argv)
+
+    paths = list_image_files(args.dataset)[:args.images]
+    if not paths:
+        raise SystemExit(f"No images found in {args.dataset!r}")
+    payloads = []
+    for path in paths:
+        with open(path, "rb") as f:
+            payloads.append(f.read())
+
+    latencies, statuses, duration = run_load_test(
+        args.url, payloads, args.concurrency, args.requests)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {duration:.1f} s")
+    print("status: " + ", ".join(f"{status}={count}" for status, count in sorted(
+        statuses.items(), key=lambda item: str(item[0]))))
+    if latencies:
+        p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+        print(f"throughput: {len(latencies) / duration:.2f} ok/s")
+        print(f"latency ms: p50={p50:.1f} p95={p95:.1f} p99={p99:.1f} max={max(latencies):.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+"""
+Micro-batching inferensi segmentasi rembg
+Kelompok: AFEnter
+
+Request segmentasi dari banyak thread dikumpulkan selama maksimal
+``max_wait_ms`` atau sampai ``max_batch_size`` gambar, lalu dijalankan
+sebagai satu inferensi ONNX berbatch. Normalisasi input dan resize mask
+tetap dikerjakan di thread pemanggil, sehingga thread dispatcher hanya
+menjalankan model.
+
+Hanya model keluarga U2-Net (u2net, u2netp, u2net_human_seg, silueta,
+u2net_custom) dengan dimensi batch input dinamis yang dibatch; model lain
+(termasuk .onnx yang diekspor dengan batch tetap) diproses satu per satu.
+
+Contoh:
+    batcher = MicroBatcher(get_session_pool(), max_batch_size=8, max_wait_ms=10)
+    results = process_parking_image(image_bytes, batcher)
+"""
+
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from rembg_session import RembgSessionPool, get_session_pool
+
+
+# Session rembg yang memakai pre/post-processing U2-Net (input 320x320, dimensi batch dinamis)
+BATCHABLE_SESSIONS = frozenset({
+    'U2netSession', 'U2netpSession', 'U2netHumanSegSession', 'SiluetaSession', 'U2netCustomSession',
+})
+U2NET_INPUT_SIZE = (320, 320)
+U2NET_MEAN = np.array([0.485, 0.456, 0.406], dtype=np.float32)
+U2NET_STD = np.array([0.229, 0.224, 0.225], dtype=np.float32)
+
+
+def normalize_u2net(rgb: np.ndarray) -> np.ndarray:
+    """
+    Pre-processing input U2-Net, sama dengan rembg (resize LANCZOS 320x320,
+    bagi nilai maksimum, normalisasi mean/std)
+
+    Returns:
+        np.ndarray: Tensor float32 (3, 320, 320)
+    """
+    image = np.asarray(Image.fromarray(rgb).resize(U2NET_INPUT_SIZE, Image.Resampling.LANCZOS))
+    image = image.astype(np.float32) / max(float(image.max()), 1e-6)
+    return ((image - U2NET_MEAN) / U2NET_STD).transpose((2, 0, 1))
+
+
+def postprocess_u2net(prediction: np.ndarray, size: Tuple[int, int]) -> np.ndarray:
+    """
+    Post-processing output U2-Net seperti rembg: normalisasi min-max lalu
+    resize LANCZOS ke size (width, height)
+
+    Returns:
+        np.ndarray: Mask uint8 (0-255)
+    """
+    lo, hi = prediction.min(), prediction.max()
+    pred = (prediction - lo) / (hi - lo)
+    mask = Image.fromarray((pred.clip(0, 1) * 255).astype(np.uint8))
+    return np.asarray(mask.resize(size, Image.Resampling.LANCZOS))
+
+
+class MicroBatcher:
+    """
+    Penjadwal micro-batch di depan RembgSessionPool
+
+    Objek ini dapat dipakai di mana pun session_pool diterima
+    (process_parking_image, segment_foreground, ResultCache, ...).
+    """
+
+    def __init__(self,
+                 session_pool: Optional[RembgSessionPool] = None,
+                 max_batch_size: int = 8,
+                 max_wait_ms: float = 10.0):
+        """
+        Args:
+            session_pool: Pool session rembg yang menjalankan batch
+                (default: pool bersama proses)
+            max_batch_size: Jumlah gambar maksimum per inferensi
+            max_wait_ms: Waktu tunggu maksimum sejak request pertama dalam
+                batch sebelum batch dijalankan
+        """
+        if max_batch_size < 1:
+            raise ValueError("max_batch_size must be at least 1")
+        self.session_pool = session_pool or get_session_pool()
+        self.model_name = self.session_pool.model_name
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.stats = {'batches': 0, 'images': 0}
+
+        with self.session_pool.session() as sess:
+            self.batchable = False
+            self._input_name = None
+            if type(sess).__name__ in BATCHABLE_SESSIONS:
+                model_input = sess.inner_session.get_inputs()[0]
+                # Dimensi batch tetap (int) -> model tidak bisa menerima batch > 1
+                self.batchable = not isinstance(model_input.shape[0], int)
+                self._input_name = model_input.name
+
+        self._queue: "queue.Queue" = queue.Queue()
+        self._closed = False
+        self._submit_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._start_lock = threading.Lock()
+
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(
+                        target=self._dispatch, name="rembg-micro-batch", daemon=True)
+                    self._thread.start()
+
+    def _collect(self, first) -> List:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is None:
+                # Sinyal berhenti: jalankan batch ini dulu, lalu keluar
+                self._queue.put(None)
+                break
+            batch.append(item)
+        return batch
+
+    def _dispatch(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = self._collect(item)
+            try:
+                tensors = np.stack([tensor for tensor, _ in batch])
+                with self.session_pool.session() as sess:
+                    outputs = sess.inner_session.run(None, {self._input_name: tensors})[0]
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+            self.stats['batches'] += 1
+            self.stats['images'] += len(batch)
+            for index, (_, future) in enumerate(batch):
+                future.set_result(outputs[index, 0])
+
+    def predict_mask(self, rgb: np.ndarray) -> np.ndarray:
+        """
+        Seperti RembgSessionPool.predict_mask, tetapi inferensinya digabung
+        dengan request lain yang datang bersamaan (blocking sampai selesai)
+        """
+        if not self.batchable or self.max_batch_size == 1:
+            return self.session_pool.predict_mask(rgb)
+
+        tensor = normalize_u2net(rgb)
+        future: Future = Future()
+        # Dicek dan dimasukkan atomik terhadap close(), sehingga tidak ada
+        # request yang masuk antrean setelah sinyal berhenti
+        with self._submit_lock:
+            if self._closed:
+                raise RuntimeError("MicroBatcher is closed")
+            self._ensure_started()
+            self._queue.put((tensor, future))
+        prediction = future.result()
+        return postprocess_u2net(prediction, (rgb.shape[1], rgb.shape[0]))
+
+    def warm_up(self) -> "MicroBatcher":
+        """Memuat session di pool lalu menyalakan thread dispatcher"""
+        self.session_pool.warm_up()
+        if self.batchable and not self._closed:
+            self._ensure_started()
+        return self
+
+    def close(self):
+        """
+        Menghentikan dispatcher setelah request yang sudah masuk selesai;
+        predict_mask sesudahnya langsung gagal dengan RuntimeError
+        """
+        with self._submit_lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+            if thread is not None:
+                self._queue.put(None)
+        if thread is not None:
+            thread.join()
+            self._thread = None
+        # Sisa antrean (mis. dispatcher berhenti karena error) tidak akan dijalankan
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not None:
+                item[1].set_exception(RuntimeError("MicroBatcher is closed"))
@@ -0,0 +1,161 @@
+"""
+Alat model rembg: kuantisasi INT8 lokal dari model ONNX yang sudah ada
+Kelompok: AFEnter
+
+Model hasil kuantisasi dipakai dengan memberikan path-nya sebagai nama
+model, mis. REMBG_MODEL=~/.rembg/models/u2net/u2net-int8-static.onnx.
+
+Contoh:
+    python model_tools.py quantize u2net --method static --calibration "dataset/All Dataset"
+    python model_tools.py quantize u2netp --method dynamic
+    python model_tools.py info u2net u2netp
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+from typing import Iterator, List, Optional
+
+import cv2
+
+from image_processing import WORKING_SIZE, decode_image, list_image_files, resize_image
+from micro_batching import normalize_u2net
+from rembg_session import resolve_model_path
+
+
+QUANTIZATION_METHODS = ('dynamic', 'static')
+
+
+def default_output_path(model_name: str, method: str) -> str:
+    """Path output default: di samping model sumber, mis. u2net-int8-static.onnx"""
+    source = resolve_model_path(model_name)
+    root, _ = os.path.splitext(source)
+    return f"{root}-int8-{method}.onnx"
+
+
+class DatasetCalibrationReader:
+    """Data kalibrasi kuantisasi statis dari gambar dataset (input U2-Net)"""
+
+    def __init__(self, input_name: str, paths: List[str]):
+        self.input_name = input_name
+        self.paths = paths
+        self._iterator: Optional[Iterator] = None
+
+    def _inputs(self):
+        for path in self.paths:
+            with open(path, "rb") as f:
+                image = resize_image(decode_image(f.read(), min_size=WORKING_SIZE))
+            rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            yield {self.input_name: normalize_u2net(rgb)[None]}
+
+    def get_next(self):
+        if self._iterator is None:
+            self._iterator = self._inputs()
+        return next(self._iterator, None)
+
+    def rewind(self):
+        self._iterator = None
+
+
+def quantize_model(model_name: str,
+                   output_path: Optional[str] = None,
+                   method: str = 'static',
+                   calibration_paths: Optional[List[str]] = None,
+                   per_channel: bool = False) -> str:
+    """
+    Membuat varian INT8 dari model rembg keluarga U2-Net
+
+    Args:
+        model_name: Nama model rembg (mis. 'u2net') atau path file .onnx
+        output_path: File output (default: lihat default_output_path)
+        method: 'static' (QDQ, aktivasi dikalibrasi dengan gambar dataset;
+            umumnya lebih cepat untuk model konvolusi di CPU) atau
+            'dynamic' (hanya bobot, tanpa data kalibrasi)
+        calibration_paths: Gambar kalibrasi (wajib untuk 'static')
+        per_channel: Kuantisasi bobot per kanal
+
+    Returns:
+        str: Path model hasil kuantisasi
+
+    Raises:
+        ValueError: Jika paket onnx (dipakai onnxruntime.quantization,
+            tidak ikut terpasang bersama rembg/onnxruntime) belum terpasang
+    """
+    try:
+        import onnx  # noqa: F401
+    except ImportError:
+        raise ValueError("The onnx package is required to quantize models (pip install onnx)") from None
+    import onnxruntime as ort
+    from onnxruntime.quantization import (
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    if method not in QUANTIZATION_METHODS:
+        raise ValueError(f"Unknown quantization method: {method!r}")
+    source = resolve_model_path(model_name)
+    output_path = output_path or default_output_path(model_name, method)
+
+    if method == 'dynamic':
+        quantize_dynamic(source, output_path, per_channel=per_channel,
+                         weight_type=QuantType.QUInt8)
+        return output_path
+
+    if not calibration_paths:
+        raise ValueError("Static quantization needs calibration images")
+    input_name = ort.InferenceSession(
+        source, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+    with tempfile.TemporaryDirectory() as tmp:
+        # Shape inference + optimasi graf agar lebih banyak node bisa dikuantisasi
+        prepared = os.path.join(tmp, "prepared.onnx")
+        quant_pre_process(source, prepared, skip_symbolic_shape=True)
+        quantize_static(
+            prepared,
+            output_path,
+            DatasetCalibrationReader(input_name, calibration_paths),
+            quant_format=QuantFormat.QDQ,
+            per_channel=per_channel,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    return output_path
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Alat model rembg (kuantisasi INT8)")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("quantize", help="buat varian INT8 dari model yang sudah ada")
+    p.add_argument("model", help="nama model rembg (u2net, u2netp, silueta) atau path .onnx")
+    p.add_argument("--output", "-o", default=None)
+    p.add_argument("--method", choices=QUANTIZATION_METHODS, default="static")
+    p.add_argument("--calibration", default=os.path.join("dataset", "All Dataset"),
+                   help="folder gambar kalibrasi untuk --method static")
+    p.add_argument("--calibration-limit", type=int, default=32)
+    p.add_argument("--per-channel", action="store_true")
+
+    p = sub.add_parser("info", help="tampilkan path dan ukuran file model")
+    p.add_argument("models", nargs="+")
+    args = parser.parse_args(argv)
+
+    if args.command == "info":
+        for model in args.models:
+            path = resolve_model_path(model)
+            print(f"{model:<20}{os.path.getsize(path) / 1e6:>10.1f} MB  {path}")
+        return
+
+    calibration = None
+    if args.method == "static":
+        calibration = list_image_files(args.calibration)[:args.calibration_limit]
+    source = resolve_model_path(args.model)
+    output = quantize_model(args.model, args.output, args.method, calibration, args.per_channel)
+    print(f"{source} ({os.path.getsize(source) / 1e6:.1f} MB) -> "
+          f"{output} ({os.path.getsize(output) / 1e6:.1f} MB)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,446 @@
+"""
+Mesin occupancy slot parkir tervektorisasi (NumPy)
+Kelompok: AFEnter
+
+Luas irisan seluruh slot x seluruh bounding box motor dihitung dalam satu
+operasi array, lalu diturunkan menjadi IoU dan rasio cakupan. Slot dapat
+berupa rectangle atau poligon bebas (mis. slot miring dari layout kamera).
+
+Selain skor berbasis bounding box, slot dapat dinilai langsung dari citra
+sure foreground: setiap slot punya mask biner terpack (dihitung sekali per
+ukuran gambar) sehingga occupancy per frame cukup beberapa penjumlahan
+bit, tanpa geometri kontur. Mask yang sama juga dipecah menjadi rectangle
+(indeks integral) sehingga fraksi foreground setiap slot dapat dibaca dari
+satu cv2.integral per frame dengan 4 lookup per rectangle.
+
+Konvensi koordinat: piksel, sumbu x ke kanan dan y ke bawah. Bounding box
+motor berformat (x, y, w, h) seperti keluaran detect_motor_contours.
+"""
+
+import hashlib
+import json
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import cv2
+import numpy as np
+
+
+def boxes_to_xyxy(boxes: Iterable[Sequence[float]]) -> np.ndarray:
+    """Mengubah daftar (x, y, w, h) menjadi array (M, 4) berisi x1, y1, x2, y2"""
+    boxes = np.asarray(list(boxes), dtype=np.float64).reshape(-1, 4)
+    return np.concatenate([boxes[:, :2], boxes[:, :2] + boxes[:, 2:]], axis=1)
+
+
+def polygon_area(points: np.ndarray) -> np.ndarray:
+    """
+    Luas poligon dengan rumus shoelace
+
+    Args:
+        points: Array (..., V, 2)
+
+    Returns:
+        np.ndarray: Luas (...,) (selalu positif)
+    """
+    x, y = points[..., 0], points[..., 1]
+    return 0.5 * np.abs(np.sum(x * np.roll(y, -1, axis=-1) - np.roll(x, -1, axis=-1) * y, axis=-1))
+
+
+def polygon_rect_intersection(polygons: np.ndarray, rects: np.ndarray) -> np.ndarray:
+    """
+    Luas irisan pasangan poligon-rectangle (elemen ke-i dengan ke-i)
+
+    Luas poligon = jumlah integral berarah y dx sepanjang setiap edge.
+    Dengan y setiap edge di-clamp ke [y1, y2] dan integral dibatasi ke
+    [x1, x2], jumlah yang sama menghasilkan luas bagian poligon di dalam
+    rectangle. y(x) yang di-clamp linier sepotong-sepotong dengan titik patah
+    di perpotongan y = y1 dan y = y2, sehingga integral dihitung eksak
+    dengan aturan titik tengah pada tiga potongan, untuk semua pasangan dan
+    edge sekaligus.
+
+    Args:
+        polygons: Array (P, V, 2)
+        rects: Array (P, 4) berisi x1, y1, x2, y2
+
+    Returns:
+        np.ndarray: Luas irisan (P,)
+    """
+    if len(polygons) == 0:
+        return np.zeros(0)
+    x1, y1, x2, y2 = (rects[:, i:i + 1] for i in range(4))
+    xa, ya = polygons[..., 0], polygons[..., 1]
+    xb, yb = np.roll(xa, -1, axis=1), np.roll(ya, -1, axis=1)
+
+    dx = xb - xa
+    slope = np.divide(yb - ya, dx, out=np.zeros_like(dx), where=dx != 0)
+    lo = np.clip(np.minimum(xa, xb), x1, x2)
+    hi = np.clip(np.maximum(xa, xb), x1, x2)
+
+    def crossing(y):
+        x = np.divide(y - ya, slope, out=np.zeros_like(slope), where=slope != 0) + xa
+        return np.clip(np.where(slope != 0, x, lo), lo, hi)
+
+    breaks = np.sort(np.stack([lo, crossing(y1), crossing(y2), hi], axis=-1), axis=-1)
+    mids = 0.5 * (breaks[..., 1:] + breaks[..., :-1])
+    heights = np.clip(ya[..., None] + slope[..., None] * (mids - xa[..., None]),
+                      y1[..., None], y2[..., None]) - y1[..., None]
+    integral = np.sum(np.diff(breaks, axis=-1) * heights, axis=-1)
+    return np.abs(np.sum(np.sign(dx) * integral, axis=-1))
+
+
+BOX_METRICS = ('intersection', 'iou', 'slot_coverage', 'box_coverage')
+# Fraksi piksel slot yang termasuk sure foreground (lihat SlotMasks)
+FOREGROUND_METRIC = 'foreground'
+OCCUPANCY_METRICS = BOX_METRICS + (FOREGROUND_METRIC,)
+
+if hasattr(np, 'bitwise_count'):
+    _popcount = np.bitwise_count
+else:
+    _POPCOUNT_TABLE = np.unpackbits(np.arange(256, dtype=np.uint8)[:, None], axis=1).sum(axis=1)
+
+    def _popcount(packed: np.ndarray) -> np.ndarray:
+        return _POPCOUNT_TABLE[packed]
+
+
+class SlotLayout:
+    """
+    Kumpulan slot parkir: poligon (N, V, 2) beserta bounding rectangle dan
+    luasnya. Poligon dengan jumlah titik berbeda dipad dengan mengulang
+    titik terakhir (tidak mengubah luas).
+    """
+
+    def __init__(self,
+                 polygons: Sequence[Sequence[Sequence[float]]],
+                 names: Optional[List[str]] = None,
+                 metric: str = 'intersection',
+                 threshold: float = 0.0,
+                 image_size: Optional[Tuple[int, int]] = None):
+        """
+        Args:
+            polygons: Daftar poligon, masing-masing daftar titik (x, y)
+            names: Nama slot (default: 'slot_1', 'slot_2', ...)
+            metric: Skor penentu occupancy (lihat OCCUPANCY_METRICS)
+            threshold: Slot terisi jika skornya > threshold
+            image_size: (width, height) ruang koordinat poligon; layout
+                diskalakan ke ukuran gambar yang diproses (lihat scaled_to).
+                None = koordinat piksel gambar yang diproses.
+        """
+        if metric not in OCCUPANCY_METRICS:
+            raise ValueError(f"Unknown occupancy metric: {metric!r}")
+        self.metric = metric
+        self.threshold = threshold
+        self.image_size = tuple(image_size) if image_size is not None else None
+        polygons = [np.asarray(p, dtype=np.float64).reshape(-1, 2) for p in polygons]
+        if any(len(p) < 3 for p in polygons):
+            raise ValueError("Every slot polygon needs at least 3 points")
+        vertices = max((len(p) for p in polygons), default=4)
+        self.polygons = np.zeros((len(polygons), vertices, 2))
+        for i, p in enumerate(polygons):
+            self.polygons[i, :len(p)] = p
+            self.polygons[i, len(p):] = p[-1]
+
+        self.names = list(names) if names is not None else [f"slot_{i + 1}" for i in range(len(polygons))]
+        if len(self.names) != len(polygons):
+            raise ValueError("names must have one entry per slot")
+        self.bounds = np.concatenate([self.polygons.min(axis=1), self.polygons.max(axis=1)], axis=1) \
+            if len(polygons) else np.zeros((0, 4))
+        self.areas = polygon_area(self.polygons) if len(polygons) else np.zeros(0)
+        # Slot yang luasnya sama dengan bounding rectangle-nya = rectangle sejajar sumbu
+        bound_areas = (self.bounds[:, 2] - self.bounds[:, 0]) * (self.bounds[:, 3] - self.bounds[:, 1])
+        self.is_rect = np.isclose(self.areas, bound_areas)
+        self._rects = [tuple(int(round(v)) for v in bound) for bound in self.bounds]
+
+        digest = hashlib.blake2b(self.polygons.tobytes(), digest_size=16)
+        digest.update(json.dumps([self.names, metric, threshold, self.image_size]).encode())
+        self.fingerprint = digest.hexdigest()
+        self._scaled: Dict[Tuple[int, int], "SlotLayout"] = {}
+        self._masks: Dict[Tuple[int, int], "SlotMasks"] = {}
+
+    def __len__(self) -> int:
+        return len(self.polygons)
+
+    @classmethod
+    def from_rects(cls, rects: Iterable[Sequence[float]], names: Optional[List[str]] = None,
+                   **kwargs) -> "SlotLayout":
+        """Layout dari rectangle (x1, y1, x2, y2)"""
+        polygons = [[(x1, y1), (x2, y1), (x2, y2), (x1, y2)] for x1, y1, x2, y2 in rects]
+        return cls(polygons, names, **kwargs)
+
+    @classmethod
+    def strips(cls, image_shape: Tuple[int, ...], roi_y_start: int, slot_count: int = 4) -> "SlotLayout":
+        """
+        Layout default: slot_count strip vertikal selebar w // slot_count di
+        bawah ROI (di-cache per ukuran gambar; jangan diubah in-place)
+        """
+        h, w = image_shape[:2]
+        return _strip_layout(h, w, roi_y_start, slot_count)
+
+    def rects(self) -> List[Tuple[int, int, int, int]]:
+        """Bounding rectangle (sx, sy, ex, ey) setiap slot sebagai integer"""
+        return list(self._rects)
+
+    def scaled_to(self, image_shape: Tuple[int, ...]) -> "SlotLayout":
+        """Layout dalam koordinat piksel gambar berukuran image_shape (di-cache)"""
+        h, w = image_shape[:2]
+        if self.image_size is None or self.image_size == (w, h):
+            return self
+        layout = self._scaled.get((h, w))
+        if layout is None:
+            scale = (w / self.image_size[0], h / self.image_size[1])
+            layout = SlotLayout(self.polygons * scale, self.names, self.metric, self.threshold)
+            self._scaled[(h, w)] = layout
+        return layout
+
+    def masks(self, image_shape: Tuple[int, ...]) -> "SlotMasks":
+        """Mask terpack setiap slot untuk gambar berukuran image_shape (di-cache)"""
+        h, w = image_shape[:2]
+        masks = self._masks.get((h, w))
+        if masks is None:
+            masks = SlotMasks(self.scaled_to(image_shape), (h, w))
+            self._masks[(h, w)] = masks
+        return masks
+
+
+def _polygon_mask(polygon: np.ndarray, xs: np.ndarray, ys: np.ndarray) -> np.ndarray:
+    """
+    Mask titik grid (ys x xs) di dalam poligon (aturan even-odd): setiap
+    edge membalik piksel di kiri titik potongnya pada baris yang dilintasi
+    """
+    inside = np.zeros((len(ys), len(xs)), dtype=bool)
+    for (xa, ya), (xb, yb) in zip(polygon, np.roll(polygon, -1, axis=0)):
+        rows = (ya > ys) != (yb > ys)
+        if not rows.any():
+            continue
+        crossing = xa + (ys[rows] - ya) * (xb - xa) / (yb - ya)
+        inside[rows] ^= xs[None, :] < crossing[:, None]
+    return inside
+
+
+def _mask_rectangles(mask: np.ndarray) -> List[Tuple[int, int, int, int]]:
+    """
+    Memecah mask biner menjadi rectangle (y1, y2, x1, x2) yang tidak
+    beririsan: run horizontal per baris, baris berurutan dengan run yang
+    sama digabung (mask rectangle = satu rectangle)
+    """
+    edges = np.diff(np.pad(mask, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    rectangles = []
+    open_spans, open_since = (), 0
+    for y, row in enumerate(edges):
+        spans = tuple(zip(np.flatnonzero(row == 1), np.flatnonzero(row == -1)))
+        if spans != open_spans:
+            rectangles.extend((open_since, y, int(a), int(b)) for a, b in open_spans)
+            open_spans, open_since = spans, y
+    rectangles.extend((open_since, len(mask), int(a), int(b)) for a, b in open_spans)
+    return rectangles
+
+
+def foreground_integral(foreground: np.ndarray) -> np.ndarray:
+    """cv2.integral dari citra biner (nilai > 0 dihitung 1), shape (H + 1, W + 1)"""
+    _, binary = cv2.threshold(foreground, 0, 1, cv2.THRESH_BINARY)
+    return cv2.integral(binary, sdepth=cv2.CV_32S)
+
+
+class SlotMasks:
+    """
+    Mask biner setiap slot (piksel yang titik tengahnya di dalam poligon),
+    dipotong ke bounding rectangle slot dan dipack 8 piksel per byte.
+    Kolom awal potongan dibulatkan ke kelipatan 8 sehingga mask sejajar
+    dengan np.packbits seluruh baris gambar: occupancy per frame = AND
+    bitwise lalu popcount, tanpa unpack.
+
+    Indeks integral: mask yang sama sebagai daftar rectangle absolut per
+    slot (slot rectangle = 1 rectangle, poligon = beberapa run per baris),
+    dipakai oleh integral_fractions.
+    """
+
+    def __init__(self, layout: SlotLayout, shape: Tuple[int, int]):
+        h, w = shape
+        self.shape = shape
+        self.windows: List[Tuple[int, int, int, int]] = []  # baris y1:y2, byte b1:b2
+        self.packed: List[np.ndarray] = []
+        counts = []
+        rectangles, owners = [], []
+        for index, (polygon, (bx1, by1, bx2, by2)) in enumerate(zip(layout.polygons, layout.bounds)):
+            x1 = int(np.clip(np.floor(bx1), 0, w)) // 8 * 8
+            x2 = int(np.clip(np.ceil(bx2), x1, w))
+            y1 = int(np.clip(np.floor(by1), 0, h))
+            y2 = int(np.clip(np.ceil(by2), y1, h))
+            mask = _polygon_mask(polygon, np.arange(x1, x2) + 0.5, np.arange(y1, y2) + 0.5)
+            self.windows.append((y1, y2, x1 // 8, x1 // 8 + (x2 - x1 + 7) // 8))
+            self.packed.append(np.packbits(mask, axis=1))
+            counts.append(np.count_nonzero(mask))
+            for ry1, ry2, rx1, rx2 in _mask_rectangles(mask):
+                rectangles.append((y1 + ry1, y1 + ry2, x1 + rx1, x1 + rx2))
+                owners.append(index)
+        self.pixel_counts = np.array(counts, dtype=np.int64)
+        self.rectangles = np.array(rectangles, dtype=np.intp).reshape(-1, 4)
+        self.rectangle_slots = np.array(owners, dtype=np.intp)
+
+    def __len__(self) -> int:
+        return len(self.packed)
+
+    def foreground_counts(self, foreground: np.ndarray) -> np.ndarray:
+        """Jumlah piksel foreground (nilai > 0) di dalam setiap slot"""
+        if foreground.shape[:2] != self.shape:
+            raise ValueError(f"Foreground shape {foreground.shape[:2]} does not match "
+                             f"slot masks {self.shape}")
+        packed = np.packbits(foreground > 0, axis=1)
+        return np.array([_popcount(packed[y1:y2, b1:b2] & mask).sum(dtype=np.int64)
+                         for (y1, y2, b1, b2), mask in zip(self.windows, self.packed)],
+                        dtype=np.int64)
+
+    def foreground_fractions(self, foreground: np.ndarray) -> np.ndarray:
+        """Fraksi piksel setiap slot yang termasuk foreground (0-1)"""
+        counts = self.foreground_counts(foreground)
+        return counts / np.maximum(self.pixel_counts, 1)
+
+    def integral_fractions(self, integral: np.ndarray) -> np.ndarray:
+        """
+        Fraksi foreground setiap slot dari hasil foreground_integral: 4 lookup
+        per rectangle indeks, dijumlahkan per slot
+
+        Args:
+            integral: cv2.integral citra biner 0/1, shape (H + 1, W + 1)
+
+        Returns:
+            np.ndarray: Fraksi 0-1 untuk setiap slot
+        """
+        if integral.shape[:2] != (self.shape[0] + 1, self.shape[1] + 1):
+            raise ValueError(f"Integral shape {integral.shape[:2]} does not match "
+                             f"slot masks {self.shape}")
+        y1, y2, x1, x2 = self.rectangles.T
+        sums = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        counts = np.bincount(self.rectangle_slots, weights=sums, minlength=len(self))
+        return counts / np.maximum(self.pixel_counts, 1)
+
+
+@lru_cache(maxsize=64)
+def _strip_layout(height: int, width: int, roi_y_start: int, slot_count: int) -> SlotLayout:
+    slot_width = width // slot_count
+    return SlotLayout.from_rects([(i * slot_width, roi_y_start, (i + 1) * slot_width, height)
+                                  for i in range(slot_count)])
+
+
+def intersection_areas(layout: SlotLayout, boxes_xyxy: np.ndarray) -> np.ndarray:
+    """
+    Luas irisan seluruh slot dengan seluruh box
+
+    Rectangle dihitung langsung dengan outer product (N, M) dalam float32
+    (koordinat piksel tetap eksak). Untuk slot poligon, hanya pasangan yang
+    bounding rectangle-nya beririsan yang di-clip secara tervektorisasi.
+
+    Returns:
+        np.ndarray: Matriks luas irisan (N slot, M box)
+    """
+    slots = layout.bounds.T.astype(np.float32)
+    boxes = np.ascontiguousarray(boxes_xyxy.T, dtype=np.float32)
+    inter = np.minimum.outer(slots[2], boxes[2])
+    inter -= np.maximum.outer(slots[0], boxes[0])
+    np.maximum(inter, 0, out=inter)
+    height = np.minimum.outer(slots[3], boxes[3])
+    height -= np.maximum.outer(slots[1], boxes[1])
+    np.maximum(height, 0, out=height)
+    inter *= height
+
+    polygon_slots = ~layout.is_rect
+    if polygon_slots.any():
+        slot_idx, box_idx = np.nonzero((inter > 0) & polygon_slots[:, None])
+        inter[slot_idx, box_idx] = polygon_rect_intersection(
+            layout.polygons[slot_idx], boxes_xyxy[box_idx])
+    return inter
+
+
+def occupancy_scores(layout: SlotLayout, boxes: Iterable[Sequence[float]]) -> Dict[str, np.ndarray]:
+    """
+    Skor overlap seluruh slot x seluruh box
+
+    Rasio hanya dihitung pada pasangan yang beririsan (umumnya sebagian
+    kecil dari N x M); pasangan lain bernilai 0.
+
+    Args:
+        layout: Layout slot
+        boxes: Bounding box motor (x, y, w, h)
+
+    Returns:
+        dict: Matriks (N, M) 'intersection', 'iou', 'slot_coverage'
+        (irisan / luas slot) dan 'box_coverage' (irisan / luas box)
+    """
+    boxes_xyxy = boxes_to_xyxy(boxes)
+    inter = intersection_areas(layout, boxes_xyxy)
+    box_areas = (boxes_xyxy[:, 2] - boxes_xyxy[:, 0]) * (boxes_xyxy[:, 3] - boxes_xyxy[:, 1])
+
+    slot_idx, box_idx = np.nonzero(inter)
+    overlap = inter[slot_idx, box_idx]
+    slot_area = layout.areas[slot_idx]
+    box_area = box_areas[box_idx]
+    scores = {'intersection': inter}
+    # Irisan > 0 menjamin kedua luas (dan union) > 0
+    for name, values in (('iou', overlap / (slot_area + box_area - overlap)),
+                         ('slot_coverage', overlap / slot_area),
+                         ('box_coverage', overlap / box_area)):
+        matrix = np.zeros_like(inter)
+        matrix[slot_idx, box_idx] = values
+        scores[name] = matrix
+    return scores
+
+
+def slot_scores(layout: SlotLayout,
+                boxes: Iterable[Sequence[float]],
+                metric: Optional[str] = None,
+                foreground: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Skor occupancy setiap slot
+
+    Untuk metric berbasis box, skor slot adalah skor terbesar di antara
+    seluruh box (0 jika tidak ada box). Untuk metric 'foreground', skornya
+    adalah fraksi piksel slot pada citra foreground.
+
+    Args:
+        layout: Layout slot dalam koordinat piksel gambar
+        boxes: Bounding box motor (x, y, w, h)
+        metric: Nama skor (default: layout.metric)
+        foreground: Citra biner sure foreground (wajib untuk 'foreground')
+
+    Returns:
+        np.ndarray: Skor (N,) per slot
+    """
+    metric = metric or layout.metric
+    if metric not in OCCUPANCY_METRICS:
+        raise ValueError(f"Unknown occupancy metric: {metric!r}")
+    if metric == FOREGROUND_METRIC:
+        if foreground is None:
+            raise ValueError("The 'foreground' metric needs a foreground image")
+        return layout.masks(foreground.shape).foreground_fractions(foreground)
+    boxes = list(boxes)
+    if not boxes or len(layout) == 0:
+        return np.zeros(len(layout))
+    if metric == 'intersection':
+        scores = intersection_areas(layout, boxes_to_xyxy(boxes))
+    else:
+        scores = occupancy_scores(layout, boxes)[metric]
+    return scores.max(axis=1)
+
+
+def slot_occupancy(layout: SlotLayout,
+                   boxes: Iterable[Sequence[float]],
+                   metric: Optional[str] = None,
+                   threshold: Optional[float] = None,
+                   foreground: Optional[np.ndarray] = None) -> np.ndarray:
+    """
+    Menentukan slot terisi: skor slot_scores > threshold
+
+    Default layout (irisan > 0) sama dengan aturan lama create_parking_slots
+    untuk layout strip: slot terisi jika ada motor yang beririsan dengannya.
+
+    Args:
+        layout: Layout slot dalam koordinat piksel gambar
+        boxes: Bounding box motor (x, y, w, h)
+        metric: Nama skor (default: layout.metric)
+        threshold: Ambang skor (default: layout.threshold)
+        foreground: Citra biner sure foreground (wajib untuk 'foreground')
+
+    Returns:
+        np.ndarray: Boolean (N,) per slot
+    """
+    threshold = layout.threshold if threshold is None else threshold
+    return slot_scores(layout, boxes, metric, foreground) > threshold
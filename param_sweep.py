@@ -0,0 +1,325 @@
+"""
+Parameter sweep (grid search) untuk ambang deteksi pada dataset berlabel
+Kelompok: AFEnter
+
+Segmentasi rembg dijalankan sekali per gambar, hasilnya disimpan sebagai
+memmap, lalu setiap kombinasi parameter hanya menjalankan tahap analisis
+OpenCV (analyze_segmentation) secara paralel.
+
+Format label (CSV, sama dengan kolom output batch_process.py):
+    path,slot_results[,motor_count]
+    Citra (1).jpg,Occupied;Empty;Empty;Occupied,2
+
+Dengan --store (lihat frame_store.py), frame dan mask dibaca langsung dari
+store ter-decode sehingga tahap segmentasi dilewati sepenuhnya.
+
+Contoh:
+    python param_sweep.py "dataset/All Dataset" --labels labels.csv \\
+        --grid grid.json --output sweep.csv --workers 4
+    python param_sweep.py "dataset/All Dataset" --labels labels.csv --store store/
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from frame_store import FrameStore
+from image_processing import WORKING_SIZE, analyze_segmentation, list_image_files
+from rembg_session import configure_session_pool
+from result_cache import ANALYSIS_PARAMS, SegmentationCache
+
+
+DEFAULT_GRID = {
+    'blur_kernel': [3, 5, 7],
+    'morph_kernel': [3, 5, 7],
+    'close_iterations': [1, 2, 3],
+    'open_iterations': [1, 2],
+    'fg_ratio': [0.2, 0.3, 0.4],
+    'roi_percentage': [0.3, 0.35, 0.4],
+    'min_area': [300, 1000],
+    'max_area': [250000],
+}
+
+RESULT_FIELDS = ['slot_accuracy', 'exact_match', 'motor_count_mae', 'mean_ms', 'images']
+
+
+def load_labels(path: str) -> Dict[str, Dict]:
+    """
+    Membaca file label CSV
+
+    Returns:
+        dict: nama file (basename) -> {'slot_results': [...], 'motor_count': int/None}
+    """
+    labels = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            motor_count = row.get('motor_count')
+            labels[os.path.basename(row['path'])] = {
+                'slot_results': [s.strip() for s in row['slot_results'].split(';') if s.strip()],
+                'motor_count': int(motor_count) if motor_count not in (None, '') else None,
+            }
+    return labels
+
+
+def expand_grid(grid: Dict[str, List]) -> List[Dict]:
+    """Mengubah grid {param: [nilai, ...]} menjadi daftar kombinasi parameter"""
+    unknown = set(grid).difference(ANALYSIS_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown sweep parameters: {sorted(unknown)}")
+    names = sorted(grid)
+    return [dict(zip(names, values))
+            for values in itertools.product(*(grid[name] for name in names))]
+
+
+# ---------------- tahap 1: segmentasi sekali per gambar ----------------
+
+_segmentation_cache: Optional[SegmentationCache] = None
+
+
+def _init_segment_worker(model_name: Optional[str], cache_dir: Optional[str]):
+    global _segmentation_cache
+    cv2.setNumThreads(1)
+    configure_session_pool(model_name=model_name, size=1, inter_op_threads=1).warm_up()
+    _segmentation_cache = SegmentationCache(max_entries=1, disk_dir=cache_dir)
+
+
+def _segment_file(task: Tuple[int, str]) -> Tuple[int, np.ndarray, np.ndarray]:
+    index, path = task
+    with open(path, "rb") as f:
+        image_bytes = f.read()
+    original, mask = _segmentation_cache.segment(image_bytes)
+    return index, original, mask
+
+
+def segment_dataset(paths: List[str],
+                    store_dir: str,
+                    workers: int,
+                    model_name: Optional[str] = None,
+                    cache_dir: Optional[str] = None) -> Tuple[str, str]:
+    """
+    Menjalankan segmentasi untuk setiap gambar dan menulis hasilnya ke memmap
+
+    Args:
+        paths: Daftar file gambar
+        store_dir: Folder untuk file memmap originals.npy dan masks.npy
+        workers: Jumlah proses worker
+        model_name: Nama model rembg
+        cache_dir: Folder SegmentationCache di disk agar sweep berikutnya
+            tidak menjalankan rembg lagi (opsional)
+
+    Returns:
+        Tuple[str, str]: (path originals.npy, path masks.npy)
+    """
+    width, height = WORKING_SIZE
+    originals_path = os.path.join(store_dir, 'originals.npy')
+    masks_path = os.path.join(store_dir, 'masks.npy')
+    originals = np.lib.format.open_memmap(
+        originals_path, mode='w+', dtype=np.uint8, shape=(len(paths), height, width, 3))
+    masks = np.lib.format.open_memmap(
+        masks_path, mode='w+', dtype=np.uint8, shape=(len(paths), height, width))
+
+    context = multiprocessing.get_context("spawn")
+    with context.Pool(workers, _init_segment_worker, (model_name, cache_dir)) as pool:
+        for index, original, mask in pool.imap_unordered(_segment_file, enumerate(paths)):
+            originals[index] = original
+            masks[index] = mask
+
+    originals.flush()
+    masks.flush()
+    del originals, masks
+    return originals_path, masks_path
+
+
+# ---------------- tahap 2: evaluasi kombinasi parameter ----------------
+
+_originals = None
+_masks = None
+_labels: List[Dict] = []
+
+
+def _init_eval_worker(originals_path: str, masks_path: str, labels: List[Dict]):
+    global _originals, _masks, _labels
+    cv2.setNumThreads(1)
+    _originals = np.load(originals_path, mmap_mode='r')
+    _masks = np.load(masks_path, mmap_mode='r')
+    _labels = labels
+
+
+def _init_store_eval_worker(frame_store: str, paths: List[str], labels: List[Dict]):
+    global _originals, _masks, _labels
+    cv2.setNumThreads(1)
+    store = FrameStore(frame_store, paths)
+    _originals, _masks = store.frames, store.masks
+    _labels = labels
+
+
+def evaluate_params(params: Dict,
+                    originals: np.ndarray,
+                    masks: np.ndarray,
+                    labels: List[Dict]) -> Dict:
+    """
+    Mengevaluasi satu kombinasi parameter terhadap seluruh gambar berlabel
+
+    Returns:
+        dict: params + slot_accuracy, exact_match, motor_count_mae, mean_ms, images
+    """
+    correct_slots = total_slots = exact = 0
+    count_errors = []
+    elapsed = 0.0
+
+    for index, label in enumerate(labels):
+        start = time.perf_counter()
+        result = analyze_segmentation(originals[index], masks[index], stages=(), **params)
+        elapsed += time.perf_counter() - start
+
+        expected = label['slot_results']
+        predicted = result['slot_results']
+        total_slots += len(expected)
+        if len(predicted) == len(expected):
+            matches = sum(p == e for p, e in zip(predicted, expected))
+            correct_slots += matches
+            exact += matches == len(expected)
+        if label['motor_count'] is not None:
+            count_errors.append(abs(result['motor_count'] - label['motor_count']))
+
+    n = len(labels)
+    return dict(
+        params,
+        slot_accuracy=correct_slots / total_slots if total_slots else 0.0,
+        exact_match=exact / n if n else 0.0,
+        motor_count_mae=float(np.mean(count_errors)) if count_errors else None,
+        mean_ms=elapsed / n * 1000.0 if n else 0.0,
+        images=n,
+    )
+
+
+def _evaluate(params: Dict) -> Dict:
+    return evaluate_params(params, _originals, _masks, _labels)
+
+
+def run_sweep(paths: List[str],
+              labels: List[Dict],
+              combinations: List[Dict],
+              workers: Optional[int] = None,
+              model_name: Optional[str] = None,
+              cache_dir: Optional[str] = None,
+              store_dir: Optional[str] = None,
+              frame_store: Optional[str] = None) -> Iterator[Dict]:
+    """
+    Menjalankan sweep; hasil per kombinasi di-yield sesuai urutan selesai
+
+    Args:
+        paths: File gambar berlabel
+        labels: Label untuk setiap path (urutan sama)
+        combinations: Daftar kombinasi parameter (lihat expand_grid)
+        workers: Jumlah proses worker (default: jumlah core)
+        model_name: Nama model rembg
+        cache_dir: Folder SegmentationCache di disk (opsional)
+        store_dir: Folder memmap hasil segmentasi (default: folder sementara)
+        frame_store: Store frame_store.py berisi mask; jika diisi, segmentasi
+            dilewati dan frame/mask dibaca dari store (mask harus dari
+            model_name, jika model_name diisi)
+
+    Yields:
+        dict: Hasil evaluate_params per kombinasi
+    """
+    workers = workers or os.cpu_count() or 1
+    context = multiprocessing.get_context("spawn")
+    chunksize = max(1, len(combinations) // (workers * 8))
+    if frame_store is not None:
+        store = FrameStore(frame_store, paths)
+        if store.masks is None:
+            raise ValueError(f"Frame store {frame_store!r} has no masks (build it with --masks)")
+        store.check_mask_model(model_name)
+        with context.Pool(workers, _init_store_eval_worker,
+                          (frame_store, paths, labels)) as pool:
+            yield from pool.imap_unordered(_evaluate, combinations, chunksize=chunksize)
+        return
+
+    with tempfile.TemporaryDirectory(dir=store_dir) as tmp:
+        originals_path, masks_path = segment_dataset(
+            paths, tmp, workers, model_name, cache_dir)
+
+        with context.Pool(workers, _init_eval_worker,
+                          (originals_path, masks_path, labels)) as pool:
+            yield from pool.imap_unordered(_evaluate, combinations, chunksize=chunksize)
+
+
+def pareto_front(rows: List[Dict]) -> List[Dict]:
+    """Kombinasi yang tidak kalah akurat sekaligus tidak lebih lambat dari yang lain"""
+    front = []
+    best_accuracy = -1.0
+    for row in sorted(rows, key=lambda r: (r['mean_ms'], -r['slot_accuracy'])):
+        if row['slot_accuracy'] > best_accuracy:
+            front.append(row)
+            best_accuracy = row['slot_accuracy']
+    return front
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Grid search parameter deteksi parkir")
+    parser.add_argument("dataset", help="folder dataset, mis. 'dataset/All Dataset'")
+    parser.add_argument("--labels", required=True, help="CSV label (path,slot_results[,motor_count])")
+    parser.add_argument("--grid", default=None, help="JSON {param: [nilai, ...]} (default: DEFAULT_GRID)")
+    parser.add_argument("--output", "-o", default="sweep.csv")
+    parser.add_argument("--workers", "-j", type=int, default=None)
+    parser.add_argument("--model", default=None, help="nama model rembg")
+    parser.add_argument("--cache-dir", default=None,
+                        help="folder cache segmentasi di disk untuk dipakai ulang antar sweep")
+    parser.add_argument("--store", default=None,
+                        help="store frame_store.py dengan --masks (tanpa decode dan segmentasi)")
+    parser.add_argument("--top", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    label_map = load_labels(args.labels)
+    paths = [p for p in list_image_files(args.dataset) if os.path.basename(p) in label_map]
+    if not paths:
+        raise SystemExit("No labelled images found in the dataset")
+    labels = [label_map[os.path.basename(p)] for p in paths]
+
+    grid = DEFAULT_GRID
+    if args.grid:
+        with open(args.grid) as f:
+            grid = json.load(f)
+    combinations = expand_grid(grid)
+    param_names = sorted(grid)
+    print(f"{len(combinations)} combinations x {len(paths)} images", file=sys.stderr)
+
+    start = time.perf_counter()
+    rows = []
+    with open(args.output, "w", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=param_names + RESULT_FIELDS)
+        writer.writeheader()
+        for row in run_sweep(paths, labels, combinations, args.workers,
+                             args.model, args.cache_dir, frame_store=args.store):
+            writer.writerow(row)
+            rows.append(row)
+    elapsed = time.perf_counter() - start
+
+    print(f"Done in {elapsed:.1f} s ({len(rows) / elapsed:.1f} combinations/s)", file=sys.stderr)
+
+    def describe(row):
+        params = " ".join(f"{name}={row[name]}" for name in param_names)
+        return f"acc={row['slot_accuracy']:.3f} exact={row['exact_match']:.3f} " \
+               f"{row['mean_ms']:.2f} ms  {params}"
+
+    print(f"\nTop {args.top} by accuracy:")
+    for row in sorted(rows, key=lambda r: (-r['slot_accuracy'], r['mean_ms']))[:args.top]:
+        print("  " + describe(row))
+    print("\nPareto front (accuracy vs time):")
+    for row in pareto_front(rows):
+        print("  " + describe(row))
+
+
+if __name__ == "__main__":
+    main()
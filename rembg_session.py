@@ -0,0 +1,228 @@
+"""
+Modul pengelola session rembg (ONNX Runtime) yang dipakai bersama satu proses
+Kelompok: AFEnter
+"""
+
+import os
+import queue
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+import numpy as np
+
+
+DEFAULT_MODEL_NAME = "u2net"
+
+
+def _env_int(name: str, default: int) -> int:
+    """Membaca variabel environment bertipe integer"""
+    value = os.environ.get(name)
+    if value is None or value.strip() == "":
+        return default
+    return int(value)
+
+
+def is_model_path(model_name: str) -> bool:
+    """True jika model_name adalah path file ONNX, bukan nama model rembg"""
+    return model_name.lower().endswith(".onnx")
+
+
+def resolve_model_path(model_name: str) -> str:
+    """
+    Path file ONNX untuk sebuah model (diunduh rembg jika belum ada)
+
+    Args:
+        model_name: Nama model rembg atau path file .onnx
+
+    Returns:
+        str: Path absolut file model
+    """
+    if is_model_path(model_name):
+        return os.path.abspath(os.path.expanduser(model_name))
+    from rembg.sessions import sessions_class
+
+    for session_class in sessions_class:
+        if session_class.name() == model_name:
+            return session_class.download_models()
+    raise ValueError(f"Unknown rembg model: {model_name!r}")
+
+
+class RembgSessionPool:
+    """
+    Pool session rembg yang dimuat sekali lalu dipakai ulang.
+
+    Setiap session memegang satu ``onnxruntime.InferenceSession``. Session
+    dibuat secara lazy sampai ``size`` buah, sehingga maksimal ``size``
+    inferensi dapat berjalan bersamaan tanpa memuat ulang model.
+    """
+
+    def __init__(self,
+                 model_name: str = DEFAULT_MODEL_NAME,
+                 size: int = 1,
+                 intra_op_threads: int = 0,
+                 inter_op_threads: int = 0):
+        """
+        Args:
+            model_name: Nama model rembg (mis. 'u2net', 'u2netp', 'silueta')
+                atau path file .onnx keluarga U2-Net (mis. hasil kuantisasi
+                model_tools.py)
+            size: Jumlah session maksimum yang boleh dipakai bersamaan
+            intra_op_threads: Jumlah thread intra-op ONNX Runtime (0 = default)
+            inter_op_threads: Jumlah thread inter-op ONNX Runtime (0 = default)
+        """
+        if size < 1:
+            raise ValueError("Pool size must be at least 1")
+        self.model_name = model_name
+        self.size = size
+        self.intra_op_threads = intra_op_threads
+        self.inter_op_threads = inter_op_threads
+
+        self._idle = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def _create_session(self):
+        """Membuat satu session rembg baru sesuai konfigurasi pool"""
+        import onnxruntime as ort
+        from rembg import new_session
+
+        sess_opts = ort.SessionOptions()
+        if self.intra_op_threads > 0:
+            sess_opts.intra_op_num_threads = self.intra_op_threads
+        if self.inter_op_threads > 0:
+            sess_opts.inter_op_num_threads = self.inter_op_threads
+        if is_model_path(self.model_name):
+            return new_session("u2net_custom", sess_opts=sess_opts,
+                               model_path=os.path.expanduser(self.model_name))
+        return new_session(self.model_name, sess_opts=sess_opts)
+
+    def _acquire(self, timeout: Optional[float] = None):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            create = self._created < self.size
+            if create:
+                self._created += 1
+        if create:
+            try:
+                return self._create_session()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+
+        try:
+            return self._idle.get(timeout=timeout)
+        except queue.Empty:
+            raise TimeoutError(
+                f"No rembg session available after {timeout} seconds"
+            ) from None
+
+    @contextmanager
+    def session(self, timeout: Optional[float] = None) -> Iterator[object]:
+        """
+        Meminjam satu session dari pool
+
+        Args:
+            timeout: Batas waktu menunggu session bebas (None = tunggu terus)
+
+        Yields:
+            Session rembg yang siap dipakai untuk ``rembg.remove``
+        """
+        sess = self._acquire(timeout)
+        try:
+            yield sess
+        finally:
+            self._idle.put(sess)
+
+    def predict_mask(self, rgb: np.ndarray) -> np.ndarray:
+        """
+        Menjalankan segmentasi rembg untuk satu gambar
+
+        Args:
+            rgb: Gambar input (RGB, uint8)
+
+        Returns:
+            np.ndarray: Mask uint8 (0-255) berukuran sama dengan rgb
+        """
+        from rembg import remove
+
+        with self.session() as sess:
+            return np.asarray(remove(rgb, session=sess, only_mask=True))
+
+    def warm_up(self) -> "RembgSessionPool":
+        """
+        Memuat seluruh session di awal agar request pertama tidak menanggung
+        biaya pemuatan model
+
+        Returns:
+            RembgSessionPool: Pool ini sendiri
+        """
+        borrowed = []
+        try:
+            while len(borrowed) < self.size:
+                borrowed.append(self._acquire())
+        finally:
+            for sess in borrowed:
+                self._idle.put(sess)
+        return self
+
+
+_default_pool: Optional[RembgSessionPool] = None
+_default_pool_lock = threading.Lock()
+
+
+def _build_pool(model_name: Optional[str] = None,
+                size: Optional[int] = None,
+                intra_op_threads: Optional[int] = None,
+                inter_op_threads: Optional[int] = None) -> RembgSessionPool:
+    """Membuat pool dengan fallback ke variabel environment"""
+    return RembgSessionPool(
+        model_name=model_name or os.environ.get("REMBG_MODEL", DEFAULT_MODEL_NAME),
+        size=size if size is not None else _env_int("REMBG_POOL_SIZE", 1),
+        intra_op_threads=(intra_op_threads if intra_op_threads is not None
+                          else _env_int("REMBG_INTRA_OP_THREADS", 0)),
+        inter_op_threads=(inter_op_threads if inter_op_threads is not None
+                          else _env_int("REMBG_INTER_OP_THREADS", 0)),
+    )
+
+
+def configure_session_pool(model_name: Optional[str] = None,
+                           size: Optional[int] = None,
+                           intra_op_threads: Optional[int] = None,
+                           inter_op_threads: Optional[int] = None) -> RembgSessionPool:
+    """
+    Mengganti pool default proses dengan konfigurasi baru
+
+    Parameter yang bernilai None diambil dari variabel environment
+    ``REMBG_MODEL``, ``REMBG_POOL_SIZE``, ``REMBG_INTRA_OP_THREADS`` dan
+    ``REMBG_INTER_OP_THREADS``.
+
+    Returns:
+        RembgSessionPool: Pool default yang baru
+    """
+    global _default_pool
+
+    pool = _build_pool(model_name, size, intra_op_threads, inter_op_threads)
+    with _default_pool_lock:
+        _default_pool = pool
+    return pool
+
+
+def get_session_pool() -> RembgSessionPool:
+    """
+    Mengambil pool session default proses (dibuat saat pertama kali dipakai)
+
+    Returns:
+        RembgSessionPool: Pool default
+    """
+    global _default_pool
+
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = _build_pool()
+        return _default_pool
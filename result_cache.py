@@ -0,0 +1,695 @@
+"""
+Cache hasil process_parking_image berbasis hash konten gambar
+Kelompok: AFEnter
+
+Pipeline dibagi dua tingkat cache:
+- SegmentationCache: hasil rembg (tahap mahal), kunci = hash gambar + model
+  + parameter segmentasi
+- ResultCache: hasil akhir, kunci = kunci segmentasi + parameter analisis.
+  Jika tidak ada, hasil dihitung ulang dari SegmentationCache sehingga
+  mengubah parameter analisis tidak menjalankan rembg lagi.
+"""
+
+import hashlib
+import inspect
+import json
+import os
+import tempfile
+import threading
+import time
+import zipfile
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, Optional, Tuple
+
+import numpy as np
+
+from image_processing import (
+    STAGE_OUTPUTS,
+    analyze_segmentation,
+    decode_image,
+    encode_stage_thumbnails,
+    process_parking_image,
+    resize_image,
+    segment_parking_image,
+)
+from instrumentation import increment, request_span
+from rembg_session import RembgSessionPool
+from occupancy import SlotLayout
+from segmentation_backends import get_segmentation_backend, is_stateful
+from slot_layouts import get_slot_layout
+
+
+# Parameter pipeline yang ikut menentukan hasil (dan karena itu kunci cache)
+PIPELINE_DEFAULTS = {
+    name: param.default
+    for name, param in inspect.signature(process_parking_image).parameters.items()
+    if name not in ('image_bytes', 'session_pool', 'stages')
+}
+SEGMENTATION_PARAMS = ('downscale_first', 'segmentation_size', 'working_size')
+ANALYSIS_PARAMS = tuple(name for name in PIPELINE_DEFAULTS
+                        if name not in SEGMENTATION_PARAMS)
+
+
+def content_hash(image_bytes: bytes) -> str:
+    """Hash konten gambar (hex)"""
+    return hashlib.blake2b(image_bytes, digest_size=16).hexdigest()
+
+
+def _hash_key(*parts) -> str:
+    payload = json.dumps(parts, sort_keys=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _canonical_params(names: Iterable[str], params: Dict) -> Dict:
+    """Melengkapi parameter dengan default dan menormalkan tuple menjadi list"""
+    names = tuple(names)
+    unknown = set(params).difference(names)
+    if unknown:
+        raise TypeError(f"Unknown pipeline parameters: {sorted(unknown)}")
+    merged = {name: params.get(name, PIPELINE_DEFAULTS[name]) for name in names}
+    for name, value in merged.items():
+        if isinstance(value, tuple):
+            merged[name] = list(value)
+    # Layout slot masuk kunci lewat isinya, sehingga file yang diubah
+    # (hot reload) tidak memakai hasil lama
+    layout = merged.get('slot_layout')
+    if isinstance(layout, str):
+        layout = get_slot_layout(layout)
+    if isinstance(layout, SlotLayout):
+        merged['slot_layout'] = layout.fingerprint
+    return merged
+
+
+def make_segmentation_key(image_hash: str, model_name: str, **params) -> str:
+    """
+    Membuat kunci cache segmentasi dari hash gambar, nama model, dan
+    parameter segmentasi (lihat SEGMENTATION_PARAMS)
+    """
+    return _hash_key('segmentation', image_hash, model_name,
+                     _canonical_params(SEGMENTATION_PARAMS, params))
+
+
+def make_cache_key(image_hash: str, model_name: str, **params) -> str:
+    """
+    Membuat kunci cache dari hash gambar, nama model, dan parameter pipeline
+
+    Args:
+        image_hash: Hasil content_hash dari bytes gambar
+        model_name: Nama model rembg
+        **params: Parameter process_parking_image (selain default)
+
+    Returns:
+        str: Kunci cache (hex)
+    """
+    return _hash_key('result', image_hash, model_name,
+                     _canonical_params(PIPELINE_DEFAULTS, params))
+
+
+def split_params(params: Dict) -> Tuple[Dict, Dict]:
+    """Memisahkan parameter pipeline menjadi (segmentasi, analisis)"""
+    _canonical_params(PIPELINE_DEFAULTS, params)
+    segmentation = {k: v for k, v in params.items() if k in SEGMENTATION_PARAMS}
+    analysis = {k: v for k, v in params.items() if k in ANALYSIS_PARAMS}
+    return segmentation, analysis
+
+
+def _freeze(value):
+    """Menandai array (atau array di dalam dict/tuple) sebagai read-only"""
+    if isinstance(value, np.ndarray):
+        value.flags.writeable = False
+    elif isinstance(value, dict):
+        for item in value.values():
+            _freeze(item)
+    elif isinstance(value, tuple):
+        for item in value:
+            _freeze(item)
+    return value
+
+
+def _nbytes(value) -> int:
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_nbytes(item) for item in value.values())
+    if isinstance(value, tuple):
+        return sum(_nbytes(item) for item in value)
+    return 0
+
+
+class LRUCache:
+    """LRU thread-safe yang dibatasi jumlah entri, total byte array, dan umur"""
+
+    def __init__(self,
+                 max_entries: int = 64,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 max_age: Optional[float] = None):
+        """
+        Args:
+            max_entries: Jumlah entri maksimum
+            max_bytes: Total byte array maksimum
+            max_age: Umur maksimum entri dalam detik (None = tanpa batas)
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+
+        self._entries = OrderedDict()  # key -> (created, nbytes, value)
+        self._nbytes = 0
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def nbytes(self) -> int:
+        return self._nbytes
+
+    def get(self, key: str):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            created, nbytes, value = entry
+            if self.max_age is not None and time.time() - created > self.max_age:
+                del self._entries[key]
+                self._nbytes -= nbytes
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: str, value):
+        nbytes = _nbytes(value)
+        if nbytes > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._nbytes -= old[1]
+            self._entries[key] = (time.time(), nbytes, value)
+            self._nbytes += nbytes
+            while self._entries and (len(self._entries) > self.max_entries
+                                     or self._nbytes > self.max_bytes):
+                _, (_, evicted_bytes, _) = self._entries.popitem(last=False)
+                self._nbytes -= evicted_bytes
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._nbytes = 0
+
+
+def _write_npz(path: str, arrays: Dict[str, np.ndarray]):
+    """Menulis npz terkompresi secara atomik"""
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class DiskStore:
+    """
+    Folder file npz per kunci, dibatasi total ukuran dan umur file
+
+    Total ukuran dicatat berjalan saat menulis; folder hanya dipindai
+    ulang saat total melewati max_bytes atau setiap rescan_interval
+    tulisan (menyinkronkan file dari proses lain dan membuang yang kedaluwarsa).
+    Eviksi menyisakan ruang sampai low_water * max_bytes, sehingga cache yang
+    penuh tidak dipindai ulang pada setiap tulisan.
+    """
+
+    low_water = 0.9
+
+    def __init__(self,
+                 directory: str,
+                 max_bytes: int = 1024 * 1024 * 1024,
+                 max_age: Optional[float] = None,
+                 rescan_interval: int = 256):
+        """
+        Args:
+            directory: Folder penyimpanan
+            max_bytes: Total ukuran file maksimum
+            max_age: Umur maksimum file dalam detik (None = tanpa batas)
+            rescan_interval: Jumlah tulisan maksimum di antara dua pemindaian folder
+        """
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.rescan_interval = rescan_interval
+        self._total: Optional[int] = None
+        self._writes = 0
+        self._lock = threading.Lock()
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.npz")
+
+    def load(self, key: str, loader: Callable[[str], object]):
+        """Membaca entri dengan loader(path); None jika tidak ada/kedaluwarsa/rusak"""
+        path = self.path(key)
+        try:
+            mtime = os.path.getmtime(path)
+            if self.max_age is not None and time.time() - mtime > self.max_age:
+                os.unlink(path)
+                return None
+            value = loader(path)
+            os.utime(path)  # tandai baru dipakai untuk eviksi LRU
+        except (OSError, ValueError, KeyError):
+            return None
+        except (zipfile.BadZipFile, EOFError):
+            # File terpotong/rusak: dibuang agar ditulis ulang pada miss berikutnya
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            return None
+        return value
+
+    def save(self, key: str, saver: Callable[[str], None]):
+        """Menulis entri dengan saver(path) lalu menjalankan eviksi bila perlu"""
+        path = self.path(key)
+        try:
+            old_size = os.path.getsize(path)
+        except OSError:
+            old_size = 0
+        saver(path)
+        try:
+            size = os.path.getsize(path)
+        except OSError:
+            size = 0
+        with self._lock:
+            self._writes += 1
+            if self._total is not None:
+                self._total += size - old_size
+            rescan = (self._total is None or self._total > self.max_bytes
+                      or self._writes >= self.rescan_interval)
+        if rescan:
+            self.evict()
+
+    def evict(self):
+        """
+        Memindai folder dan membuang file kedaluwarsa; jika total melewati
+        max_bytes, file terlama dibuang sampai <= low_water * max_bytes
+        """
+        files = []
+        now = time.time()
+        for root, _, names in os.walk(self.directory):
+            for name in names:
+                if not name.endswith('.npz'):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                    if self.max_age is not None and now - st.st_mtime > self.max_age:
+                        os.unlink(path)
+                        continue
+                except OSError:
+                    continue
+                files.append((st.st_mtime, st.st_size, path))
+
+        total = sum(size for _, size, _ in files)
+        limit = self.max_bytes * self.low_water if total > self.max_bytes else self.max_bytes
+        for _, size, path in sorted(files):
+            if total <= limit:
+                break
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
+            total -= size
+        with self._lock:
+            self._total = total
+            self._writes = 0
+
+
+def _load_mask_npz(path: str) -> np.ndarray:
+    with np.load(path, allow_pickle=False) as data:
+        return data['mask']
+
+
+class SegmentationCache:
+    """
+    Memoize tahap segmentasi (segment_parking_image). Tier memori menyimpan
+    gambar original dan mask; tier disk hanya menyimpan mask, gambar original
+    di-decode ulang dari bytes saat dibaca (jauh lebih murah dari rembg).
+    """
+
+    def __init__(self,
+                 max_entries: int = 32,
+                 max_bytes: int = 128 * 1024 * 1024,
+                 max_age: Optional[float] = None,
+                 disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 1024 * 1024 * 1024,
+                 disk_max_age: Optional[float] = None):
+        """
+        Args:
+            max_entries: Jumlah entri maksimum di memori
+            max_bytes: Total byte array maksimum di memori
+            max_age: Umur maksimum entri memori dalam detik (None = tanpa batas)
+            disk_dir: Folder cache disk (None = tanpa tier disk)
+            disk_max_bytes: Total ukuran file maksimum di disk
+            disk_max_age: Umur maksimum file disk dalam detik (None = tanpa batas)
+        """
+        self.memory = LRUCache(max_entries, max_bytes, max_age)
+        self.disk = DiskStore(disk_dir, disk_max_bytes, disk_max_age) if disk_dir else None
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def segment(self,
+                image_bytes: bytes,
+                session_pool: Optional[RembgSessionPool] = None,
+                image_hash: Optional[str] = None,
+                timings: Optional[Dict[str, float]] = None,
+                decoded: Optional[np.ndarray] = None,
+                **params) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Seperti segment_parking_image, tetapi hasil diambil dari cache jika ada
+
+        Args:
+            image_bytes: Bytes dari gambar input
+            session_pool: Pool session rembg (default: pool bersama proses)
+            image_hash: content_hash(image_bytes) jika sudah dihitung
+            timings: Dict untuk mencatat durasi tiap tahap (opsional)
+            decoded: Hasil decode yang sudah ada (lihat segment_parking_image)
+            **params: Parameter segmentasi (lihat SEGMENTATION_PARAMS)
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: (gambar original ukuran kerja, mask)
+            yang read-only. Backend stateful (mis. MOG2) selalu dihitung
+            ulang dan tidak disimpan.
+        """
+        if session_pool is None:
+            session_pool = get_segmentation_backend()
+        if is_stateful(session_pool):
+            return _freeze(segment_parking_image(
+                image_bytes, session_pool, timings=timings, decoded=decoded, **params
+            ))
+        if image_hash is None:
+            image_hash = content_hash(image_bytes)
+        if timings is None:
+            timings = {}
+        key = make_segmentation_key(image_hash, session_pool.model_name, **params)
+
+        cached = self.memory.get(key)
+        if cached is not None:
+            self.stats['memory_hits'] += 1
+            return cached
+
+        if self.disk is not None:
+            start = time.perf_counter()
+            mask = self.disk.load(key, _load_mask_npz)
+            if mask is not None:
+                merged = _canonical_params(SEGMENTATION_PARAMS, params)
+                working_size = tuple(merged['working_size'])
+                image = decoded
+                if image is None or not merged['downscale_first']:
+                    image = decode_image(
+                        image_bytes,
+                        min_size=working_size if merged['downscale_first'] else None
+                    )
+                cached = _freeze((resize_image(image, *working_size), mask))
+                timings['segmentation_cache'] = time.perf_counter() - start
+                self.memory.put(key, cached)
+                self.stats['disk_hits'] += 1
+                return cached
+
+        self.stats['misses'] += 1
+        cached = _freeze(segment_parking_image(
+            image_bytes, session_pool, timings=timings, decoded=decoded, **params
+        ))
+        self.memory.put(key, cached)
+        if self.disk is not None:
+            self.disk.save(key, lambda path: _write_npz(path, {'mask': cached[1]}))
+        return cached
+
+
+# Citra tahapan biner yang murah disimpan di disk (bit-packed)
+DISK_STAGES = ('threshold', 'morphology', 'sure_foreground')
+
+
+def save_result_npz(path: str, result: Dict, stages: Iterable[str] = DISK_STAGES):
+    """
+    Menyimpan hasil ke file npz terkompresi: statistik, status slot, dan
+    citra tahapan dalam stages. Citra biner (0/255) disimpan sebagai
+    bit-packed, sisanya dikompresi apa adanya.
+    """
+    meta = {key: value for key, value in result.items()
+            if not isinstance(value, np.ndarray) and key != 'cache'}
+    meta['motor_boxes'] = [list(box) for box in meta.get('motor_boxes', [])]
+    arrays = {'meta': np.frombuffer(json.dumps(meta).encode(), np.uint8)}
+
+    for stage in frozenset(stages).intersection(result):
+        image = result[stage]
+        if image.dtype == np.uint8 and image.ndim == 2 and \
+                not np.any((image != 0) & (image != 255)):
+            arrays[f'{stage}__bits'] = np.packbits(image > 0)
+            arrays[f'{stage}__shape'] = np.array(image.shape)
+        else:
+            arrays[stage] = image
+
+    _write_npz(path, arrays)
+
+
+def load_result_npz(path: str) -> Dict:
+    """Membaca hasil yang disimpan dengan save_result_npz"""
+    with np.load(path, allow_pickle=False) as data:
+        result = json.loads(data['meta'].tobytes().decode())
+        result['motor_boxes'] = [tuple(box) for box in result.get('motor_boxes', [])]
+        for name in data.files:
+            if name == 'meta' or name.endswith('__shape'):
+                continue
+            if name.endswith('__bits'):
+                stage = name[:-len('__bits')]
+                shape = tuple(data[f'{stage}__shape'])
+                bits = np.unpackbits(data[name], count=int(np.prod(shape)))
+                result[stage] = (bits * 255).astype(np.uint8).reshape(shape)
+            else:
+                result[name] = data[name]
+    return result
+
+
+def _stored_stages(result: Dict) -> frozenset:
+    # Hasil yang ditolak (max_motors) memang tidak punya citra tahapan
+    if result.get('rejected'):
+        return frozenset(STAGE_OUTPUTS)
+    return frozenset(stage for stage in STAGE_OUTPUTS if stage in result)
+
+
+def _select(result: Dict, stages: frozenset, source: str) -> Dict:
+    """Menyalin dict hasil (shallow) hanya dengan citra tahapan yang diminta"""
+    selected = {
+        key: value for key, value in result.items()
+        if key not in STAGE_OUTPUTS or key in stages
+    }
+    selected['cache'] = source
+    return selected
+
+
+class ResultCache:
+    """
+    Cache dua tingkat untuk hasil process_parking_image:
+    LRU di memori (dibatasi jumlah entri, byte, dan umur) dan opsional
+    file npz di disk (dibatasi total byte dan umur). Saat hasil tidak ada,
+    segmentasi diambil dari SegmentationCache sehingga hanya tahap analisis
+    yang dihitung ulang.
+    """
+
+    def __init__(self,
+                 max_entries: int = 64,
+                 max_bytes: int = 256 * 1024 * 1024,
+                 max_age: Optional[float] = None,
+                 disk_dir: Optional[str] = None,
+                 disk_max_bytes: int = 1024 * 1024 * 1024,
+                 disk_max_age: Optional[float] = None,
+                 disk_stages: Iterable[str] = DISK_STAGES,
+                 segmentation_cache: Optional[SegmentationCache] = None,
+                 thumbnail_max_bytes: int = 32 * 1024 * 1024):
+        """
+        Args:
+            max_entries: Jumlah entri maksimum di memori
+            max_bytes: Total byte array maksimum di memori
+            max_age: Umur maksimum entri memori dalam detik (None = tanpa batas)
+            disk_dir: Folder cache disk (None = tanpa tier disk). Hasil
+                disimpan di subfolder 'results', segmentasi di 'segmentation'.
+            disk_max_bytes: Total ukuran file maksimum di disk (per subfolder)
+            disk_max_age: Umur maksimum file disk dalam detik (None = tanpa batas)
+            disk_stages: Citra tahapan yang ikut disimpan di disk. Default
+                hanya mask biner agar file tetap kecil; permintaan citra
+                lain yang tidak ada di disk dihitung ulang.
+            segmentation_cache: Cache segmentasi yang dipakai saat hasil
+                tidak ada (default: SegmentationCache baru, berbagi disk_dir)
+            thumbnail_max_bytes: Total byte maksimum thumbnail ter-encode
+                di memori (lihat thumbnails)
+        """
+        self.memory = LRUCache(max_entries, max_bytes, max_age)
+        self.disk = None
+        if disk_dir:
+            self.disk = DiskStore(os.path.join(disk_dir, 'results'),
+                                  disk_max_bytes, disk_max_age)
+        self.disk_stages = frozenset(disk_stages)
+        if segmentation_cache is None:
+            segmentation_cache = SegmentationCache(
+                disk_dir=os.path.join(disk_dir, 'segmentation') if disk_dir else None,
+                disk_max_bytes=disk_max_bytes,
+                disk_max_age=disk_max_age,
+            )
+        self.segmentation_cache = segmentation_cache
+        self.thumbnail_cache = LRUCache(max_entries * 8, thumbnail_max_bytes, max_age)
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key: str, stages: Iterable[str] = ()) -> Optional[Dict]:
+        """
+        Mengambil hasil dari cache jika semua citra tahapan yang diminta tersedia
+
+        Returns:
+            Optional[dict]: Hasil dengan field 'cache' ('memory'/'disk'), atau None
+        """
+        stages = frozenset(stages)
+        result = self.memory.get(key)
+        if result is not None and stages <= _stored_stages(result):
+            self.stats['memory_hits'] += 1
+            return _select(result, stages, 'memory')
+
+        if self.disk is not None:
+            result = self.disk.load(key, load_result_npz)
+            if result is not None and stages <= _stored_stages(result):
+                self.memory.put(key, _freeze(result))
+                self.stats['disk_hits'] += 1
+                return _select(result, stages, 'disk')
+        return None
+
+    def put(self, key: str, result: Dict):
+        """Menyimpan hasil ke memori dan (jika aktif) ke disk"""
+        result = _freeze({k: v for k, v in result.items() if k != 'cache'})
+        self.memory.put(key, result)
+        if self.disk is not None:
+            self.disk.save(key, lambda path: save_result_npz(path, result, self.disk_stages))
+
+    def lookup(self,
+               image_hash: str,
+               model_name: str,
+               stages: Iterable[str] = STAGE_OUTPUTS,
+               **params) -> Optional[Dict]:
+        """
+        Mengambil hasil yang sudah ada tanpa memproses, mis. untuk
+        menampilkan hasil gambar yang pernah diproses pengguna lain
+
+        Args:
+            image_hash: Hasil content_hash dari bytes gambar
+            model_name: Nama model backend segmentasi
+            stages: Citra tahapan yang diminta (lihat STAGE_OUTPUTS)
+            **params: Parameter pipeline lain untuk process_parking_image
+
+        Returns:
+            Optional[dict]: Hasil seperti process(), atau None jika belum ada
+        """
+        return self.get(make_cache_key(image_hash, model_name, **params), stages)
+
+    def thumbnails(self,
+                   image_hash: str,
+                   model_name: str,
+                   result: Optional[Dict] = None,
+                   width: int = 320,
+                   fmt: str = 'webp',
+                   quality: int = 80,
+                   **params) -> Optional[Dict[str, bytes]]:
+        """
+        Thumbnail ter-encode semua citra tahapan (lihat
+        encode_stage_thumbnails), dibuat sekali per hasil lalu di-cache
+
+        Args:
+            image_hash: Hasil content_hash dari bytes gambar
+            model_name: Nama model backend segmentasi
+            result: Hasil yang sudah dipegang pemanggil (dipakai jika
+                hasil sudah tergusur dari cache)
+            width: Lebar thumbnail dalam piksel
+            fmt: Format encode ('webp' atau 'jpeg')
+            quality: Kualitas encode (1-100)
+            **params: Parameter pipeline lain untuk process_parking_image
+
+        Returns:
+            Optional[Dict[str, bytes]]: Nama tahapan -> bytes gambar, atau
+            None jika hasilnya tidak ada
+        """
+        if result is not None and result.get('cache') == 'bypass':
+            # Hasil backend stateful tidak stabil per gambar, jangan di-cache
+            return encode_stage_thumbnails(result, width=width, fmt=fmt, quality=quality)
+        key = make_cache_key(image_hash, model_name, **params)
+        thumbnail_key = _hash_key('thumbnails', key, width, fmt, quality)
+        thumbnails = self.thumbnail_cache.get(thumbnail_key)
+        if thumbnails is not None:
+            return thumbnails
+        if result is None:
+            result = self.get(key, STAGE_OUTPUTS)
+            if result is None:
+                return None
+        thumbnails = encode_stage_thumbnails(result, width=width, fmt=fmt, quality=quality)
+        self.thumbnail_cache.put(thumbnail_key, thumbnails)
+        return thumbnails
+
+    def clear(self):
+        """Mengosongkan tier memori (hasil, thumbnail, dan segmentasi)"""
+        self.memory.clear()
+        self.thumbnail_cache.clear()
+        self.segmentation_cache.memory.clear()
+
+    def process(self,
+                image_bytes: bytes,
+                session_pool: Optional[RembgSessionPool] = None,
+                stages: Iterable[str] = STAGE_OUTPUTS,
+                decoded: Optional[np.ndarray] = None,
+                **params) -> Dict:
+        """
+        Seperti process_parking_image, tetapi hasil diambil dari cache jika ada
+
+        Args:
+            image_bytes: Bytes dari gambar input
+            session_pool: Pool session rembg (default: pool bersama proses)
+            stages: Citra tahapan yang diminta (lihat STAGE_OUTPUTS)
+            decoded: Hasil decode_image(image_bytes, min_size=WORKING_SIZE)
+                yang sudah ada, agar gambar tidak di-decode ulang
+            **params: Parameter pipeline lain untuk process_parking_image
+
+        Returns:
+            dict: Hasil pemrosesan dengan field tambahan 'cache'
+            ('memory', 'disk', 'miss', atau 'bypass' untuk backend stateful
+            yang tidak di-cache). Array di dalamnya read-only.
+        """
+        if session_pool is None:
+            session_pool = get_segmentation_backend()
+        stages = frozenset(stages)
+        if is_stateful(session_pool):
+            # Mask bergantung pada frame sebelumnya: hasil per gambar tidak stabil
+            increment('cache_results_total', cache='bypass')
+            result = self._compute(image_bytes, session_pool, None, decoded, stages, params)
+            return _select(_freeze(result), stages, 'bypass')
+
+        image_hash = content_hash(image_bytes)
+        key = make_cache_key(image_hash, session_pool.model_name, **params)
+
+        cached = self.get(key, stages)
+        if cached is not None:
+            increment('cache_results_total', cache=cached['cache'])
+            return cached
+
+        self.stats['misses'] += 1
+        increment('cache_results_total', cache='miss')
+        result = self._compute(image_bytes, session_pool, image_hash, decoded, stages, params)
+        self.put(key, result)
+        return _select(result, stages, 'miss')
+
+    def _compute(self, image_bytes, session_pool, image_hash, decoded, stages, params) -> Dict:
+        segmentation_params, analysis_params = split_params(params)
+        timings = {}
+        with request_span():
+            img_original, mask = self.segmentation_cache.segment(
+                image_bytes, session_pool, image_hash, timings, decoded, **segmentation_params
+            )
+            return analyze_segmentation(
+                img_original, mask, stages, timings=timings, **analysis_params
+            )
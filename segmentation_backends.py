@@ -0,0 +1,274 @@
+"""
+Backend segmentasi foreground yang dapat dipilih per deployment
+Kelompok: AFEnter
+
+Setiap backend menyediakan ``predict_mask(rgb) -> mask uint8`` (0-255,
+ukuran sama dengan input), ``warm_up()``, dan ``model_name`` (dipakai
+sebagai bagian kunci cache). Backend yang mask-nya bergantung pada frame
+sebelumnya menandai ``stateful = True`` dan tidak di-cache (lihat
+is_stateful). Backend yang tersedia:
+
+- ``rembg``: RembgSessionPool (u2net, default)
+- ``static``: selisih terhadap background statis yang dipelajari
+  (median beberapa frame kamera tanpa/kurang kendaraan)
+- ``mog2``: cv2.createBackgroundSubtractorMOG2 (stateful, untuk stream)
+
+Pilihan default diambil dari variabel environment ``SEGMENTATION_BACKEND``
+dan ``SEGMENTATION_BACKGROUND`` (gambar background untuk 'static'/'mog2').
+"""
+
+import hashlib
+import os
+import threading
+from typing import Dict, Iterable, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from rembg_session import RembgSessionPool, get_session_pool
+
+
+def _clean_mask(mask: np.ndarray, kernel_size: int) -> np.ndarray:
+    """Membuang noise kecil dan menutup lubang pada mask biner"""
+    if kernel_size <= 1:
+        return mask
+    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kernel_size, kernel_size))
+    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, kernel)
+    return cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+
+def _downscale(image: np.ndarray, scale: float) -> np.ndarray:
+    if scale >= 1.0:
+        return image
+    h, w = image.shape[:2]
+    size = (max(1, int(round(w * scale))), max(1, int(round(h * scale))))
+    return cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+
+
+def _upscale_mask(mask: np.ndarray, shape: Tuple[int, int]) -> np.ndarray:
+    if mask.shape[:2] == shape:
+        return mask
+    h, w = shape
+    return cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST)
+
+
+def learn_background(images: Iterable[np.ndarray],
+                     size: Optional[Tuple[int, int]] = None,
+                     max_images: int = 50) -> np.ndarray:
+    """
+    Mempelajari background statis sebagai median per piksel
+
+    Args:
+        images: Frame dari kamera yang sama (format warna sama dengan input backend)
+        size: (width, height) tujuan; None = ukuran frame pertama
+        max_images: Jumlah frame maksimum yang dipakai (diambil merata)
+
+    Returns:
+        np.ndarray: Gambar background uint8
+    """
+    images = list(images)
+    if not images:
+        raise ValueError("At least one image is required to learn a background")
+    step = max(1, len(images) // max_images)
+    if size is None:
+        size = (images[0].shape[1], images[0].shape[0])
+    stack = np.stack([cv2.resize(image, size, interpolation=cv2.INTER_AREA)
+                      for image in images[::step][:max_images]])
+    return np.median(stack, axis=0).astype(np.uint8)
+
+
+class StaticBackgroundBackend:
+    """Foreground = piksel yang berbeda jauh dari background statis"""
+
+    def __init__(self,
+                 background: np.ndarray,
+                 threshold: int = 30,
+                 blur_kernel: int = 3,
+                 morph_kernel: int = 3,
+                 scale: float = 0.25):
+        """
+        Args:
+            background: Gambar background (RGB, uint8); di-resize otomatis
+                mengikuti ukuran input
+            threshold: Selisih intensitas minimum (kanal terbesar) untuk foreground
+            blur_kernel: Kernel Gaussian blur sebelum differencing
+            morph_kernel: Kernel opening/closing untuk membersihkan mask
+            scale: Skala resolusi tempat differencing dilakukan; mask
+                diperbesar kembali ke ukuran input
+        """
+        self.background = background
+        self.scale = scale
+        self.threshold = threshold
+        self.blur_kernel = blur_kernel
+        self.morph_kernel = morph_kernel
+        digest = hashlib.blake2b(background.tobytes(), digest_size=8).hexdigest()
+        self.model_name = f"static-{digest}-t{threshold}-s{scale:g}"
+        self._resized: Dict[Tuple[int, int], np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "StaticBackgroundBackend":
+        """Memuat background dari file gambar"""
+        image = cv2.imread(path, cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError(f"Cannot read background image: {path!r}")
+        return cls(cv2.cvtColor(image, cv2.COLOR_BGR2RGB), **kwargs)
+
+    def _blur(self, image: np.ndarray) -> np.ndarray:
+        if self.blur_kernel <= 1:
+            return image
+        return cv2.GaussianBlur(image, (self.blur_kernel, self.blur_kernel), 0)
+
+    def _background_for(self, shape: Tuple[int, int]) -> np.ndarray:
+        with self._lock:
+            background = self._resized.get(shape)
+            if background is None:
+                h, w = shape
+                background = self._blur(cv2.resize(self.background, (w, h),
+                                                   interpolation=cv2.INTER_AREA))
+                self._resized[shape] = background
+            return background
+
+    def predict_mask(self, rgb: np.ndarray) -> np.ndarray:
+        small = self._blur(_downscale(rgb, self.scale))
+        diff = cv2.absdiff(small, self._background_for(small.shape[:2]))
+        # Selisih terbesar di antara kanal warna
+        diff = cv2.max(cv2.max(diff[:, :, 0], diff[:, :, 1]), diff[:, :, 2])
+        _, mask = cv2.threshold(diff, self.threshold, 255, cv2.THRESH_BINARY)
+        return _upscale_mask(_clean_mask(mask, self.morph_kernel), rgb.shape[:2])
+
+    def warm_up(self) -> "StaticBackgroundBackend":
+        return self
+
+
+class MOG2Backend:
+    """
+    Background subtraction adaptif (Gaussian mixture) untuk kamera tetap
+
+    Model diperbarui setiap frame (learning_rate), sehingga hasilnya
+    bergantung pada urutan frame; gunakan untuk stream, bukan untuk cache
+    hasil per gambar (cache hasil dilewati, lihat is_stateful).
+    """
+
+    stateful = True
+
+    def __init__(self,
+                 history: int = 500,
+                 var_threshold: float = 16.0,
+                 detect_shadows: bool = True,
+                 learning_rate: float = -1.0,
+                 morph_kernel: int = 3,
+                 scale: float = 0.25):
+        """
+        Args:
+            history: Jumlah frame yang membentuk model background
+            var_threshold: Ambang jarak Mahalanobis kuadrat untuk foreground
+            detect_shadows: Tandai bayangan (dianggap background di mask)
+            learning_rate: Laju pembaruan model (-1 = otomatis dari history)
+            morph_kernel: Kernel opening/closing untuk membersihkan mask
+            scale: Skala resolusi tempat model berjalan; mask diperbesar
+                kembali ke ukuran input
+        """
+        self.history = history
+        self.scale = scale
+        self.var_threshold = var_threshold
+        self.detect_shadows = detect_shadows
+        self.learning_rate = learning_rate
+        self.morph_kernel = morph_kernel
+        self.model_name = f"mog2-h{history}-v{var_threshold:g}-s{scale:g}"
+        self._size: Optional[Tuple[int, int]] = None
+        self._subtractor = None
+        self._lock = threading.Lock()
+
+    def _ensure(self, shape: Tuple[int, int]):
+        # Ukuran frame berubah -> model lama tidak berlaku lagi
+        if self._subtractor is None or self._size != shape:
+            self._subtractor = cv2.createBackgroundSubtractorMOG2(
+                self.history, self.var_threshold, self.detect_shadows)
+            self._size = shape
+
+    def learn(self, images: Iterable[np.ndarray]) -> "MOG2Backend":
+        """Melatih model dengan frame background (format warna sama dengan input)"""
+        with self._lock:
+            for image in images:
+                small = _downscale(image, self.scale)
+                self._ensure(small.shape[:2])
+                self._subtractor.apply(small, learningRate=-1)
+        return self
+
+    def predict_mask(self, rgb: np.ndarray) -> np.ndarray:
+        small = _downscale(rgb, self.scale)
+        with self._lock:
+            self._ensure(small.shape[:2])
+            raw = self._subtractor.apply(small, learningRate=self.learning_rate)
+        # 255 = foreground, 127 = bayangan
+        _, mask = cv2.threshold(raw, 200, 255, cv2.THRESH_BINARY)
+        return _upscale_mask(_clean_mask(mask, self.morph_kernel), rgb.shape[:2])
+
+    def warm_up(self) -> "MOG2Backend":
+        return self
+
+
+BACKENDS = ('rembg', 'static', 'mog2')
+
+
+def is_stateful(backend) -> bool:
+    """True jika mask backend bergantung pada frame sebelumnya (tidak boleh di-cache)"""
+    return bool(getattr(backend, 'stateful', False))
+
+
+def create_backend(name: str, background_path: Optional[str] = None, **kwargs):
+    """
+    Membuat backend segmentasi berdasarkan nama
+
+    Args:
+        name: 'rembg', 'static', atau 'mog2'
+        background_path: Gambar background (wajib untuk 'static', opsional
+            untuk melatih awal 'mog2')
+        **kwargs: Diteruskan ke konstruktor backend
+
+    Returns:
+        Backend dengan predict_mask(rgb), warm_up(), dan model_name
+    """
+    if name == 'rembg':
+        return RembgSessionPool(**kwargs) if kwargs else get_session_pool()
+    if name == 'static':
+        if not background_path:
+            raise ValueError("The 'static' backend needs a background image")
+        return StaticBackgroundBackend.from_file(background_path, **kwargs)
+    if name == 'mog2':
+        backend = MOG2Backend(**kwargs)
+        if background_path:
+            background = StaticBackgroundBackend.from_file(background_path).background
+            backend.learn([background])
+        return backend
+    raise ValueError(f"Unknown segmentation backend: {name!r} (choose from {BACKENDS})")
+
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+
+def configure_segmentation_backend(backend) -> object:
+    """Mengganti backend default proses (mis. hasil create_backend)"""
+    global _default_backend
+    with _default_backend_lock:
+        _default_backend = backend
+    return backend
+
+
+def get_segmentation_backend():
+    """
+    Backend default proses: dari SEGMENTATION_BACKEND (default 'rembg',
+    yaitu pool session rembg bersama)
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is not None:
+            return _default_backend
+    name = os.environ.get("SEGMENTATION_BACKEND", "rembg")
+    if name == 'rembg':
+        # Tetap mengikuti configure_session_pool yang mungkin dipanggil belakangan
+        return get_session_pool()
+    backend = create_backend(name, os.environ.get("SEGMENTATION_BACKGROUND"))
+    return configure_segmentation_backend(backend)
@@ -0,0 +1,362 @@
+"""
+Layanan HTTP headless (asyncio) untuk deteksi slot parkir
+Kelompok: AFEnter
+
+Endpoint:
+    POST /v1/parking   body = bytes gambar (JPEG/PNG), parameter analisis
+                       opsional lewat query string, mis. ?min_area=500
+    GET  /healthz      status layanan dan kedalaman antrean
+    GET  /metrics      metrik format Prometheus (lihat instrumentation.py)
+
+Pekerjaan CPU (decode, rembg, OpenCV) dijalankan di thread pool berukuran
+tetap dengan satu session rembg hangat per worker, sehingga event loop tetap
+bebas menerima upload. Jika worker dan antrean penuh, request langsung
+ditolak dengan 503 + Retry-After.
+
+Contoh:
+    python service.py --port 8000 --workers 2 --max-queue 16
+    curl --data-binary @"dataset/All Dataset/Citra (1).jpg" http://127.0.0.1:8000/v1/parking
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+from typing import Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlsplit
+
+import cv2
+
+from image_processing import process_parking_image, validate_analysis_params
+from instrumentation import MetricsCollector, add_observer, configure_from_env, increment
+from micro_batching import MicroBatcher
+from rembg_session import configure_session_pool
+from result_cache import ANALYSIS_PARAMS, PIPELINE_DEFAULTS, ResultCache
+
+
+MAX_HEADER_BYTES = 16 * 1024
+# slot_layout berupa path file di server, sehingga hanya bisa diatur lewat --slot-layout;
+# max_motors mengubah bentuk respons (tanpa status slot) dan hanya dipakai dashboard
+REQUEST_PARAMS = tuple(name for name in ANALYSIS_PARAMS
+                       if name not in ('slot_layout', 'max_motors'))
+# Batas atas parameter dari klien: kernel/iterasi besar membuat morfologi
+# menahan worker sangat lama (validate_analysis_params hanya batas bawah)
+REQUEST_PARAM_LIMITS = {
+    'blur_kernel': 31,
+    'morph_kernel': 31,
+    'close_iterations': 10,
+    'open_iterations': 10,
+    'slot_count': 64,
+}
+
+
+class HTTPError(Exception):
+    """Error yang langsung dikirim ke klien sebagai respons JSON"""
+
+    def __init__(self, status: int, message: str, headers: Optional[Dict[str, str]] = None):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def parse_params(query: str) -> Dict:
+    """
+    Mengubah query string menjadi parameter analisis process_parking_image
+
+    Hanya parameter analisis (REQUEST_PARAMS) yang diterima; tipenya
+    mengikuti nilai default di process_parking_image dan rentangnya
+    (termasuk REQUEST_PARAM_LIMITS) diperiksa sebelum request masuk antrean.
+    """
+    params = {}
+    for name, value in parse_qsl(query, keep_blank_values=True):
+        if name not in REQUEST_PARAMS:
+            raise HTTPError(400, f"Unknown parameter: {name!r}")
+        try:
+            params[name] = type(PIPELINE_DEFAULTS[name])(value)
+        except ValueError:
+            raise HTTPError(400, f"Invalid value for {name!r}: {value!r}") from None
+        limit = REQUEST_PARAM_LIMITS.get(name)
+        if limit is not None and params[name] > limit:
+            raise HTTPError(400, f"{name} must be at most {limit}, got {params[name]!r}")
+    try:
+        validate_analysis_params(params)
+    except ValueError as e:
+        raise HTTPError(400, str(e)) from None
+    return params
+
+
+class ParkingService:
+    """Aplikasi HTTP: antrean terbatas di depan thread pool pemrosesan"""
+
+    def __init__(self,
+                 workers: int = 1,
+                 max_queue: int = 8,
+                 max_body_bytes: int = 20 * 1024 * 1024,
+                 request_timeout: float = 60.0,
+                 model_name: Optional[str] = None,
+                 cache_entries: int = 0,
+                 batch_size: int = 1,
+                 batch_wait_ms: float = 10.0,
+                 slot_layout: Optional[str] = None,
+                 collector: Optional[MetricsCollector] = None):
+        """
+        Args:
+            workers: Jumlah gambar yang diproses bersamaan (= jumlah session rembg)
+            max_queue: Jumlah request maksimum yang boleh menunggu worker
+            max_body_bytes: Ukuran upload maksimum
+            request_timeout: Batas waktu menunggu hasil sebelum 504
+            model_name: Nama model rembg
+            cache_entries: Kapasitas ResultCache di memori (0 = tanpa cache)
+            batch_size: Ukuran micro-batch inferensi rembg (1 = tanpa batching)
+            batch_wait_ms: Waktu tunggu maksimum pengisian micro-batch
+            slot_layout: File layout slot 'path' atau 'path#kamera' untuk
+                semua request (dibaca ulang otomatis saat berubah)
+            collector: Kolektor metrik untuk /metrics (opsional)
+        """
+        self.workers = workers
+        self.max_queue = max_queue
+        self.max_body_bytes = max_body_bytes
+        self.request_timeout = request_timeout
+        self.collector = collector
+        self.default_params = {'slot_layout': slot_layout} if slot_layout else {}
+
+        # Paralelisme di level worker: bagi core CPU ke setiap session
+        intra_op_threads = max(1, (os.cpu_count() or 1) // workers)
+        self.session_pool = configure_session_pool(
+            model_name=model_name,
+            size=workers,
+            intra_op_threads=intra_op_threads,
+            inter_op_threads=1,
+        ).warm_up()
+        # Dengan micro-batching, worker tetap paralel untuk decode/OpenCV
+        # sementara inferensi mereka digabung oleh satu dispatcher
+        self.segmenter = self.session_pool
+        if batch_size > 1:
+            self.segmenter = MicroBatcher(self.session_pool, batch_size, batch_wait_ms).warm_up()
+        self.cache = ResultCache(max_entries=cache_entries) if cache_entries > 0 else None
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="parking")
+        self.pending = 0
+
+    # ---------------- pemrosesan ----------------
+
+    def _process(self, image_bytes: bytes, params: Dict) -> Dict:
+        start = time.perf_counter()
+        params = dict(self.default_params, **params)
+        if self.cache is not None:
+            results = self.cache.process(image_bytes, self.segmenter, stages=(), **params)
+        else:
+            results = process_parking_image(image_bytes, self.segmenter, stages=(), **params)
+        return {
+            'slot_results': results['slot_results'],
+            'slot_names': results['slot_names'],
+            'slot_scores': results['slot_scores'],
+            'total_slots': results['total_slots'],
+            'occupied_slots': results['occupied_slots'],
+            'empty_slots': results['empty_slots'],
+            'motor_count': results['motor_count'],
+            'motor_boxes': [[int(v) for v in box] for box in results['motor_boxes']],
+            'cache': results.get('cache'),
+            'timings_ms': {stage: seconds * 1000.0
+                           for stage, seconds in results.get('timings', {}).items()},
+            'elapsed_ms': (time.perf_counter() - start) * 1000.0,
+        }
+
+    def _release(self, _future):
+        self.pending -= 1
+
+    async def submit(self, image_bytes: bytes, params: Dict) -> Dict:
+        """
+        Menjadwalkan satu gambar ke thread pool dengan backpressure
+
+        Raises:
+            HTTPError: 503 jika antrean penuh, 504 jika melewati request_timeout
+        """
+        if self.pending >= self.workers + self.max_queue:
+            raise HTTPError(503, "Server busy, try again later", {'Retry-After': '1'})
+
+        loop = asyncio.get_running_loop()
+        self.pending += 1
+        future = loop.run_in_executor(self.executor, self._process, image_bytes, params)
+        # Slot antrean baru dilepas saat pekerjaan benar-benar selesai,
+        # bukan saat klien menyerah (thread tidak bisa dibatalkan)
+        future.add_done_callback(self._release)
+        try:
+            return await asyncio.wait_for(asyncio.shield(future), self.request_timeout)
+        except asyncio.TimeoutError:
+            raise HTTPError(504, "Processing timed out") from None
+        except ValueError as e:
+            raise HTTPError(400, str(e)) from None
+
+    # ---------------- HTTP ----------------
+
+    async def route(self, method: str, target: str, body: bytes) -> Tuple[int, str, bytes]:
+        """Mengembalikan (status, content type, body) untuk satu request"""
+        url = urlsplit(target)
+        if url.path == '/v1/parking':
+            if method != 'POST':
+                raise HTTPError(405, "Use POST with the image as the request body")
+            if not body:
+                raise HTTPError(400, "Empty request body")
+            result = await self.submit(body, parse_params(url.query))
+            return 200, 'application/json', json.dumps(result).encode()
+
+        if url.path == '/healthz' and method == 'GET':
+            payload = {
+                'status': 'ok',
+                'model': self.session_pool.model_name,
+                'workers': self.workers,
+                'pending': self.pending,
+                'max_queue': self.max_queue,
+            }
+            return 200, 'application/json', json.dumps(payload).encode()
+
+        if url.path == '/metrics' and method == 'GET':
+            if self.collector is None:
+                raise HTTPError(404, "Metrics are disabled")
+            return 200, 'text/plain; version=0.0.4', self.collector.to_prometheus().encode()
+
+        raise HTTPError(404, f"Not found: {url.path}")
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Membaca satu request HTTP/1.1; None jika koneksi ditutup klien"""
+        try:
+            head = await reader.readuntil(b"\r\n\r\n")
+        except asyncio.IncompleteReadError:
+            return None
+        except asyncio.LimitOverrunError:
+            raise HTTPError(431, "Request headers too large") from None
+
+        lines = head.decode('latin-1').split("\r\n")
+        try:
+            method, target, version = lines[0].split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line") from None
+        headers = {}
+        for line in lines[1:]:
+            if ":" in line:
+                name, value = line.split(":", 1)
+                headers[name.strip().lower()] = value.strip()
+
+        if 'chunked' in headers.get('transfer-encoding', '').lower():
+            raise HTTPError(411, "Chunked uploads are not supported, send Content-Length")
+        try:
+            length = int(headers.get('content-length', '0'))
+        except ValueError:
+            raise HTTPError(400, "Invalid Content-Length") from None
+        if length > self.max_body_bytes:
+            raise HTTPError(413, f"Body larger than {self.max_body_bytes} bytes")
+        body = await reader.readexactly(length) if length else b""
+
+        keep_alive = (version == 'HTTP/1.1'
+                      and headers.get('connection', '').lower() != 'close')
+        return method, target, body, keep_alive
+
+    @staticmethod
+    def _write_response(writer: asyncio.StreamWriter, status: int, content_type: str,
+                        body: bytes, keep_alive: bool, extra: Optional[Dict[str, str]] = None):
+        headers = {
+            'Content-Type': content_type,
+            'Content-Length': str(len(body)),
+            'Connection': 'keep-alive' if keep_alive else 'close',
+        }
+        headers.update(extra or {})
+        head = f"HTTP/1.1 {status} {HTTPStatus(status).phrase}\r\n"
+        head += "".join(f"{name}: {value}\r\n" for name, value in headers.items())
+        writer.write(head.encode('latin-1') + b"\r\n" + body)
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                extra = None
+                keep_alive = False
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, body, keep_alive = request
+                    status, content_type, payload = await self.route(method, target, body)
+                except HTTPError as e:
+                    status, content_type = e.status, 'application/json'
+                    payload = json.dumps({'error': e.message}).encode()
+                    extra = e.headers
+                    # Body yang ditolak belum dibaca; koneksi tidak bisa dipakai ulang
+                    keep_alive = keep_alive and e.status not in (400, 411, 413, 431)
+                except Exception as e:
+                    status, content_type = 500, 'application/json'
+                    payload = json.dumps({'error': f"{type(e).__name__}: {e}"}).encode()
+
+                increment('http_responses_total', status=str(status))
+                self._write_response(writer, status, content_type, payload, keep_alive, extra)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(
+            self.handle_connection, host, port, limit=MAX_HEADER_BYTES
+        )
+        print(f"Listening on http://{host}:{port} "
+              f"({self.workers} workers, queue {self.max_queue})", file=sys.stderr)
+        async with server:
+            await server.serve_forever()
+
+    def close(self):
+        self.executor.shutdown(wait=True)
+        if isinstance(self.segmenter, MicroBatcher):
+            self.segmenter.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Layanan HTTP deteksi slot parkir")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", "-j", type=int, default=1,
+                        help="jumlah gambar yang diproses bersamaan")
+    parser.add_argument("--max-queue", type=int, default=8,
+                        help="request yang boleh menunggu sebelum 503")
+    parser.add_argument("--max-body-mb", type=float, default=20.0)
+    parser.add_argument("--timeout", type=float, default=60.0, help="batas waktu per request (detik)")
+    parser.add_argument("--model", default=None, help="nama model rembg")
+    parser.add_argument("--cache-entries", type=int, default=0,
+                        help="kapasitas cache hasil di memori (0 = nonaktif)")
+    parser.add_argument("--batch-size", type=int, default=1,
+                        help="ukuran micro-batch inferensi rembg (1 = nonaktif)")
+    parser.add_argument("--batch-wait-ms", type=float, default=10.0)
+    parser.add_argument("--slot-layout", default=None,
+                        help="file layout slot JSON/YAML, mis. layout.json#gerbang-1")
+    args = parser.parse_args(argv)
+
+    # Thread OpenCV dibatasi; paralelisme datang dari worker
+    cv2.setNumThreads(1)
+    collector = configure_from_env() or add_observer(MetricsCollector())
+    service = ParkingService(
+        workers=args.workers,
+        max_queue=args.max_queue,
+        max_body_bytes=int(args.max_body_mb * 1024 * 1024),
+        request_timeout=args.timeout,
+        model_name=args.model,
+        cache_entries=args.cache_entries,
+        batch_size=args.batch_size,
+        batch_wait_ms=args.batch_wait_ms,
+        slot_layout=args.slot_layout,
+        collector=collector,
+    )
+    try:
+        asyncio.run(service.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
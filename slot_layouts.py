@@ -0,0 +1,208 @@
+"""
+File layout slot parkir per kamera (JSON/YAML) dengan cache dan hot reload
+Kelompok: AFEnter
+
+Format (JSON; YAML sama strukturnya dan butuh PyYAML):
+
+    {
+      "image_size": [960, 540],
+      "metric": "foreground",
+      "threshold": 0.15,
+      "cameras": {
+        "gerbang-1": {
+          "slots": [
+            {"name": "A1", "polygon": [[0, 200], [300, 200], [250, 540], [0, 540]]},
+            {"name": "A2", "rect": [300, 200, 600, 540]}
+          ]
+        }
+      }
+    }
+
+``image_size`` adalah ruang koordinat poligon (default: koordinat piksel
+gambar pada resolusi kerja pipeline); untuk ``metric``/``threshold`` lihat
+occupancy.OCCUPANCY_METRICS. Nilai di level kamera menimpa nilai di level
+file. File satu kamera boleh langsung berisi ``slots`` tanpa ``cameras``.
+
+Layout dirujuk dengan spesifikasi ``path`` atau ``path#kamera`` dan dimuat
+sekali; file dibaca ulang otomatis jika berubah (mtime/ukuran).
+"""
+
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from occupancy import SlotLayout
+
+
+LAYOUT_EXTENSIONS = ('.json', '.yaml', '.yml')
+DEFAULT_CAMERA = 'default'
+
+
+def split_layout_spec(spec: str) -> Tuple[str, Optional[str]]:
+    """Memisahkan 'path#kamera' menjadi (path, kamera atau None)"""
+    path, _, camera = spec.partition('#')
+    return path, camera or None
+
+
+def _is_number(value) -> bool:
+    return isinstance(value, (int, float)) and not isinstance(value, bool)
+
+
+def _parse_slot(slot: Dict, index: int):
+    if not isinstance(slot, dict):
+        raise ValueError(f"Slot {index + 1} must be a mapping, got {type(slot).__name__}")
+    name = str(slot.get('name', f"slot_{index + 1}"))
+    if 'polygon' in slot:
+        polygon = slot['polygon']
+        if (not isinstance(polygon, (list, tuple)) or len(polygon) < 3
+                or not all(isinstance(point, (list, tuple)) and len(point) == 2
+                           and all(map(_is_number, point)) for point in polygon)):
+            raise ValueError(f"Slot {name!r}: 'polygon' must be a list of at least 3 [x, y] points")
+        return name, polygon
+    if 'rect' in slot:
+        rect = slot['rect']
+        if not isinstance(rect, (list, tuple)) or len(rect) != 4 or not all(map(_is_number, rect)):
+            raise ValueError(f"Slot {name!r}: 'rect' must be [x1, y1, x2, y2]")
+        x1, y1, x2, y2 = rect
+        return name, [(x1, y1), (x2, y1), (x2, y2), (x1, y2)]
+    raise ValueError(f"Slot {name!r} needs a 'polygon' or 'rect'")
+
+
+def parse_layouts(data: Dict) -> Dict[str, SlotLayout]:
+    """
+    Membuat SlotLayout per kamera dari isi file layout
+
+    Returns:
+        Dict[str, SlotLayout]: Nama kamera -> layout (file satu kamera
+        memakai nama DEFAULT_CAMERA)
+    """
+    if not isinstance(data, dict):
+        raise ValueError("A slot layout file must contain a mapping")
+    cameras = data.get('cameras')
+    if cameras is None:
+        cameras = {DEFAULT_CAMERA: data}
+    if not isinstance(cameras, dict) or not cameras:
+        raise ValueError("'cameras' must be a non-empty mapping")
+
+    layouts = {}
+    for camera, config in cameras.items():
+        if not isinstance(config, dict):
+            raise ValueError(f"Camera {camera!r} must be a mapping, got {type(config).__name__}")
+        slots = config.get('slots')
+        if not slots:
+            raise ValueError(f"Camera {camera!r} has no slots")
+        if not isinstance(slots, (list, tuple)):
+            raise ValueError(f"Camera {camera!r}: 'slots' must be a list")
+        names, polygons = zip(*(_parse_slot(slot, i) for i, slot in enumerate(slots)))
+        threshold = config.get('threshold', data.get('threshold', 0.0))
+        if not _is_number(threshold):
+            raise ValueError(f"Camera {camera!r}: 'threshold' must be a number")
+        image_size = config.get('image_size', data.get('image_size'))
+        if image_size is not None and (not isinstance(image_size, (list, tuple)) or len(image_size) != 2
+                                       or not all(map(_is_number, image_size))):
+            raise ValueError(f"Camera {camera!r}: 'image_size' must be [width, height]")
+        layouts[str(camera)] = SlotLayout(
+            polygons,
+            list(names),
+            metric=config.get('metric', data.get('metric', 'intersection')),
+            threshold=float(threshold),
+            image_size=image_size,
+        )
+    return layouts
+
+
+def load_layout_file(path: str) -> Dict[str, SlotLayout]:
+    """Membaca file layout JSON/YAML (lihat parse_layouts)"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in LAYOUT_EXTENSIONS:
+        raise ValueError(f"Unsupported slot layout file: {path!r} (use {LAYOUT_EXTENSIONS})")
+    with open(path, "r", encoding="utf-8") as f:
+        if extension == '.json':
+            data = json.load(f)
+        else:
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML slot layouts") from None
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"Invalid YAML slot layout {path!r}: {e}") from None
+    return parse_layouts(data)
+
+
+class SlotLayoutStore:
+    """
+    Cache layout per file. Setiap file di-stat paling sering sekali per
+    check_interval detik; jika mtime/ukurannya berubah, file dimuat ulang.
+    Jika file baru tidak valid, layout lama tetap dipakai sampai diperbaiki.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        """
+        Args:
+            check_interval: Jeda minimum antar pengecekan perubahan file (detik)
+        """
+        self.check_interval = check_interval
+        self._files: Dict[str, Tuple[float, Tuple[int, int], Dict[str, SlotLayout]]] = {}
+        self._lock = threading.Lock()
+
+    def _layouts(self, path: str) -> Dict[str, SlotLayout]:
+        path = os.path.abspath(os.path.expanduser(path))
+        now = time.monotonic()
+        with self._lock:
+            entry = self._files.get(path)
+            if entry is not None and now - entry[0] < self.check_interval:
+                return entry[2]
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Mis. sesaat hilang saat diganti secara atomik
+                if entry is None:
+                    raise
+                return entry[2]
+            version = (stat.st_mtime_ns, stat.st_size)
+            if entry is not None and entry[1] == version:
+                self._files[path] = (now, version, entry[2])
+                return entry[2]
+            try:
+                layouts = load_layout_file(path)
+            except (OSError, ValueError):
+                if entry is None:
+                    raise
+                layouts = entry[2]
+            self._files[path] = (now, version, layouts)
+            return layouts
+
+    def get(self, spec: str) -> SlotLayout:
+        """
+        Layout untuk spesifikasi 'path' atau 'path#kamera'
+
+        Raises:
+            ValueError: Jika kamera tidak ada atau file tanpa kamera
+                default berisi lebih dari satu kamera
+        """
+        path, camera = split_layout_spec(spec)
+        layouts = self._layouts(path)
+        if camera is None:
+            if len(layouts) != 1:
+                raise ValueError(f"{path!r} has several cameras; use '{path}#<camera>' "
+                                 f"(one of {sorted(layouts)})")
+            return next(iter(layouts.values()))
+        if camera not in layouts:
+            raise ValueError(f"Unknown camera {camera!r} in {path!r} (one of {sorted(layouts)})")
+        return layouts[camera]
+
+    def clear(self):
+        with self._lock:
+            self._files.clear()
+
+
+_default_store = SlotLayoutStore()
+
+
+def get_slot_layout(spec: str) -> SlotLayout:
+    """Layout dari store bersama proses (lihat SlotLayoutStore.get)"""
+    return _default_store.get(spec)
@@ -0,0 +1,339 @@
+"""
+Mode streaming: deteksi slot parkir dari video file atau kamera/RTSP
+Kelompok: AFEnter
+
+Frame dibaca lewat cv2.VideoCapture dan diproses dengan
+process_parking_frame. Jika pemrosesan lebih lambat dari laju frame,
+frame dilewati agar latensi tetap terbatas:
+
+- Video file (realtime=True): posisi video mengikuti jam dinding; frame
+  yang sudah terlambat dilompati dengan grab() tanpa decode.
+- Kamera/RTSP: thread pembaca selalu menyimpan frame terbaru saja, frame
+  lama dibuang.
+
+Generator hanya menghasilkan event saat status slot berubah.
+
+Contoh:
+    python streaming.py make-video "dataset/All Dataset" uji.mp4 --limit 10
+    python streaming.py run uji.mp4
+    python streaming.py run rtsp://kamera.local/stream
+"""
+
+import argparse
+import json
+import sys
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from image_processing import (
+    WORKING_SIZE,
+    decode_image,
+    list_image_files,
+    process_parking_frame,
+    resize_image,
+)
+from incremental import IncrementalOccupancy
+from rembg_session import RembgSessionPool
+from segmentation_backends import get_segmentation_backend
+
+
+Source = Union[str, int]
+
+
+def is_live_source(source: Source) -> bool:
+    """Kamera (indeks perangkat) atau URL stream, bukan file video"""
+    return isinstance(source, int) or "://" in str(source)
+
+
+class LatestFrameReader:
+    """
+    Thread pembaca untuk sumber live: hanya frame terbaru yang disimpan,
+    sehingga buffer driver/jaringan tidak menumpuk saat pemrosesan lambat
+    """
+
+    def __init__(self, capture: cv2.VideoCapture):
+        self.capture = capture
+        self.dropped = 0
+        self._frame: Optional[np.ndarray] = None
+        self._index = -1
+        self._ended = False
+        self._condition = threading.Condition()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="frame-reader", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        index = 0
+        while not self._stop.is_set():
+            ok, frame = self.capture.read()
+            with self._condition:
+                if not ok or self._stop.is_set():
+                    self._ended = True
+                    self._condition.notify_all()
+                    return
+                if self._frame is not None:
+                    self.dropped += 1
+                self._frame = frame
+                self._index = index
+                self._condition.notify_all()
+            index += 1
+
+    def read(self) -> Tuple[Optional[int], Optional[np.ndarray]]:
+        """Menunggu frame baru; (None, None) jika stream berakhir"""
+        with self._condition:
+            while self._frame is None and not self._ended:
+                self._condition.wait()
+            if self._frame is None:
+                return None, None
+            frame, self._frame = self._frame, None
+            return self._index, frame
+
+    def stop(self):
+        """
+        Menghentikan thread pembaca dan menunggu capture.read() yang sedang
+        berjalan selesai; capture baru aman di-release setelah ini
+        """
+        self._stop.set()
+        self._thread.join()
+        with self._condition:
+            self._ended = True
+            self._condition.notify_all()
+
+
+class ParkingStream:
+    """
+    Generator event perubahan status slot dari sebuah sumber video
+
+    Setiap event berisi: frame_index, position_ms, slot_results,
+    changed_slots, occupied_slots, motor_count, latency_ms, frames_skipped.
+    Statistik keseluruhan tersedia di atribut ``stats`` setelah iterasi.
+    """
+
+    def __init__(self,
+                 source: Source,
+                 session_pool: Optional[RembgSessionPool] = None,
+                 realtime: bool = True,
+                 frame_step: int = 1,
+                 min_stable_frames: int = 1,
+                 incremental: bool = False,
+                 change_threshold: float = 0.02,
+                 **params):
+        """
+        Args:
+            source: Path video, URL stream (rtsp://, http://), atau indeks kamera
+            session_pool: Pool session rembg (default: pool bersama proses)
+            realtime: Untuk video file, lompati frame yang terlambat terhadap
+                jam dinding. Jika False, setiap frame_step frame diproses
+                (deterministik, cocok untuk pengujian offline).
+            frame_step: Jarak frame yang diproses saat realtime=False
+            min_stable_frames: Perubahan status slot baru dilaporkan setelah
+                terlihat pada sejumlah frame terproses berturut-turut
+            incremental: Jalankan ulang pipeline hanya jika ada slot yang
+                berubah (lihat IncrementalOccupancy)
+            change_threshold: Ambang perubahan slot untuk mode incremental
+            **params: Parameter pipeline untuk process_parking_frame (tanpa
+                max_motors: frame yang ditolak tidak punya status slot)
+        """
+        if frame_step < 1 or min_stable_frames < 1:
+            raise ValueError("frame_step and min_stable_frames must be at least 1")
+        if params.get('max_motors') is not None:
+            raise ValueError("max_motors is not supported for streams")
+        self.source = source
+        self.session_pool = session_pool
+        self.realtime = realtime
+        self.frame_step = frame_step
+        self.min_stable_frames = min_stable_frames
+        self.incremental = incremental
+        self.change_threshold = change_threshold
+        self.params = params
+        self.stats = {'frames_read': 0, 'frames_processed': 0, 'frames_skipped': 0,
+                      'frames_recomputed': 0, 'events': 0, 'mean_latency_ms': 0.0}
+
+    def _open(self) -> cv2.VideoCapture:
+        capture = cv2.VideoCapture(self.source)
+        if not capture.isOpened():
+            raise ValueError(f"Cannot open video source: {self.source!r}")
+        return capture
+
+    def _file_frames(self, capture: cv2.VideoCapture) -> Iterator[Tuple[int, float, np.ndarray]]:
+        """Frame video file beserta posisi (ms); frame terlambat dilompati"""
+        fps = capture.get(cv2.CAP_PROP_FPS) or 0.0
+        if fps <= 0:
+            fps = 25.0
+        index = 0
+        start = time.perf_counter()
+        while True:
+            if self.realtime:
+                # Frame yang seharusnya sedang tampil menurut jam dinding
+                target = int((time.perf_counter() - start) * fps)
+            else:
+                target = index if index == 0 else index + self.frame_step - 1
+            while index < target:
+                if not capture.grab():
+                    return
+                index += 1
+                self.stats['frames_skipped'] += 1
+            ok, frame = capture.read()
+            if not ok:
+                return
+            self.stats['frames_read'] += 1
+            yield index, index * 1000.0 / fps, frame
+            index += 1
+
+    def _live_frames(self, reader: LatestFrameReader) -> Iterator[Tuple[int, float, np.ndarray]]:
+        start = time.perf_counter()
+        while True:
+            index, frame = reader.read()
+            if frame is None:
+                return
+            self.stats['frames_read'] += 1
+            self.stats['frames_skipped'] = reader.dropped
+            yield index, (time.perf_counter() - start) * 1000.0, frame
+
+    def __iter__(self) -> Iterator[Dict]:
+        # Model dimuat sebelum jam stream berjalan agar frame awal tidak terlewati
+        session_pool = (self.session_pool or get_segmentation_backend()).warm_up()
+        capture = self._open()
+        engine = None
+        if self.incremental:
+            engine = IncrementalOccupancy(session_pool, self.change_threshold, **self.params)
+        reader = None
+        if is_live_source(self.source):
+            reader = LatestFrameReader(capture)
+            frames = self._live_frames(reader)
+        else:
+            frames = self._file_frames(capture)
+
+        reported: Optional[List[str]] = None
+        candidate: Optional[List[str]] = None
+        stable = 0
+        skipped_at_last_event = 0
+        total_latency = 0.0
+        try:
+            for index, position_ms, frame in frames:
+                start = time.perf_counter()
+                if engine is not None:
+                    results = engine.update(frame)
+                    self.stats['frames_recomputed'] += results['recomputed']
+                else:
+                    results = process_parking_frame(frame, session_pool, stages=(), **self.params)
+                    self.stats['frames_recomputed'] += 1
+                latency_ms = (time.perf_counter() - start) * 1000.0
+                total_latency += latency_ms
+                self.stats['frames_processed'] += 1
+                self.stats['mean_latency_ms'] = total_latency / self.stats['frames_processed']
+
+                slot_results = results['slot_results']
+                if slot_results == reported:
+                    candidate, stable = None, 0
+                    continue
+                if slot_results == candidate:
+                    stable += 1
+                else:
+                    candidate, stable = slot_results, 1
+                if reported is not None and stable < self.min_stable_frames:
+                    continue
+
+                changed = [i for i, status in enumerate(slot_results)
+                           if reported is None or i >= len(reported) or reported[i] != status]
+                reported, candidate, stable = slot_results, None, 0
+                self.stats['events'] += 1
+                yield {
+                    'frame_index': index,
+                    'position_ms': position_ms,
+                    'slot_results': slot_results,
+                    'changed_slots': changed,
+                    'occupied_slots': results['occupied_slots'],
+                    'motor_count': results['motor_count'],
+                    'latency_ms': latency_ms,
+                    'frames_skipped': self.stats['frames_skipped'] - skipped_at_last_event,
+                }
+                skipped_at_last_event = self.stats['frames_skipped']
+        finally:
+            # Thread pembaca harus berhenti dulu: ia bisa sedang di dalam capture.read()
+            if reader is not None:
+                reader.stop()
+            capture.release()
+
+
+def stream_parking_states(source: Source, **kwargs) -> Iterator[Dict]:
+    """Generator event perubahan status slot (lihat ParkingStream)"""
+    yield from ParkingStream(source, **kwargs)
+
+
+def make_test_video(paths: List[str],
+                    output: str,
+                    fps: float = 10.0,
+                    seconds_per_image: float = 1.0,
+                    size: Tuple[int, int] = WORKING_SIZE) -> int:
+    """
+    Membuat video MP4 dari gambar dataset (setiap gambar ditahan beberapa
+    frame) untuk menguji mode streaming
+
+    Returns:
+        int: Jumlah frame yang ditulis
+    """
+    writer = cv2.VideoWriter(output, cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    if not writer.isOpened():
+        raise ValueError(f"Cannot write video: {output!r}")
+    repeat = max(1, int(round(fps * seconds_per_image)))
+    frames = 0
+    try:
+        for path in paths:
+            with open(path, "rb") as f:
+                image = resize_image(decode_image(f.read(), min_size=size), *size)
+            for _ in range(repeat):
+                writer.write(image)
+                frames += 1
+    finally:
+        writer.release()
+    return frames
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Deteksi slot parkir dari video/stream")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("run", help="proses video file, URL stream, atau indeks kamera")
+    p.add_argument("source")
+    p.add_argument("--no-realtime", action="store_true",
+                   help="proses setiap --frame-step frame tanpa mengikuti jam dinding")
+    p.add_argument("--frame-step", type=int, default=1)
+    p.add_argument("--min-stable-frames", type=int, default=1)
+    p.add_argument("--incremental", action="store_true",
+                   help="proses ulang hanya frame yang slotnya berubah")
+    p.add_argument("--change-threshold", type=float, default=0.02)
+    p.add_argument("--slot-layout", default=None,
+                   help="file layout slot JSON/YAML, mis. layout.json#gerbang-1")
+
+    p = sub.add_parser("make-video", help="buat video MP4 uji dari folder dataset")
+    p.add_argument("dataset")
+    p.add_argument("output")
+    p.add_argument("--limit", type=int, default=10)
+    p.add_argument("--fps", type=float, default=10.0)
+    p.add_argument("--seconds-per-image", type=float, default=1.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "make-video":
+        paths = list_image_files(args.dataset)[:args.limit]
+        frames = make_test_video(paths, args.output, args.fps, args.seconds_per_image)
+        print(f"Wrote {frames} frames from {len(paths)} images to {args.output}", file=sys.stderr)
+        return
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    params = {'slot_layout': args.slot_layout} if args.slot_layout else {}
+    stream = ParkingStream(source, realtime=not args.no_realtime,
+                           frame_step=args.frame_step, min_stable_frames=args.min_stable_frames,
+                           incremental=args.incremental, change_threshold=args.change_threshold,
+                           **params)
+    for event in stream:
+        print(json.dumps(event), flush=True)
+    print(json.dumps(stream.stats), file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()